@@ -0,0 +1,416 @@
+"""
+Admission control and backpressure for the classifier API.
+
+Work routes are wrapped in `@admitted(priority)`, which checks each request in
+order. /classify_links (a user is waiting on it) is INTERACTIVE; /classify,
+/analyze and /feedback (mailbox jobs) are BULK.
+
+1. Size limits, before any model work. The body is capped at
+   ADMISSION_MAX_BODY_BYTES (Flask MAX_CONTENT_LENGTH; for compressed bodies it
+   applies to the decompressed size), a batch at ADMISSION_MAX_EMAILS emails and
+   each email (or /classify_links `html`) at ADMISSION_MAX_EMAIL_CHARS.
+   Anything over a limit gets 413. NDJSON streams are read as they are
+   classified instead: they are capped at ADMISSION_MAX_STREAM_BYTES (413 up
+   front when Content-Length says so) and ADMISSION_MAX_STREAM_EMAILS, and the
+   route counts both as it reads (see check_stream_limits()).
+2. A work slot. At most ADMISSION_MAX_ACTIVE requests run at once per process,
+   and each priority class has its own active and queue limits
+   (ADMISSION_{INTERACTIVE,BULK}_MAX_{ACTIVE,QUEUED}). Free slots go to
+   interactive waiters first. Waiters give up after ADMISSION_QUEUE_TIMEOUT_MS.
+   A full class queue is answered with 429 straight away, a wait that times out
+   with 503. Both carry `Retry-After`.
+3. A deadline. Each request gets REQUEST_DEADLINE_MS (a client may shorten it
+   with an `X-Deadline-Ms` header). Routes call `checkpoint()` between chunks
+   of work; once the deadline has passed the request stops and gets 503.
+   Link scoring is capped to the remaining time, so slow links come back
+   "pending" instead.
+
+Background work (link prefetch) takes BACKGROUND slots one batch at a time,
+so it only runs when no request is waiting. At each checkpoint a bulk request
+also hands its slot to any waiting interactive request and queues for it again, so a link check waits for at
+most one chunk of a large batch rather than the whole batch.
+
+/, /ready and /stats are never gated, so health checks keep answering under
+overload.
+"""
+import collections
+import functools
+import os
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+from werkzeug.exceptions import HTTPException
+
+import metrics
+import tracing
+from wire import STREAMING_MIMETYPES
+
+ADMISSION_MAX_BODY_BYTES = int(os.environ.get('ADMISSION_MAX_BODY_BYTES', str(32 * 1024 * 1024)))
+ADMISSION_MAX_EMAILS = int(os.environ.get('ADMISSION_MAX_EMAILS', '1000'))
+ADMISSION_MAX_EMAIL_CHARS = int(os.environ.get('ADMISSION_MAX_EMAIL_CHARS', '1000000'))
+# NDJSON streams (application/x-ndjson) are not buffered, so they have their own limits
+ADMISSION_MAX_STREAM_BYTES = int(os.environ.get('ADMISSION_MAX_STREAM_BYTES', str(512 * 1024 * 1024)))
+ADMISSION_MAX_STREAM_EMAILS = int(os.environ.get('ADMISSION_MAX_STREAM_EMAILS', '100000'))
+ADMISSION_MAX_ACTIVE = int(os.environ.get('ADMISSION_MAX_ACTIVE', '4'))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_MS', '1000'))
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', '1'))
+# Emails handled between two deadline checks
+ADMISSION_CHUNK_EMAILS = int(os.environ.get('ADMISSION_CHUNK_EMAILS', '64'))
+REQUEST_DEADLINE_MS = float(os.environ.get('REQUEST_DEADLINE_MS', '30000'))
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+# timeout_ms for AdmissionGate.acquire() to wait as long as it takes
+NO_TIMEOUT = float("inf")
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+BULK = "bulk"
+BACKGROUND = "background"  # work no request is waiting on (prefetch.py)
+PRIORITIES = (INTERACTIVE, BULK, BACKGROUND)
+
+# priority -> (max active, max queued)
+CLASS_LIMITS = {
+    INTERACTIVE: (int(os.environ.get('ADMISSION_INTERACTIVE_MAX_ACTIVE', '4')),
+                  int(os.environ.get('ADMISSION_INTERACTIVE_MAX_QUEUED', '8'))),
+    BULK: (int(os.environ.get('ADMISSION_BULK_MAX_ACTIVE', '2')),
+           int(os.environ.get('ADMISSION_BULK_MAX_QUEUED', '8'))),
+    BACKGROUND: (int(os.environ.get('ADMISSION_BACKGROUND_MAX_ACTIVE', '1')),
+                 int(os.environ.get('ADMISSION_BACKGROUND_MAX_QUEUED', '4'))),
+}
+
+
+class AdmissionError(Exception):
+    """A request turned away (or stopped) by admission control."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+    def response(self):
+        response = jsonify({"error": self.message})
+        response.status_code = self.status
+        if self.retry_after is not None:
+            response.headers["Retry-After"] = str(self.retry_after)
+        return response
+
+
+class _PriorityClass:
+    def __init__(self, name, max_active, max_queued):
+        self.name = name
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.active = 0
+        self.queue = collections.deque()  # waiting tickets, first come first served
+        self.counters = {"admitted": 0, "queued": 0, "yielded": 0, "rejected_queue_full": 0,
+                         "rejected_queue_timeout": 0}
+
+    def stats(self):
+        return dict(self.counters, active=self.active, waiting=len(self.queue), max_active=self.max_active,
+                    max_queued=self.max_queued)
+
+
+class Slot:
+    """A work slot held by one request; release() is idempotent."""
+
+    def __init__(self, gate, priority):
+        self.gate = gate
+        self.priority = priority
+        self.held = True
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.gate.release(self.priority)
+
+    def yield_if_needed(self, timeout_ms):
+        """Give the slot to a waiting higher-priority request, then queue for it again."""
+        if self.held and self.gate.higher_priority_waiting(self.priority):
+            with tracing.span("admission.yield", priority=self.priority):
+                self.release()
+                self.gate.acquire(self.priority, timeout_ms=timeout_ms, bounded=False)
+                self.held = True
+            with self.gate._cond:
+                self.gate.classes[self.priority].counters["yielded"] += 1
+
+
+class AdmissionGate:
+    """
+    Counting semaphore with per-priority-class limits and bounded, time-limited
+    wait queues. A free slot goes to the highest-priority waiter that is within
+    its class limit; within a class, waiters are served in arrival order.
+    """
+
+    def __init__(self, max_active=None, limits=None, queue_timeout_ms=None):
+        self.max_active = ADMISSION_MAX_ACTIVE if max_active is None else max_active
+        self.queue_timeout_ms = ADMISSION_QUEUE_TIMEOUT_MS if queue_timeout_ms is None else queue_timeout_ms
+        limits = CLASS_LIMITS if limits is None else limits
+        self.classes = {name: _PriorityClass(name, *limits[name]) for name in PRIORITIES}
+        self._cond = threading.Condition()
+        self.active = 0
+        self.counters = {"rejected_too_large": 0, "deadline_exceeded": 0}
+
+    def _can_start(self, cls):
+        return self.active < self.max_active and cls.active < cls.max_active
+
+    def _higher_runnable(self, cls):
+        for name in PRIORITIES:
+            if name == cls.name:
+                return False
+            other = self.classes[name]
+            if other.queue and self._can_start(other):
+                return True
+        return False
+
+    def _may_start(self, cls, ticket):
+        head = cls.queue[0] if cls.queue else None
+        return head is ticket and self._can_start(cls) and not self._higher_runnable(cls)
+
+    def _start(self, cls):
+        self.active += 1
+        cls.active += 1
+        cls.counters["admitted"] += 1
+
+    def acquire(self, priority=BULK, timeout_ms=None, bounded=True):
+        """
+        Take a slot for `priority` and return it as a Slot. Raises AdmissionError
+        429 if the class queue is full (unless bounded=False) or 503 if no slot
+        frees up within timeout_ms (default: the gate's queue timeout; NO_TIMEOUT
+        waits until one does).
+        """
+        timeout_ms = self.queue_timeout_ms if timeout_ms is None else timeout_ms
+        with self._cond:
+            cls = self.classes[priority]
+            if self._may_start(cls, None):
+                self._start(cls)
+                return Slot(self, priority)
+            if bounded and len(cls.queue) >= cls.max_queued:
+                cls.counters["rejected_queue_full"] += 1
+                raise AdmissionError(429, "Classifier is busy, try again later", ADMISSION_RETRY_AFTER)
+            ticket = object()
+            cls.queue.append(ticket)
+            cls.counters["queued"] += 1
+            try:
+                give_up = time.monotonic() + timeout_ms / 1000
+                while not self._may_start(cls, ticket):
+                    remaining = give_up - time.monotonic()
+                    if remaining <= 0:
+                        cls.counters["rejected_queue_timeout"] += 1
+                        raise AdmissionError(503, "Timed out waiting for a classifier slot", ADMISSION_RETRY_AFTER)
+                    self._cond.wait(None if remaining == NO_TIMEOUT else remaining)
+                self._start(cls)
+                return Slot(self, priority)
+            finally:
+                cls.queue.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self, priority=BULK):
+        with self._cond:
+            self.active -= 1
+            self.classes[priority].active -= 1
+            self._cond.notify_all()
+
+    def higher_priority_waiting(self, priority):
+        with self._cond:
+            return any(self.classes[name].queue for name in PRIORITIES[:PRIORITIES.index(priority)])
+
+    def count(self, counter):
+        with self._cond:
+            self.counters[counter] += 1
+
+    def stats(self):
+        with self._cond:
+            return dict(self.counters, active=self.active, max_active=self.max_active,
+                        waiting=sum(len(cls.queue) for cls in self.classes.values()),
+                        queue_timeout_ms=self.queue_timeout_ms,
+                        classes={name: cls.stats() for name, cls in self.classes.items()})
+
+
+GATE = AdmissionGate()
+
+
+class Deadline:
+    def __init__(self, budget_ms):
+        self.budget_ms = budget_ms
+        self.expires = time.monotonic() + budget_ms / 1000
+
+    def remaining_ms(self):
+        return max(0.0, (self.expires - time.monotonic()) * 1000)
+
+    def check(self):
+        if time.monotonic() >= self.expires:
+            GATE.count("deadline_exceeded")
+            raise AdmissionError(503, f"Request deadline of {self.budget_ms:g} ms exceeded", ADMISSION_RETRY_AFTER)
+
+
+def _request_deadline_ms():
+    requested = request.headers.get(DEADLINE_HEADER)
+    if requested is None:
+        return REQUEST_DEADLINE_MS
+    try:
+        requested = float(requested)
+    except ValueError:
+        raise AdmissionError(400, f"{DEADLINE_HEADER} must be a positive number")
+    if not requested > 0:
+        raise AdmissionError(400, f"{DEADLINE_HEADER} must be a positive number")
+    return min(requested, REQUEST_DEADLINE_MS)
+
+
+def check_deadline():
+    """Raise AdmissionError (503) if the current request is past its deadline."""
+    deadline = g.get("deadline")
+    if deadline is not None:
+        deadline.check()
+
+
+def checkpoint():
+    """
+    Called between chunks of work: checks the deadline and, for a bulk request,
+    hands the slot to any waiting interactive request before carrying on.
+    """
+    check_deadline()
+    slot = g.get("slot")
+    deadline = g.get("deadline")
+    if slot is not None and deadline is not None:
+        slot.yield_if_needed(deadline.remaining_ms())
+
+
+def cap_deadline_ms(deadline_ms):
+    """The smaller of a route-level deadline_ms (or None) and the time the request has left."""
+    check_deadline()
+    deadline = g.get("deadline")
+    if deadline is None:
+        return deadline_ms
+    remaining = deadline.remaining_ms()
+    return remaining if deadline_ms is None else min(deadline_ms, remaining)
+
+
+def run_chunked(fn, items, chunk_size=None):
+    """`fn(items)` applied ADMISSION_CHUNK_EMAILS items at a time, with a checkpoint() before each chunk."""
+    chunk_size = ADMISSION_CHUNK_EMAILS if chunk_size is None else chunk_size
+    results = []
+    for start in range(0, len(items), chunk_size):
+        checkpoint()
+        results.extend(fn(items[start:start + chunk_size]))
+    return results
+
+
+def check_size_limits(data):
+    """413 for batches with too many emails or an email / html body over the length limit."""
+    if not isinstance(data, dict):
+        return
+    emails = data.get("emails")
+    if isinstance(emails, list):
+        if len(emails) > ADMISSION_MAX_EMAILS:
+            raise AdmissionError(413, f"Too many emails: {len(emails)}, the limit is {ADMISSION_MAX_EMAILS} "
+                                      "(split the batch or use application/x-ndjson streaming)")
+        for index, email in enumerate(emails):
+            if isinstance(email, str) and len(email) > ADMISSION_MAX_EMAIL_CHARS:
+                raise AdmissionError(413, f"Email {index} is {len(email)} characters, "
+                                          f"the limit is {ADMISSION_MAX_EMAIL_CHARS}")
+    html = data.get("html")
+    if isinstance(html, str) and len(html) > ADMISSION_MAX_EMAIL_CHARS:
+        raise AdmissionError(413, f"html is {len(html)} characters, the limit is {ADMISSION_MAX_EMAIL_CHARS}")
+
+
+def check_stream_limits(emails, nbytes):
+    """413 once a streamed body has gone past ADMISSION_MAX_STREAM_EMAILS emails or ADMISSION_MAX_STREAM_BYTES bytes."""
+    if emails > ADMISSION_MAX_STREAM_EMAILS:
+        raise AdmissionError(413, f"Too many emails in the stream, the limit is {ADMISSION_MAX_STREAM_EMAILS}")
+    if nbytes > ADMISSION_MAX_STREAM_BYTES:
+        raise AdmissionError(413, f"Stream is larger than {ADMISSION_MAX_STREAM_BYTES} bytes")
+
+
+def _check_body():
+    if request.mimetype in STREAMING_MIMETYPES:
+        # Streamed bodies are not buffered; the route checks check_stream_limits() as it reads
+        request.max_content_length = None
+        check_stream_limits(0, request.content_length or 0)
+        return
+    try:
+        request.get_data(cache=True)
+    except HTTPException as e:
+        raise AdmissionError(e.code, e.description)
+    check_size_limits(request.get_json(silent=True))
+
+
+def _release_after(iterable, slot):
+    try:
+        yield from iterable
+    finally:
+        slot.release()
+
+
+def admitted(priority=BULK):
+    """Route decorator applying the size limits, the work-slot gate for `priority` and the request deadline."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                _check_body()
+            except AdmissionError as e:
+                if e.status == 413:
+                    GATE.count("rejected_too_large")
+                return e.response()
+            try:
+                budget_ms = _request_deadline_ms()
+                with tracing.span("admission", priority=priority):
+                    slot = GATE.acquire(priority)
+            except AdmissionError as e:
+                return e.response()
+
+            release = True
+            try:
+                g.deadline = Deadline(budget_ms)
+                g.slot = slot
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.is_streamed:
+                    # The slot is held until the streamed body has been sent (or the client went away)
+                    response.response = _release_after(response.response, slot)
+                    release = False
+                return response
+            except AdmissionError as e:
+                return e.response()
+            finally:
+                if release:
+                    slot.release()
+
+        return wrapper
+
+    return decorator
+
+
+def init_app(app):
+    app.config["MAX_CONTENT_LENGTH"] = ADMISSION_MAX_BODY_BYTES
+
+
+def _collect_metrics():
+    stats = GATE.stats()
+    classes = stats["classes"]
+    return [
+        ("classifier_admission_active", "gauge", "Requests holding a work slot.",
+         [({"class": name}, cls["active"]) for name, cls in classes.items()]),
+        ("classifier_admission_waiting", "gauge", "Requests queued for a work slot.",
+         [({"class": name}, cls["waiting"]) for name, cls in classes.items()]),
+        ("classifier_admission_rejected_total", "counter", "Requests turned away by admission control.",
+         [({"class": name, "reason": reason}, cls[f"rejected_{reason}"])
+          for name, cls in classes.items() for reason in ("queue_full", "queue_timeout")]),
+        ("classifier_admission_too_large_total", "counter", "Requests rejected by the size limits.",
+         [({}, stats["rejected_too_large"])]),
+        ("classifier_deadline_exceeded_total", "counter", "Requests stopped at their deadline.",
+         [({}, stats["deadline_exceeded"])]),
+        ("classifier_admission_yielded_total", "counter", "Slots handed to a higher priority request between chunks.",
+         [({"class": name}, cls["yielded"]) for name, cls in classes.items()]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
+
+
+def stats():
+    return dict(GATE.stats(), max_body_bytes=ADMISSION_MAX_BODY_BYTES, max_emails=ADMISSION_MAX_EMAILS,
+                max_email_chars=ADMISSION_MAX_EMAIL_CHARS, request_deadline_ms=REQUEST_DEADLINE_MS)
@@ -0,0 +1,205 @@
+"""
+In-process micro-batching of model calls across concurrent requests.
+
+A MicroBatcher wraps a batch function `fn(items) -> results` (one result per
+item, same order). Request threads call `submit(items)` and block; a single
+dispatcher thread collects submissions for up to `max_wait_ms` after the first
+one arrives, or until `max_batch_size` items are waiting, then makes one `fn`
+call for all of them and hands every caller its own slice of the results.
+Submissions are never split: one that would take the batch past
+`max_batch_size` waits for the next batch, and one larger than
+`max_batch_size` is dispatched on its own. If the shared call raises, each
+submission is re-run on its own, so only the caller whose items fail gets
+the error.
+
+Used for /classify (email_classifier_svm.classify) and small /classify_links
+sets (phishing_link_svm_model.predict_phishing_parallel). BATCH_MAX_WAIT_MS=0
+turns batching off and calls `fn` directly in the request thread.
+"""
+import os
+import queue
+import threading
+import time
+
+import metrics
+import tracing
+
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '2'))
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '64'))
+
+# name -> MicroBatcher, reported by stats()
+BATCHERS = {}
+
+
+def _bucket_bounds(limit):
+    bounds = [1]
+    while bounds[-1] < limit:
+        bounds.append(bounds[-1] * 2)
+    return bounds
+
+
+class Histogram:
+    """Counts per power-of-two upper bound, plus an overflow bucket."""
+
+    def __init__(self, limit):
+        self.bounds = _bucket_bounds(limit)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            i = len(self.bounds)
+        self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self):
+        buckets = {str(bound): count for bound, count in zip(self.bounds, self.counts)}
+        buckets["+Inf"] = self.counts[-1]
+        return {"buckets": buckets, "count": self.count, "mean": (self.total / self.count) if self.count else 0.0}
+
+
+class _Submission:
+    __slots__ = ("items", "results", "error", "done")
+
+    def __init__(self, items):
+        self.items = items
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    def __init__(self, name, fn, max_batch_size=None, max_wait_ms=None):
+        self.name = name
+        self.fn = fn
+        self.max_batch_size = BATCH_MAX_SIZE if max_batch_size is None else max_batch_size
+        self.max_wait_ms = BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self._queue = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batch_sizes = Histogram(self.max_batch_size)
+        self.queue_depths = Histogram(self.max_batch_size)
+        self.batches = 0
+        self.submissions = 0
+        BATCHERS[name] = self
+
+    @property
+    def enabled(self):
+        return self.max_wait_ms > 0 and self.max_batch_size > 1
+
+    def submit(self, items):
+        """Run `fn` on `items` as part of a shared batch; blocks until the results are in."""
+        items = list(items)
+        if not items:
+            return []
+        if not self.enabled or tracing.active():
+            # Traced requests run alone so their spans only cover their own items
+            return self.fn(items)
+
+        submission = _Submission(items)
+        work_queue = self._ensure_started()
+        with self._stats_lock:
+            self.submissions += 1
+            self.queue_depths.observe(work_queue.qsize())
+        work_queue.put(submission)
+        submission.done.wait()
+        if submission.error is not None:
+            raise submission.error
+        return submission.results
+
+    def _ensure_started(self):
+        # The dispatcher thread does not survive fork(); start one per process
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, args=(self._queue,),
+                                     name=f"batcher-{self.name}", daemon=True).start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def _collect(self, work_queue, held):
+        # A submission that would push the batch past max_batch_size is held over for the next one
+        batch = [held if held is not None else work_queue.get()]
+        size = len(batch[0].items)
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                submission = work_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(submission.items) > self.max_batch_size:
+                return batch, size, submission
+            batch.append(submission)
+            size += len(submission.items)
+        return batch, size, None
+
+    def _call(self, submission):
+        try:
+            submission.results = self.fn(submission.items)
+        except Exception as e:
+            submission.error = e
+
+    def _run(self, work_queue):
+        held = None
+        while True:
+            batch, size, held = self._collect(work_queue, held)
+            with self._stats_lock:
+                self.batches += 1
+                self.batch_sizes.observe(size)
+            if len(batch) == 1:
+                self._call(batch[0])
+            else:
+                try:
+                    results = self.fn([item for submission in batch for item in submission.items])
+                    start = 0
+                    for submission in batch:
+                        submission.results = results[start:start + len(submission.items)]
+                        start += len(submission.items)
+                except Exception:
+                    # Re-run each submission alone so only the caller whose items fail gets the error
+                    for submission in batch:
+                        self._call(submission)
+            for submission in batch:
+                submission.done.set()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "submissions": self.submissions,
+                "batches": self.batches,
+                "batch_size": self.batch_sizes.snapshot(),
+                "queue_depth_at_submit": self.queue_depths.snapshot(),
+            }
+
+
+def stats():
+    return {name: batcher.stats() for name, batcher in BATCHERS.items()}
+
+
+def _collect_metrics():
+    current = stats()
+    return [
+        ("classifier_batch_queue_depth", "gauge", "Submissions waiting for the batch dispatcher.",
+         [({"batcher": name}, s["queue_depth"]) for name, s in current.items()]),
+        ("classifier_batches_total", "counter", "Batched model calls.",
+         [({"batcher": name}, s["batches"]) for name, s in current.items()]),
+        ("classifier_batch_submissions_total", "counter", "Submissions to the batcher.",
+         [({"batcher": name}, s["submissions"]) for name, s in current.items()]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Compare the email classifier engines (EMAIL_CLASSIFIER_ENGINE) against the RBF SVC.
+
+Texts are preprocessed once, then for every engine the TF-IDF + classifier part
+of the pipeline is trained and the script reports:
+  - training time,
+  - persisted artifact size (joblib, uncompressed),
+  - per-email latency, batched and one email at a time,
+  - held-out accuracy and macro F1.
+
+--scale N grows the training split N times to show how training and predict
+cost grow with corpus size. Every copy after the first drops a random
+SCALE_DROP_RATE of each email's tokens, so rows are distinct (exact duplicates
+would not add support vectors to the SVC). The held-out split is never scaled.
+
+Run with: python benchmark_classifier_engines.py [--scale N] [--engines svc linear nystroem]
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import joblib
+from sklearn.metrics import accuracy_score, f1_score
+
+import email_classifier_svm
+
+SCALE_DROP_RATE = 0.2
+
+
+def artifact_size_bytes(pipeline):
+    buffer = io.BytesIO()
+    joblib.dump(pipeline, buffer)
+    return buffer.getbuffer().nbytes
+
+
+def scale_rows(tokens, labels, scale, seed=0):
+    """The training rows plus scale - 1 perturbed copies (token dropout)."""
+    rng = random.Random(seed)
+    scaled_tokens, scaled_labels = list(tokens), list(labels)
+    for _ in range(scale - 1):
+        for text, label in zip(tokens, labels):
+            kept = [token for token in text.split() if rng.random() >= SCALE_DROP_RATE]
+            scaled_tokens.append(" ".join(kept) or text)
+            scaled_labels.append(label)
+    return scaled_tokens, scaled_labels
+
+
+def benchmark_engine(classifier, train_tokens, y_train, test_tokens, y_test):
+    # Drop the preprocess step; tokens are computed once for all engines
+    pipeline = email_classifier_svm.build_pipeline(classifier=classifier)[1:]
+
+    start = time.perf_counter()
+    pipeline.fit(train_tokens, y_train)
+    train_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = pipeline.predict(test_tokens)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(test_tokens)
+
+    start = time.perf_counter()
+    for tokens in test_tokens:
+        pipeline.predict([tokens])
+    single_ms = (time.perf_counter() - start) * 1000 / len(test_tokens)
+
+    return {
+        "classifier": classifier,
+        "train_s": train_s,
+        "size_kb": artifact_size_bytes(pipeline) / 1024,
+        "batch_ms": batch_ms,
+        "single_ms": single_ms,
+        "accuracy": accuracy_score(y_test, y_pred),
+        "macro_f1": f1_score(y_test, y_pred, average="macro"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare email classifier engines.")
+    parser.add_argument("--scale", type=int, default=1, help="Grow the training split N times.")
+    parser.add_argument("--engines", nargs="+", default=list(email_classifier_svm.CLASSIFIER_ENGINES),
+                        choices=email_classifier_svm.CLASSIFIER_ENGINES)
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = email_classifier_svm.split_training_data(
+        *email_classifier_svm.load_training_data()
+    )
+    preprocess_step = email_classifier_svm.TextPreprocessor(engine=email_classifier_svm.PREPROCESS_ENGINE)
+    train_tokens, y_train = scale_rows(preprocess_step.transform(X_train), y_train, args.scale)
+    test_tokens = preprocess_step.transform(X_test)
+
+    print(f"Preprocessing engine: {email_classifier_svm.PREPROCESS_ENGINE}, "
+          f"training rows: {len(train_tokens)} (scale {args.scale}), held-out: {len(test_tokens)}\n")
+
+    header = (f"{'classifier':<11}{'train s':>9}{'artifact KB':>13}{'batch ms/email':>16}"
+              f"{'single ms/email':>17}{'accuracy':>10}{'macro F1':>10}")
+    print(header)
+    print("-" * len(header))
+    for classifier in args.engines:
+        r = benchmark_engine(classifier, train_tokens, y_train, test_tokens, y_test)
+        print(f"{r['classifier']:<11}{r['train_s']:>9.2f}{r['size_kb']:>13.1f}{r['batch_ms']:>16.3f}"
+              f"{r['single_ms']:>17.3f}{r['accuracy']:>10.3f}{r['macro_f1']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Accuracy/latency comparison of the email preprocessing engines.
+
+Trains one pipeline per engine ("spacy" and "lite") on the usual 80/20 split of
+training_data/training_emails.json and reports:
+  - cold import + load time of the engine (measured in a fresh interpreter),
+  - preprocessing latency per email,
+  - end-to-end predict latency per email,
+  - held-out accuracy and macro F1.
+
+Run with: python benchmark_preprocess.py [--repeat N] [--engines spacy lite]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sklearn.metrics import accuracy_score, f1_score
+
+import email_classifier_svm
+
+_LOAD_SNIPPETS = {
+    "spacy": "import spacy; spacy.load('en_core_web_sm')",
+    "lite": "import lite_preprocessing",
+}
+
+
+def cold_load_seconds(engine):
+    """Import/load time of an engine in a fresh interpreter (no warm module cache)."""
+    code = f"import time; t = time.perf_counter(); {_LOAD_SNIPPETS[engine]}; print(time.perf_counter() - t)"
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def benchmark_engine(engine, X_train, X_test, y_train, y_test, repeat):
+    preprocess_step = email_classifier_svm.TextPreprocessor(engine=engine)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        preprocess_step.transform(X_test)
+    preprocess_ms = (time.perf_counter() - start) * 1000 / (repeat * len(X_test))
+
+    pipeline = email_classifier_svm.build_pipeline(engine)
+    start = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    train_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        y_pred = pipeline.predict(X_test)
+    predict_ms = (time.perf_counter() - start) * 1000 / (repeat * len(X_test))
+
+    return {
+        "engine": engine,
+        "load_s": cold_load_seconds(engine),
+        "train_s": train_s,
+        "preprocess_ms": preprocess_ms,
+        "predict_ms": predict_ms,
+        "accuracy": accuracy_score(y_test, y_pred),
+        "macro_f1": f1_score(y_test, y_pred, average="macro"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare email preprocessing engines.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions over the test split.")
+    parser.add_argument("--engines", nargs="+", default=list(email_classifier_svm.PREPROCESS_ENGINES),
+                        choices=email_classifier_svm.PREPROCESS_ENGINES)
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = email_classifier_svm.split_training_data(
+        *email_classifier_svm.load_training_data()
+    )
+    print(f"Training emails: {len(X_train)}, held-out: {len(X_test)}\n")
+
+    header = f"{'engine':<8}{'load s':>9}{'train s':>9}{'prep ms/email':>15}{'predict ms/email':>18}{'accuracy':>10}{'macro F1':>10}"
+    print(header)
+    print("-" * len(header))
+    for engine in args.engines:
+        r = benchmark_engine(engine, X_train, X_test, y_train, y_test, args.repeat)
+        print(f"{r['engine']:<8}{r['load_s']:>9.3f}{r['train_s']:>9.2f}{r['preprocess_ms']:>15.3f}"
+              f"{r['predict_ms']:>18.3f}{r['accuracy']:>10.3f}{r['macro_f1']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Serialization and transfer cost of a /classify request body per wire format.
+
+Builds a mailbox-sized payload ({"emails": [...]}, 500 HTML emails by default)
+and, for JSON and MessagePack with no compression, gzip and zstd, reports:
+  - encoded size and ratio to plain JSON,
+  - encode time (serialize + compress, client side),
+  - decode time (decompress + deserialize, server side),
+  - transfer time at --mbps, and the end-to-end total.
+
+The emails are HTML newsletters/notifications built around the training
+bodies (inline styles, table layout, tracking links), which is what mailbox
+payloads look like. Pass --input with a saved {"emails": [...]} JSON file to
+measure a real mailbox instead.
+
+Run with: python benchmark_wire.py [--emails 500] [--mbps 50] [--input payload.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import wire
+
+TEMPLATE = """<!DOCTYPE html><html><head><meta charset="utf-8"><style>
+body {{ margin: 0; padding: 0; background: #f4f4f7; font-family: Helvetica, Arial, sans-serif; }}
+.wrapper {{ width: 100%; background: #f4f4f7; }} .content {{ max-width: 600px; margin: 0 auto; }}
+.button {{ display: inline-block; padding: 10px 18px; background: #3869d4; color: #ffffff; border-radius: 3px; }}
+</style></head><body><table class="wrapper" width="100%" cellpadding="0" cellspacing="0" role="presentation">
+<tr><td align="center"><table class="content" width="600" cellpadding="0" cellspacing="0" role="presentation">
+<tr><td style="padding: 25px 0; text-align: center;"><a href="https://mail.example.com/?utm_source=email&amp;id={i}"
+style="font-size: 16px; font-weight: bold; color: #a8aaaf; text-decoration: none;">{subject}</a></td></tr>
+{sections}
+<tr><td style="padding: 35px; font-size: 12px; color: #a8aaaf;">You are receiving this email because you signed up.
+<a href="https://mail.example.com/unsubscribe?u={i}&amp;list=weekly" style="color: #a8aaaf;">Unsubscribe</a> |
+<a href="https://mail.example.com/preferences?u={i}" style="color: #a8aaaf;">Preferences</a></td></tr>
+</table></td></tr></table><img src="https://t.example.com/open.gif?m={i}" width="1" height="1" alt=""></body></html>"""
+
+SECTION = """<tr><td style="padding: 35px; background: #ffffff; border-radius: 4px;">
+<h1 style="margin-top: 0; color: #333333; font-size: 22px; font-weight: bold;">{subject}</h1>
+<p style="margin-top: 0; color: #51545e; font-size: 16px; line-height: 1.625;">{body}</p>
+<a href="https://t.example.com/c/{i}/{n}?redirect=https%3A%2F%2Fshop.example.com%2Fitem%2F{n}" class="button"
+style="color: #ffffff; text-decoration: none;">Read more</a></td></tr>"""
+
+
+def build_payload(n_emails, sections=6):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'training_data', 'training_emails.json')) as f:
+        samples = json.load(f)
+    emails = []
+    for i in range(n_emails):
+        parts = [samples[(i + n) % len(samples)] for n in range(sections)]
+        section_html = "".join(SECTION.format(i=i, n=n, subject=p['subject'], body=p['body'])
+                               for n, p in enumerate(parts))
+        emails.append(TEMPLATE.format(i=i, subject=parts[0]['subject'], sections=section_html))
+    return {"emails": emails}
+
+
+def serializers():
+    formats = [("json", lambda obj: json.dumps(obj).encode("utf-8"), json.loads)]
+    if wire._MSGPACK_AVAILABLE:
+        formats.append(("msgpack", wire.msgpack.packb, lambda data: wire.msgpack.unpackb(data, raw=False)))
+    return formats
+
+
+def decompress(data, encoding):
+    if encoding == "gzip":
+        return wire.gzip.decompress(data)
+    if encoding == "zstd":
+        return wire.zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /classify wire formats.")
+    parser.add_argument("--emails", type=int, default=500, help="Emails in the synthetic mailbox payload.")
+    parser.add_argument("--input", help="JSON file with a real {\"emails\": [...]} payload.")
+    parser.add_argument("--mbps", type=float, default=50.0, help="Link bandwidth in megabits per second.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported).")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            payload = json.load(f)
+    else:
+        payload = build_payload(args.emails)
+
+    baseline = len(json.dumps(payload).encode("utf-8"))
+    print(f"Payload: {len(payload['emails'])} emails, {baseline / 1024 / 1024:.2f} MB as JSON, "
+          f"link {args.mbps:g} Mbit/s, encodings: identity {' '.join(wire.ENCODINGS)}\n")
+
+    header = (f"{'format':<9}{'encoding':<10}{'size KB':>10}{'ratio':>8}{'encode ms':>11}"
+              f"{'decode ms':>11}{'transfer ms':>13}{'total ms':>10}")
+    print(header)
+    print("-" * len(header))
+    for name, dumps, loads in serializers():
+        for encoding in ("identity",) + wire.ENCODINGS:
+            def encode():
+                data = dumps(payload)
+                return data if encoding == "identity" else wire.compress(data, encoding)
+
+            body, encode_ms = timed(encode, args.repeat)
+            _, decode_ms = timed(lambda: loads(decompress(body, encoding)), args.repeat)
+            transfer_ms = len(body) * 8 / (args.mbps * 1e6) * 1000
+            print(f"{name:<9}{encoding:<10}{len(body) / 1024:>10.1f}{len(body) / baseline:>8.3f}{encode_ms:>11.2f}"
+                  f"{decode_ms:>11.2f}{transfer_ms:>13.2f}{encode_ms + decode_ms + transfer_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
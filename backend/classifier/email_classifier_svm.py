@@ -2,31 +2,84 @@
 import os
 import json
 import re
-import spacy
-from sklearn.base import BaseEstimator, TransformerMixin
+import hashlib
+import argparse
+import atexit
+import threading
+import joblib
+import numpy as np
+import sklearn
+from sklearn.base import BaseEstimator, TransformerMixin, clone
 from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.svm import SVC
+from sklearn.svm import SVC, LinearSVC
+from sklearn.kernel_approximation import Nystroem
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 from sklearn.metrics import confusion_matrix
-from bs4 import BeautifulSoup
-
-# Load spaCy model
-nlp = spacy.load("en_core_web_sm")
-
-# Patterns
-URL_PATTERN = r"https?://\S+"
-EMAIL_PATTERN = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
-DATE_PATTERN = r"\b\d{4}-\d{2}-\d{2}\b"
-PHONE_PATTERN = r"\b\d{10}\b"
-NUM_PATTERN = r"\b\d+\b"
-
-# Function to strip html with bs4
+from html_text import extract_text
+from lite_preprocessing import preprocess_lite_many, lite_config
+from text_patterns import URL_PATTERN, EMAIL_PATTERN, DATE_PATTERN, PHONE_PATTERN, NUM_PATTERN  # shared with the lite engine
+from ttl_cache import TTLCache
+from batching import MicroBatcher
+import metrics
+import tracing
+
+# Preprocessing engine: "spacy" (default, full NLP) or "lite" (regex only, no spaCy import)
+PREPROCESS_ENGINES = ("spacy", "lite")
+PREPROCESS_ENGINE = os.environ.get('EMAIL_PREPROCESS_ENGINE', 'spacy').strip().lower()
+if PREPROCESS_ENGINE not in PREPROCESS_ENGINES:
+    raise ValueError(f"Unknown EMAIL_PREPROCESS_ENGINE {PREPROCESS_ENGINE!r}, expected one of {PREPROCESS_ENGINES}")
+
+# Classifier engine on top of TF-IDF:
+#   "svc"      - exact RBF SVC (default; predict cost grows with the number of support vectors)
+#   "linear"   - LinearSVC, linear-time training and O(n_features) predict
+#   "nystroem" - Nystroem RBF feature map + LinearSVC (approximate kernel, fixed predict cost)
+#   "online"   - hashing vectorizer + SGDClassifier updated incrementally via /feedback
+#                (see online_classifier.py)
+CLASSIFIER_ENGINES = ("svc", "linear", "nystroem")
+CLASSIFIER_ENGINE = os.environ.get('EMAIL_CLASSIFIER_ENGINE', 'svc').strip().lower()
+if CLASSIFIER_ENGINE not in CLASSIFIER_ENGINES + ("online",):
+    raise ValueError(
+        f"Unknown EMAIL_CLASSIFIER_ENGINE {CLASSIFIER_ENGINE!r}, expected one of {CLASSIFIER_ENGINES + ('online',)}"
+    )
+NYSTROEM_COMPONENTS = int(os.environ.get('NYSTROEM_COMPONENTS', '300'))
+
+# spaCy components the token filter in preprocess() actually reads:
+# lemma_ needs lemmatizer (+ tagger/attribute_ruler for POS, tok2vec feeding the tagger),
+# ent_type_ needs ner. is_stop / is_punct are lexical attributes. Everything else
+# (parser, senter, ...) is disabled.
+SPACY_COMPONENTS = ("tok2vec", "tagger", "attribute_ruler", "lemmatizer", "ner")
+
+# nlp.pipe tuning; n_process > 1 fans batches out to worker processes
+SPACY_BATCH_SIZE = int(os.environ.get('SPACY_BATCH_SIZE', '64'))
+SPACY_N_PROCESS = int(os.environ.get('SPACY_N_PROCESS', '1'))
+
+SPACY_MODEL = "en_core_web_sm"
+
+# spaCy model, loaded by get_nlp() (only imported when the spaCy engine is used)
+nlp = None
+
+
+def get_nlp():
+    global nlp
+    if nlp is None:
+        import spacy
+        loaded = spacy.load(SPACY_MODEL)
+        for name in loaded.pipe_names:
+            if name not in SPACY_COMPONENTS:
+                loaded.disable_pipe(name)
+        nlp = loaded
+    return nlp
+
+
+if PREPROCESS_ENGINE == "spacy":
+    get_nlp()
+
+# Function to strip html (bounded streaming extractor, see html_text.py)
 def strip_html(text):
-  soup = BeautifulSoup(text, "html.parser")
-  return soup.get_text(" ", strip=True)
+  return extract_text(text)
 
 
 # Backwards-compatible helper functions expected by old tests
@@ -55,7 +108,7 @@ def replace_regex(text: str) -> str:
 
 def replace_ner(text: str) -> str:
     # Replace named entities with their entity type in angle brackets
-    doc = nlp(text)
+    doc = get_nlp()(text)
     out = []
     last = 0
     for ent in doc.ents:
@@ -71,7 +124,7 @@ def preprocess_text(text: str) -> str:
     # Ensure returned text is fully lowercase to remain compatible with legacy tests
     return preprocess(text).lower()
 
-def preprocess(text):
+def _replace_patterns(text):
   # 1. Lowercase
   text = text.lower()
 
@@ -81,10 +134,9 @@ def preprocess(text):
   text = re.sub(DATE_PATTERN, " DATE ", text)
   text = re.sub(PHONE_PATTERN, " PHONE ", text)
   text = re.sub(NUM_PATTERN, " NUM ", text)
+  return text
 
-  # 3. Run spaCy pipeline (tokenization, POS, NER)
-  doc = nlp(text)
-
+def _doc_to_tokens(doc):
   tokens = []
   for token in doc:
     # NER replacement
@@ -109,65 +161,461 @@ def preprocess(text):
 
   return " ".join(tokens)
 
+def preprocess_many(texts, batch_size=None, n_process=None):
+  """
+  Preprocess a batch of texts, streaming them through nlp.pipe.
+
+  Args:
+      texts (iterable): Raw (HTML-stripped) texts.
+      batch_size (int): Documents per nlp.pipe batch (default SPACY_BATCH_SIZE).
+      n_process (int): Worker processes for nlp.pipe (default SPACY_N_PROCESS).
+
+  Returns:
+      list: Cleaned, space-separated token strings in input order.
+  """
+  normalized = [_replace_patterns(text) for text in texts]
+  if not normalized:
+    return []
+
+  # 3. Run the trimmed spaCy pipeline (tokenization, POS for lemmas, NER)
+  docs = get_nlp().pipe(
+      normalized,
+      batch_size=batch_size or SPACY_BATCH_SIZE,
+      n_process=n_process or SPACY_N_PROCESS,
+  )
+  return [_doc_to_tokens(doc) for doc in docs]
+
+def preprocess(text):
+  return preprocess_many([text], n_process=1)[0]
+
+
+_ENGINE_FUNCS = {
+    "spacy": preprocess_many,
+    "lite": preprocess_lite_many,
+}
+
+
+class TextPreprocessor(BaseEstimator, TransformerMixin):
+    """Pipeline step that preprocesses the whole input batch with the given engine."""
+
+    def __init__(self, engine="spacy", batch_size=None, n_process=None):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.n_process = n_process
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        return _ENGINE_FUNCS[self.engine](X, batch_size=self.batch_size, n_process=self.n_process)
+
+def _split_tokens(text):
+    # Module-level (not a lambda) so the fitted pipeline can be pickled
+    return text.split()
+
 vectorizer = TfidfVectorizer(
-    preprocessor=preprocess,
-    tokenizer=lambda x: x.split(),   # use cleaned tokens
+    lowercase=False,   # preprocess_many already lowercases (entity labels stay upper case)
+    tokenizer=_split_tokens,   # use cleaned tokens
+    token_pattern=None,
     # ngram_range=(1, 2),
     # max_features=50000
 )
 
-# Load json
-import json
-
-texts = []
-labels = []
-
-# Open json (module-relative path so imports work from repo root or tests)
+# Paths (module-relative so imports work from repo root or tests)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TRAINING_EMAILS_PATH = os.path.join(BASE_DIR, 'training_data', 'training_emails.json')
+MODEL_DIR = os.path.join(BASE_DIR, 'model')
 
-with open(TRAINING_EMAILS_PATH, "r", encoding="utf-8") as f:
-    emails = json.load(f)
 
-for email in emails:
-    subject = email.get('subject', '')
-    body = email.get('body', '')
-    # Concatenate subject and body with a separator for better context
-    combined_text = f"{subject}\n\n{body}"
+def pipeline_path(engine=PREPROCESS_ENGINE, classifier=CLASSIFIER_ENGINE):
+    # Default engines keep the original artifact name
+    suffix = ''.join(f'_{part}' for part, default in ((engine, 'spacy'), (classifier, 'svc')) if part != default)
+    return os.path.join(MODEL_DIR, f'email_pipeline{suffix}.joblib')
 
-    texts.append(combined_text)
-    labels.append(email.get('label', ''))
 
-X_train, X_test, y_train, y_test = train_test_split(texts, labels, test_size=0.2, random_state=42, stratify=labels)
+PIPELINE_PATH = pipeline_path()
 
-from sklearn.svm import SVC
 
-model = Pipeline([
-    ('tfidf', vectorizer),
-    ('svm', SVC(kernel='rbf'))
-])
+def online_model_path(engine=PREPROCESS_ENGINE):
+    suffix = '' if engine == 'spacy' else f'_{engine}'
+    return os.path.join(MODEL_DIR, f'email_online_model{suffix}.joblib')
 
-model.fit(X_train, y_train)
+# Bump whenever preprocess() or the pipeline layout changes in a way that
+# makes previously persisted artifacts stale.
+PIPELINE_VERSION = 2
 
-print("SVM model trained successfully.")
+# Set EMAIL_CLASSIFIER_RETRAIN=1 to ignore the persisted artifact at startup
+RETRAIN_ON_START = os.environ.get('EMAIL_CLASSIFIER_RETRAIN', '').lower() in ('1', 'true', 'yes')
+
+# Arrays in the persisted pipeline are memory-mapped read-only, so prefork
+# workers share their pages; MODEL_MMAP_MODE="" loads them into process memory
+MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE', 'r') or None
+
+
+def load_training_data(path=TRAINING_EMAILS_PATH):
+    """Load training emails as parallel lists of texts and labels."""
+    texts = []
+    labels = []
+
+    with open(path, "r", encoding="utf-8") as f:
+        emails = json.load(f)
+
+    for email in emails:
+        subject = email.get('subject', '')
+        body = email.get('body', '')
+        # Concatenate subject and body with a separator for better context
+        combined_text = f"{subject}\n\n{body}"
+
+        texts.append(combined_text)
+        labels.append(email.get('label', ''))
+
+    return texts, labels
+
+
+def split_training_data(texts, labels):
+    return train_test_split(texts, labels, test_size=0.2, random_state=42, stratify=labels)
+
+
+def build_classifier(classifier=CLASSIFIER_ENGINE):
+    if classifier == 'linear':
+        return LinearSVC()
+    if classifier == 'nystroem':
+        # TF-IDF rows are L2-normalized, so gamma=1.0 matches SVC's gamma='scale'
+        return Pipeline([
+            ('kernel', Nystroem(kernel='rbf', gamma=1.0, n_components=NYSTROEM_COMPONENTS, random_state=42)),
+            ('linear', LinearSVC())
+        ])
+    return SVC(kernel='rbf')
+
+
+def build_pipeline(engine=PREPROCESS_ENGINE, classifier=CLASSIFIER_ENGINE):
+    return Pipeline([
+        ('preprocess', TextPreprocessor(engine=engine)),
+        ('tfidf', clone(vectorizer)),
+        ('svm', build_classifier(classifier))
+    ])
+
+
+def preprocessing_config(engine=PREPROCESS_ENGINE, classifier=CLASSIFIER_ENGINE):
+    """Everything besides the training data that determines the fitted pipeline."""
+    config = {
+        'pipeline_version': PIPELINE_VERSION,
+        'engine': engine,
+        'classifier': classifier,
+        'sklearn_version': sklearn.__version__,
+        'svm_params': build_classifier(classifier).get_params(),
+    }
+    if engine == 'lite':
+        config['lite'] = lite_config()
+    else:
+        import spacy
+        spacy_nlp = get_nlp()
+        config.update({
+            'patterns': [URL_PATTERN, EMAIL_PATTERN, DATE_PATTERN, PHONE_PATTERN, NUM_PATTERN],
+            'spacy_components': [name for name in spacy_nlp.pipe_names if name in SPACY_COMPONENTS],
+            'spacy_model': f"{spacy_nlp.meta.get('lang', '')}_{spacy_nlp.meta.get('name', '')}",
+            'spacy_model_version': spacy_nlp.meta.get('version', ''),
+            'spacy_version': spacy.__version__,
+        })
+    return config
+
+
+def compute_training_hash(path=TRAINING_EMAILS_PATH, engine=PREPROCESS_ENGINE, classifier=CLASSIFIER_ENGINE):
+    """Hash the training data together with the preprocessing config.
+
+    The persisted pipeline is only reused while this hash matches.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(json.dumps(preprocessing_config(engine, classifier), sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def save_pipeline(pipeline, training_hash, path=PIPELINE_PATH):
+    """Write the artifact atomically so concurrently booting workers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump({'hash': training_hash, 'pipeline': pipeline}, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_pipeline(training_hash, path=PIPELINE_PATH):
+    """Return the persisted pipeline if it was built from `training_hash`, else None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        artifact = joblib.load(path, mmap_mode=MODEL_MMAP_MODE)
+    except Exception as e:
+        print(f"Could not load email pipeline from {path}: {e}")
+        return None
+    if not isinstance(artifact, dict) or artifact.get('hash') != training_hash:
+        return None
+    return artifact.get('pipeline')
+
+
+def train_pipeline(save=True, training_hash=None, path=PIPELINE_PATH, engine=PREPROCESS_ENGINE,
+                   classifier=CLASSIFIER_ENGINE):
+    texts, labels = load_training_data()
+    X_train, X_test, y_train, y_test = split_training_data(texts, labels)
+
+    pipeline = build_pipeline(engine, classifier)
+    pipeline.fit(X_train, y_train)
+
+    print(f"SVM model trained successfully ({engine} preprocessing, {classifier} classifier).")
+
+    if save:
+        save_pipeline(pipeline, training_hash or compute_training_hash(engine=engine, classifier=classifier), path)
+        print(f"Saved email pipeline to {path}")
+
+    return pipeline
+
+
+model = None
+# Training hash (or online model version) of the loaded pipeline; part of every cached label key
+model_hash = None
+# OnlineEmailClassifier when EMAIL_CLASSIFIER_ENGINE=online
+online_learner = None
+
+# Content-addressed caches for /classify, keyed by a hash of the raw email body.
+# Tokens only depend on the preprocessing engine; labels also depend on the model.
+CLASSIFY_CACHE_SIZE = int(os.environ.get('CLASSIFY_CACHE_SIZE', '10000'))
+CLASSIFY_CACHE_TTL = float(os.environ.get('CLASSIFY_CACHE_TTL', '86400'))
+TOKEN_CACHE = TTLCache(CLASSIFY_CACHE_SIZE, CLASSIFY_CACHE_TTL)
+LABEL_CACHE = TTLCache(CLASSIFY_CACHE_SIZE, CLASSIFY_CACHE_TTL)
 
-def predict_email_label(email_string):
-    # Strip HTML from the email string
-    stripped_string = strip_html(email_string)
 
-    # Preprocess the input string using the preprocessor
-    # processed_string = preprocess(stripped_string)
+def _set_model(pipeline, training_hash):
+    global model, model_hash
+    model, model_hash = pipeline, training_hash
+    # Labels from a previous artifact are stale
+    LABEL_CACHE.clear()
 
-    # Vectorize the processed string using the fitted TF-IDF vectorizer
-    # The vectorizer expects an iterable (list) of strings
-    # vectorized_string = vectorizer.transform([processed_string])
 
-    # Predict the label using the trained SVM model
-    # prediction = svm_model.predict(vectorized_string)
+def cache_stats():
+    return {"labels": LABEL_CACHE.stats(), "tokens": TOKEN_CACHE.stats()}
 
-    prediction = model.predict([stripped_string])
 
-    return prediction[0]
+metrics.register_collector(lambda: metrics.cache_families(
+    {f"classify_{name}": stats for name, stats in cache_stats().items()}))
+
+
+def content_key(email_string):
+    return hashlib.sha256(email_string.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def init_model(force_train=False, path=PIPELINE_PATH):
+    """Load the persisted pipeline, retraining only if the training hash changed or when forced."""
+
+    # if model already loaded and not forcing re-train, skip
+    if model is not None and not force_train:
+        return model
+
+    if CLASSIFIER_ENGINE == 'online':
+        return _init_online_model(force_train)
+
+    training_hash = compute_training_hash()
+    if not force_train:
+        pipeline = load_pipeline(training_hash, path)
+        if pipeline is not None:
+            _set_model(pipeline, training_hash)
+            print(f"Loaded email pipeline from {path}")
+            return model
+
+    _set_model(train_pipeline(save=True, training_hash=training_hash, path=path), training_hash)
+    return model
+
+
+def _init_online_model(force_train=False, path=None):
+    """Resume the online model from its last checkpoint, or bootstrap it from the training data."""
+    global online_learner
+    from online_classifier import OnlineEmailClassifier
+
+    online_learner = OnlineEmailClassifier(path or online_model_path(), TextPreprocessor(engine=PREPROCESS_ENGINE))
+    if force_train or not online_learner.load():
+        texts, labels = load_training_data()
+        online_learner.bootstrap(online_learner.preprocessor.transform(texts), labels)
+    global _exit_checkpoint_registered
+    if not _exit_checkpoint_registered:
+        atexit.register(_checkpoint_at_exit)
+        _exit_checkpoint_registered = True
+    _set_model(online_learner.pipeline, online_learner.model_id)
+    return model
+
+
+# atexit.register() is called once, however often the online model is (re)initialized
+_exit_checkpoint_registered = False
+
+
+def _checkpoint_at_exit():
+    """Don't lose feedback applied since the last periodic checkpoint.
+
+    Only a process that applied feedback writes: a gunicorn master that preloaded
+    the model never does, and must not overwrite its worker's checkpoint.
+    """
+    if online_learner is not None and online_learner.pending:
+        online_learner.checkpoint()
+
+
+_ensure_lock = threading.Lock()
+
+
+def ensure_model():
+    """
+    The loaded pipeline, loading it on first use (EMAIL_CLASSIFIER_RETRAIN=1 retrains instead).
+
+    Importing this module never loads or trains anything; the service loads
+    the model through warmup.py, and prediction calls load it if nobody has.
+    """
+    if model is None:
+        with _ensure_lock:
+            if model is None:
+                init_model(force_train=RETRAIN_ON_START)
+    return model
+
+def _tokens_for(preprocessor, keys, email_strings, texts=None):
+    """
+    Token strings per content key, from TOKEN_CACHE or one batched preprocess of the misses.
+
+    `texts` may hold the already HTML-stripped text of each email (e.g. from
+    html_text.extract_text_and_links), in which case the HTML is not parsed again.
+    """
+    if texts is None:
+        texts = [None] * len(keys)
+    tokens = {}
+    to_preprocess = {}
+    for key, email_string, text in zip(keys, email_strings, texts):
+        if key in tokens or key in to_preprocess:
+            continue
+        cached_tokens = TOKEN_CACHE.get((preprocessor.engine, key))
+        if cached_tokens is not None:
+            tokens[key] = cached_tokens
+        else:
+            to_preprocess[key] = (email_string, text)
+
+    if to_preprocess:
+        # Strip HTML from every new email string that wasn't stripped by the caller
+        with metrics.stage("strip_html", emails=len(to_preprocess)):
+            stripped_strings = []
+            for key, (email_string, text) in to_preprocess.items():
+                if text is None:
+                    with tracing.span("strip_html.email", key=key[:16], chars=len(email_string)):
+                        text = strip_html(email_string)
+                stripped_strings.append(text)
+
+        # Preprocess the whole batch with the engine the pipeline was trained with
+        with metrics.stage("preprocess", texts=len(stripped_strings),
+                           chars=sum(len(text) for text in stripped_strings)):
+            processed_strings = preprocessor.transform(stripped_strings)
+        for key, processed in zip(to_preprocess, processed_strings):
+            tokens[key] = processed
+            TOKEN_CACHE.set((preprocessor.engine, key), processed)
+
+    return tokens
+
+def _decision_scores(classifier, vectorized):
+    """Per-class decision scores as an (n_samples, n_classes) array."""
+    decision = classifier.decision_function(vectorized)
+    if decision.ndim == 1:
+        # Binary classifiers return the score of classes_[1] only
+        decision = np.column_stack([-decision, decision])
+    return decision
+
+def predict_email_labels(email_strings, with_scores=False, texts=None):
+    """
+    Predict labels for a batch of raw email strings.
+
+    Bodies seen before are answered from LABEL_CACHE (or reuse their cached
+    tokens from TOKEN_CACHE). The remaining unique bodies are HTML-stripped
+    and preprocessed as one batch, then go through a single TF-IDF transform
+    (one sparse matrix) and a single SVM predict call.
+
+    With `with_scores=True` the single SVM call is `decision_function` instead,
+    and each result is a `(label, {class: score})` tuple whose label is the
+    argmax of the scores. For the OvO SVC this matches `predict` except when
+    two classes tie on votes exactly.
+
+    `texts`, if given, is the extracted text of each email, so bodies that
+    need preprocessing are not HTML-parsed a second time. Cache keys still come
+    from the raw bodies.
+    """
+    if not email_strings:
+        return []
+
+    ensure_model()
+    # Snapshot the model so a concurrent reload can't mix pipelines mid-batch
+    pipeline, pipeline_hash = model, model_hash
+    cache_kind = 'scores' if with_scores else 'label'
+
+    keys = [content_key(email_string) for email_string in email_strings]
+    if texts is None:
+        texts = [None] * len(email_strings)
+    results = {}
+    uncached = []
+    for key, email_string, text in zip(keys, email_strings, texts):
+        if key in results:
+            continue
+        cached = LABEL_CACHE.get((pipeline_hash, key, cache_kind))
+        if cached is not None:
+            results[key] = cached
+        else:
+            uncached.append((key, email_string, text))
+
+    if uncached:
+        tokens = _tokens_for(pipeline.named_steps['preprocess'], *zip(*uncached))
+
+        # Vectorize the whole batch at once with the fitted TF-IDF vectorizer
+        with metrics.stage("tfidf", rows=len(tokens)):
+            vectorized = pipeline.named_steps['tfidf'].transform(list(tokens.values()))
+
+        # One SVM evaluation for all rows
+        classifier = pipeline.named_steps['svm']
+        if with_scores:
+            classes = [str(c) for c in classifier.classes_]
+            with metrics.stage("svc_predict", rows=len(tokens)):
+                decision = _decision_scores(classifier, vectorized)
+            for key, row in zip(tokens, decision):
+                result = (classes[int(row.argmax())], dict(zip(classes, row.tolist())))
+                results[key] = result
+                LABEL_CACHE.set((pipeline_hash, key, 'scores'), result)
+        else:
+            with metrics.stage("svc_predict", rows=len(tokens)):
+                predictions = classifier.predict(vectorized).tolist()
+            for key, prediction in zip(tokens, predictions):
+                results[key] = prediction
+                LABEL_CACHE.set((pipeline_hash, key, 'label'), prediction)
+
+    return [results[key] for key in keys]
+
+# Concurrent classify() calls are coalesced into one predict_email_labels batch
+CLASSIFY_BATCHER = MicroBatcher("classify", predict_email_labels)
+
+def apply_feedback(emails, labels):
+    """
+    Fold labeled emails into the online model and swap it in.
+
+    Args:
+        emails (list): Email bodies as strings.
+        labels (list): Correct label for each email.
+
+    Returns:
+        str: The new model version id.
+    """
+    ensure_model()
+    if online_learner is None:
+        raise RuntimeError("Feedback requires EMAIL_CLASSIFIER_ENGINE=online")
+    if len(emails) != len(labels):
+        raise ValueError("emails and labels must have the same length")
+    if not emails:
+        return model_hash
+
+    keys = [content_key(email_string) for email_string in emails]
+    tokens = _tokens_for(online_learner.preprocessor, keys, emails)
+    return online_learner.update([tokens[key] for key in keys], list(labels), on_swap=_set_model)
+
+def predict_email_label(email_string):
+    return predict_email_labels([email_string])[0]
 
 def classify(emails):
     """
@@ -180,17 +628,51 @@ def classify(emails):
         list: Predicted labels for each email.
     """
 
-    # run predict email label for each email in emails
-    predictions = [predict_email_label(email) for email in emails]
+    # single batched pass, shared with other requests arriving within BATCH_MAX_WAIT_MS
+    return CLASSIFY_BATCHER.submit(emails)
+
+def classify_with_scores(emails, top_k=None):
+    """
+    Classify emails and report per-class decision scores from the same batched pass.
+
+    Args:
+        emails (list): List of email bodies as strings.
+        top_k (int): How many best labels to list per email (default: all classes).
 
-    return predictions
+    Returns:
+        list: One dict per email: {"label": ..., "scores": {class: score}, "top_k": [{"label", "score"}, ...]}.
+    """
+    results = []
+    for label, scores in predict_email_labels(list(emails), with_scores=True):
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if top_k is not None:
+            ranked = ranked[:top_k]
+        results.append({
+            "label": label,
+            "scores": scores,
+            "top_k": [{"label": name, "score": score} for name, score in ranked],
+        })
+    return results
 
 if __name__ == "__main__":
+    # Train through the importable module: a pipeline pickled from __main__ refers to
+    # __main__.TextPreprocessor, which the service cannot load. Importing it loads nothing.
+    import email_classifier_svm as classifier
+
+    parser = argparse.ArgumentParser(description="Train/evaluate the email classifier pipeline.")
+    parser.add_argument("--retrain", action="store_true", help="Refit and overwrite the persisted pipeline.")
+    parser.add_argument("--path", default=classifier.PIPELINE_PATH, help="Pipeline artifact to write.")
+    args = parser.parse_args()
+
+    # Loads (or, when stale or asked to, trains and writes) only the artifact at --path
+    classifier.init_model(force_train=args.retrain, path=args.path)
+
     # Evaluate model
-    y_pred = model.predict(X_test)
+    X_train, X_test, y_train, y_test = classifier.split_training_data(*classifier.load_training_data())
+    y_pred = classifier.model.predict(X_test)
 
     print("Classification Report:")
     print(classification_report(y_test, y_pred))
 
     print("Confusion Matrix:")
-    print(confusion_matrix(y_test, y_pred))
\ No newline at end of file
+    print(confusion_matrix(y_test, y_pred))
@@ -0,0 +1,34 @@
+"""
+gunicorn settings for the classifier service (see wsgi.py):
+
+    cd backend/classifier
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Environment:
+  CLASSIFIER_BIND     - address to listen on (default 0.0.0.0:5001, same as `python svm_model.py`)
+  CLASSIFIER_WORKERS  - number of prefork worker processes (default 2)
+  CLASSIFIER_THREADS  - threads per worker (default 24; > 1 selects the gthread worker). Keep it above
+                        ADMISSION_MAX_ACTIVE plus both ADMISSION_*_MAX_QUEUED so overload is
+                        answered with 429 instead of piling up in the accept backlog
+  CLASSIFIER_TIMEOUT  - seconds before a silent worker is killed and restarted (default 60)
+  CLASSIFIER_MAX_REQUESTS - recycle a worker after this many requests, 0 = never (default 0)
+
+EMAIL_CLASSIFIER_ENGINE=online needs CLASSIFIER_WORKERS=1: the online model and
+its feedback live in one process, so further workers would serve diverging
+models and overwrite each other's checkpoints.
+"""
+import os
+
+bind = os.environ.get('CLASSIFIER_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('CLASSIFIER_WORKERS', '2'))
+threads = int(os.environ.get('CLASSIFIER_THREADS', '24'))
+timeout = int(os.environ.get('CLASSIFIER_TIMEOUT', '60'))
+max_requests = int(os.environ.get('CLASSIFIER_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+if os.environ.get('EMAIL_CLASSIFIER_ENGINE', 'svc').strip().lower() == 'online' and workers != 1:
+    raise RuntimeError(f"EMAIL_CLASSIFIER_ENGINE=online needs CLASSIFIER_WORKERS=1, got {workers}")
+
+# Load wsgi.py (and with it every model) once in the master, then fork
+preload_app = True
+
@@ -0,0 +1,124 @@
+"""
+Bounded HTML-to-text and link extraction for email bodies.
+
+Shared by email_classifier_svm.strip_html() (/classify) and /classify_links so
+both use the same fast path:
+
+- input longer than HTML_MAX_INPUT_CHARS is truncated before parsing,
+- the stdlib parser is fed in chunks and stops as soon as HTML_MAX_TEXT_CHARS
+  of text have been collected (unless links are still wanted),
+- <script>, <style> and <template> contents are dropped,
+- selectolax's lexbor parser is used when installed (HTML_PARSER_BACKEND=html.parser
+  forces the stdlib streaming parser).
+
+Whitespace in the extracted text is normalized to single spaces.
+"""
+import os
+from html.parser import HTMLParser
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    _SELECTOLAX_AVAILABLE = True
+except Exception:
+    _SELECTOLAX_AVAILABLE = False
+
+HTML_MAX_INPUT_CHARS = int(os.environ.get('HTML_MAX_INPUT_CHARS', '1000000'))
+HTML_MAX_TEXT_CHARS = int(os.environ.get('HTML_MAX_TEXT_CHARS', '100000'))
+_FEED_CHUNK_CHARS = 64 * 1024
+
+_SKIP_TAGS = ("script", "style", "template")
+
+BACKEND = os.environ.get('HTML_PARSER_BACKEND', 'selectolax' if _SELECTOLAX_AVAILABLE else 'html.parser')
+if BACKEND == 'selectolax' and not _SELECTOLAX_AVAILABLE:
+    BACKEND = 'html.parser'
+
+
+class _StreamingExtractor(HTMLParser):
+    def __init__(self, max_text_chars, want_text=True, want_links=False):
+        super().__init__(convert_charrefs=True)
+        self.max_text_chars = max_text_chars
+        self.want_text = want_text
+        self.want_links = want_links
+        self.parts = []
+        self.links = []
+        self.text_chars = 0
+        self._skip_depth = 0
+
+    @property
+    def done(self):
+        text_done = not self.want_text or self.text_chars >= self.max_text_chars
+        return text_done and not self.want_links
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "a" and self.want_links:
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth or not self.want_text or self.text_chars >= self.max_text_chars:
+            return
+        words = data.split()
+        if words:
+            part = " ".join(words)
+            self.parts.append(part)
+            self.text_chars += len(part) + 1
+
+
+def _extract_stdlib(html, max_text_chars, want_text, want_links):
+    parser = _StreamingExtractor(max_text_chars, want_text, want_links)
+    for start in range(0, len(html), _FEED_CHUNK_CHARS):
+        parser.feed(html[start:start + _FEED_CHUNK_CHARS])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return " ".join(parser.parts), parser.links
+
+
+def _extract_selectolax(html, want_text, want_links):
+    tree = LexborHTMLParser(html)
+    links = []
+    if want_links:
+        links = [node.attributes.get("href") for node in tree.css("a[href]")]
+        links = [href for href in links if href]
+    text = ""
+    if want_text:
+        tree.strip_tags(list(_SKIP_TAGS))
+        text = " ".join(tree.root.text(separator=" ").split()) if tree.root else ""
+    return text, links
+
+
+def _extract(html, max_input_chars, max_text_chars, want_text, want_links):
+    if not html:
+        return "", []
+    max_input_chars = HTML_MAX_INPUT_CHARS if max_input_chars is None else max_input_chars
+    max_text_chars = HTML_MAX_TEXT_CHARS if max_text_chars is None else max_text_chars
+    html = html[:max_input_chars]
+
+    if BACKEND == 'selectolax':
+        text, links = _extract_selectolax(html, want_text, want_links)
+    else:
+        text, links = _extract_stdlib(html, max_text_chars, want_text, want_links)
+    return text[:max_text_chars], links
+
+
+def extract_text(html, max_input_chars=None, max_text_chars=None):
+    """Visible text of an HTML (or plain text) email body."""
+    return _extract(html, max_input_chars, max_text_chars, want_text=True, want_links=False)[0]
+
+
+def extract_links(html, max_input_chars=None):
+    """All non-empty <a href> values in document order (duplicates kept)."""
+    return _extract(html, max_input_chars, 0, want_text=False, want_links=True)[1]
+
+
+def extract_text_and_links(html, max_input_chars=None, max_text_chars=None):
+    """Text and <a href> values from a single parse."""
+    return _extract(html, max_input_chars, max_text_chars, want_text=True, want_links=True)
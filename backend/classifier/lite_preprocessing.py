@@ -0,0 +1,131 @@
+"""
+Regex-only ("lite") preprocessing engine for the email classifier.
+
+Drop-in alternative to email_classifier_svm.preprocess() for deployments that
+cannot afford spaCy's import time and memory footprint:
+
+- one precompiled, combined regex pass replaces URL/EMAIL/DATE/PHONE/NUM
+  (instead of five sequential re.sub calls plus spaCy NER),
+- a static English stopword list,
+- a lookup-table lemmatizer with a few plural suffix rules.
+
+Select it with EMAIL_PREPROCESS_ENGINE=lite (see email_classifier_svm.py).
+"""
+import re
+from functools import lru_cache
+
+from text_patterns import PLACEHOLDER_PATTERNS
+
+# Bump when the output of preprocess_lite() changes
+LITE_VERSION = 1
+
+# The spaCy engine's patterns (text_patterns.py); alternation order decides
+# which placeholder wins when several could match at one position.
+LITE_PATTERNS = PLACEHOLDER_PATTERNS
+
+_PLACEHOLDER_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in LITE_PATTERNS))
+_WORD_RE = re.compile(r"[A-Za-z]+")
+
+PLACEHOLDERS = frozenset(name for name, _ in LITE_PATTERNS)
+
+# Static English stopword list (same words as scikit-learn's ENGLISH_STOP_WORDS,
+# inlined so this module imports nothing heavier than `re`)
+STOPWORDS = frozenset("""
+a about above across after afterwards again against all almost alone along already also although
+always am among amongst amoungst amount an and another any anyhow anyone anything anyway
+anywhere are around as at back be became because become becomes becoming been before beforehand
+behind being below beside besides between beyond bill both bottom but by call can cannot cant co
+con could couldnt cry de describe detail do done down due during each eg eight either eleven
+else elsewhere empty enough etc even ever every everyone everything everywhere except few
+fifteen fifty fill find fire first five for former formerly forty found four from front full
+further get give go had has hasnt have he hence her here hereafter hereby herein hereupon hers
+herself him himself his how however hundred i ie if in inc indeed interest into is it its itself
+keep last latter latterly least less ltd made many may me meanwhile might mill mine more
+moreover most mostly move much must my myself name namely neither never nevertheless next nine
+no nobody none noone nor not nothing now nowhere of off often on once one only onto or other
+others otherwise our ours ourselves out over own part per perhaps please put rather re same see
+seem seemed seeming seems serious several she should show side since sincere six sixty so some
+somehow someone something sometime sometimes somewhere still such system take ten than that the
+their them themselves then thence there thereafter thereby therefore therein thereupon these
+they thick thin third this those though three through throughout thru thus to together too top
+toward towards twelve twenty two un under until up upon us very via was we well were what
+whatever when whence whenever where whereafter whereas whereby wherein whereupon wherever
+whether which while whither who whoever whole whom whose why will with within without would yet
+you your yours yourself yourselves
+""".split())
+
+# Irregular forms the suffix rules below would get wrong
+LEMMA_TABLE = {
+    "am": "be", "is": "be", "are": "be", "was": "be", "were": "be", "been": "be", "being": "be",
+    "has": "have", "had": "have", "having": "have",
+    "does": "do", "did": "do", "done": "do", "doing": "do",
+    "went": "go", "gone": "go", "goes": "go",
+    "got": "get", "gotten": "get",
+    "made": "make", "paid": "pay", "said": "say", "sent": "send", "bought": "buy",
+    "brought": "bring", "came": "come", "took": "take", "taken": "take", "gave": "give",
+    "given": "give", "saw": "see", "seen": "see", "knew": "know", "known": "know",
+    "thought": "think", "told": "tell", "found": "find", "left": "leave", "felt": "feel",
+    "kept": "keep", "held": "hold", "met": "meet", "ran": "run", "won": "win", "lost": "lose",
+    "wrote": "write", "written": "write", "began": "begin", "begun": "begin",
+    "children": "child", "people": "person", "men": "man", "women": "woman",
+    "feet": "foot", "teeth": "tooth", "mice": "mouse", "data": "datum",
+    "better": "good", "best": "good", "worse": "bad", "worst": "bad",
+    "news": "news", "series": "series", "status": "status", "bonus": "bonus",
+    "address": "address", "business": "business", "access": "access", "process": "process",
+}
+
+
+@lru_cache(maxsize=65536)
+def lemmatize(word):
+    """Lemmatize a lowercase word via LEMMA_TABLE, then simple plural suffix rules."""
+    lemma = LEMMA_TABLE.get(word)
+    if lemma is not None:
+        return lemma
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def _placeholder(match):
+    return f" {match.lastgroup} "
+
+
+def preprocess_lite(text):
+    # 1. Lowercase
+    text = text.lower()
+
+    # 2. Replace all patterns in one scan
+    text = _PLACEHOLDER_RE.sub(_placeholder, text)
+
+    # 3. Tokenize, drop stopwords, lemmatize
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        if word in PLACEHOLDERS:
+            tokens.append(word)
+            continue
+        if word in STOPWORDS:
+            continue
+        lemma = lemmatize(word)
+        if len(lemma) < 2:
+            continue
+        tokens.append(lemma)
+
+    return " ".join(tokens)
+
+
+def preprocess_lite_many(texts, batch_size=None, n_process=None):
+    """Batch API with the same signature as email_classifier_svm.preprocess_many."""
+    return [preprocess_lite(text) for text in texts]
+
+
+def lite_config():
+    return {
+        'lite_version': LITE_VERSION,
+        'patterns': [pattern for _, pattern in LITE_PATTERNS],
+        'stopwords': sorted(STOPWORDS),
+        'lemma_table': sorted(LEMMA_TABLE.items()),
+    }
@@ -0,0 +1,224 @@
+"""
+Prometheus-style metrics for the classifier service, served as text by GET /metrics.
+
+- classifier_requests_total{endpoint,method,status} and
+  classifier_request_errors_total{endpoint} (5xx responses), counted by
+  Flask hooks registered in init_app().
+- classifier_request_duration_seconds{endpoint}: time until the response is
+  returned (for NDJSON streams, until the stream starts).
+- classifier_stage_duration_seconds{stage}: one observation per batch call of
+  a model stage (see STAGES), recorded with `with metrics.stage(name):` or
+  observe_stage(). stage() also opens a trace span (see tracing.py).
+- Gauges and counters owned by other modules (cache hit/miss counts, admission
+  slots, prefetch queue) are read at scrape time from collectors added with
+  register_collector(), so loading a model is never triggered by a scrape.
+
+No client library is needed; the exposition format is written directly.
+Metrics are per process: under gunicorn each worker keeps its own, so scrape
+the workers individually or run one worker per scrape target.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+import tracing
+
+# Upper bounds in seconds; +Inf is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGES = (
+    "strip_html",        # HTML to text (html_text.extract_text / extract_text_and_links)
+    "preprocess",        # spaCy or lite token preprocessing
+    "tfidf",             # TF-IDF transform
+    "svc_predict",       # email SVM predict / decision_function
+    "extract_links",     # anchor extraction for /classify_links
+    "top1m_lookup",      # registered domain + Top-1M allowlist checks
+    "link_features",     # URL feature extraction
+    "link_svc_predict",  # phishing scaler + SVM predict
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+log = logging.getLogger("classifier")
+
+_METRICS = []
+_COLLECTORS = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _METRICS.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}  # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _METRICS.append(self)
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, *labelvalues):
+        with self._lock:
+            state = self._values.get(labelvalues)
+            return state[-1] if state else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    labels = _labels(self.labelnames, labelvalues, [("le", _number(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {_number(state[-2])}")
+                lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+REQUESTS = Counter("classifier_requests_total", "HTTP requests by endpoint, method and status.",
+                   ("endpoint", "method", "status"))
+ERRORS = Counter("classifier_request_errors_total", "HTTP requests answered with a 5xx status.", ("endpoint",))
+REQUEST_SECONDS = Histogram("classifier_request_duration_seconds", "Request latency by endpoint.", ("endpoint",))
+STAGE_SECONDS = Histogram("classifier_stage_duration_seconds", "Latency of one batch call per model stage.",
+                          ("stage",))
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, name)
+
+
+@contextmanager
+def stage(name, **attrs):
+    """Time a stage for the histogram; in a traced request it is also a span carrying `attrs`."""
+    start = time.perf_counter()
+    with tracing.span(name, **attrs) as span:
+        try:
+            yield span
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def register_collector(collect):
+    """
+    Add a scrape-time collector. `collect()` returns a list of
+    (name, type, documentation, [({label: value}, number), ...]) tuples;
+    samples of the same name from different collectors are merged.
+    """
+    _COLLECTORS.append(collect)
+
+
+def cache_families(caches):
+    """Collector families for {cache name: stats dict with size/hits/misses} (TTLCache.stats() and friends)."""
+    return [
+        ("classifier_cache_hits_total", "counter", "Cache hits.",
+         [({"cache": name}, stats["hits"]) for name, stats in caches.items()]),
+        ("classifier_cache_misses_total", "counter", "Cache misses.",
+         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+        ("classifier_cache_entries", "gauge", "Entries currently cached.",
+         [({"cache": name}, stats["size"]) for name, stats in caches.items()]),
+    ]
+
+
+def _render_collected(name, kind, documentation, samples):
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return lines
+
+
+def render():
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    collected = {}
+    for collect in list(_COLLECTORS):
+        try:
+            families = collect()
+        except Exception as e:
+            log.exception("Error collecting metrics: %s", e)
+            continue
+        for name, kind, documentation, samples in families:
+            collected.setdefault(name, (kind, documentation, []))[2].extend(samples)
+    for name, (kind, documentation, samples) in collected.items():
+        lines.extend(_render_collected(name, kind, documentation, samples))
+    return "\n".join(lines) + "\n"
+
+
+def _endpoint():
+    # The route pattern, not the raw path, so label cardinality stays bounded
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+
+def _record_request(response):
+    start = g.get("metrics_start")
+    endpoint = _endpoint()
+    REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    if response.status_code >= 500:
+        ERRORS.inc(endpoint)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+    return response
+
+
+def init_app(app):
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
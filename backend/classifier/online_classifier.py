@@ -0,0 +1,133 @@
+"""
+Incrementally trained email classifier (EMAIL_CLASSIFIER_ENGINE=online).
+
+The pipeline is preprocess -> HashingVectorizer -> SGDClassifier. The hashing
+vectorizer is stateless, so labeled feedback can be folded in with
+`partial_fit` without refitting a vocabulary. Every update trains a copy of
+the classifier and then swaps the live pipeline reference in one assignment,
+so concurrent predictions always see a complete model. Checkpoints are
+written periodically (atomic replace) and reloaded on startup.
+"""
+import copy
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+
+ONLINE_N_FEATURES = int(os.environ.get('ONLINE_N_FEATURES', str(2 ** 18)))
+ONLINE_BOOTSTRAP_EPOCHS = int(os.environ.get('ONLINE_BOOTSTRAP_EPOCHS', '10'))
+# Checkpoint after this many feedback emails or seconds, whichever comes first
+ONLINE_CHECKPOINT_EVERY = int(os.environ.get('ONLINE_CHECKPOINT_EVERY', '50'))
+ONLINE_CHECKPOINT_SECONDS = float(os.environ.get('ONLINE_CHECKPOINT_SECONDS', '300'))
+
+
+def build_online_pipeline(preprocessor):
+    return Pipeline([
+        ('preprocess', preprocessor),
+        ('tfidf', HashingVectorizer(
+            n_features=ONLINE_N_FEATURES,
+            analyzer=str.split,  # input is already a cleaned, space-separated token string
+            alternate_sign=False,
+            norm='l2',
+        )),
+        ('svm', SGDClassifier(loss='hinge', alpha=1e-4, random_state=42)),
+    ])
+
+
+class OnlineEmailClassifier:
+    def __init__(self, path, preprocessor):
+        self.path = path
+        self.preprocessor = preprocessor
+        self.pipeline = None
+        self.version = 0
+        self.pending = 0  # feedback emails applied since the last checkpoint
+        self.last_checkpoint = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        return f"online-{self.version}"
+
+    @property
+    def classes(self):
+        return [str(c) for c in self.pipeline.named_steps['svm'].classes_]
+
+    def load(self):
+        """Load the last checkpoint; returns False if there is none."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            checkpoint = joblib.load(self.path)
+        except Exception as e:
+            print(f"Could not load online checkpoint from {self.path}: {e}")
+            return False
+        self.pipeline = checkpoint['pipeline']
+        self.version = checkpoint['version']
+        print(f"Loaded online email model v{self.version} from {self.path}")
+        return True
+
+    def bootstrap(self, tokens, labels):
+        """Initial fit from the labeled training corpus (several shuffled partial_fit passes)."""
+        pipeline = build_online_pipeline(self.preprocessor)
+        X = pipeline.named_steps['tfidf'].transform(tokens)
+        y = np.asarray(labels)
+        classes = np.unique(y)
+        rng = np.random.RandomState(42)
+        for _ in range(ONLINE_BOOTSTRAP_EPOCHS):
+            order = rng.permutation(len(y))
+            pipeline.named_steps['svm'].partial_fit(X[order], y[order], classes=classes)
+        with self._lock:
+            self.pipeline = pipeline
+            self.version = 0
+            self._checkpoint_locked()
+        print("Online email model bootstrapped from training data.")
+
+    def update(self, tokens, labels, on_swap=None):
+        """
+        Apply labeled feedback and atomically swap in the updated pipeline.
+
+        `on_swap(pipeline, model_id)` is called while still holding the update
+        lock, so callers publishing the model observe swaps in order.
+        """
+        with self._lock:
+            current = self.pipeline
+            unknown = sorted(set(labels) - set(self.classes))
+            if unknown:
+                raise ValueError(f"Unknown labels {unknown}, expected one of {self.classes}")
+
+            classifier = copy.deepcopy(current.named_steps['svm'])
+            classifier.partial_fit(current.named_steps['tfidf'].transform(tokens), np.asarray(labels))
+
+            # Stateless steps are shared; only the classifier is new
+            self.pipeline = Pipeline([
+                ('preprocess', current.named_steps['preprocess']),
+                ('tfidf', current.named_steps['tfidf']),
+                ('svm', classifier),
+            ])
+            self.version += 1
+            self.pending += len(labels)
+            if on_swap is not None:
+                on_swap(self.pipeline, self.model_id)
+
+            if (self.pending >= ONLINE_CHECKPOINT_EVERY
+                    or time.monotonic() - self.last_checkpoint >= ONLINE_CHECKPOINT_SECONDS):
+                self._checkpoint_locked()
+            return self.model_id
+
+    def checkpoint(self):
+        with self._lock:
+            if self.pipeline is not None:
+                self._checkpoint_locked()
+
+    def _checkpoint_locked(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        joblib.dump({'pipeline': self.pipeline, 'version': self.version}, tmp_path)
+        os.replace(tmp_path, self.path)
+        self.pending = 0
+        self.last_checkpoint = time.monotonic()
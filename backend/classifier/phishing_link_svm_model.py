@@ -1,4 +1,10 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 import joblib
 import ipaddress
@@ -9,6 +15,12 @@ from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, classification_report
 from sklearn.model_selection import train_test_split
 
+import top_domains
+from ttl_cache import TTLCache
+from batching import MicroBatcher
+import metrics
+import tracing
+
 # Optional: enable debug prints (set to True to see extraction / matching info)
 DEBUG = False
 
@@ -29,6 +41,15 @@ TOP1M_CSV_PATH = os.path.join(BASE_DIR, 'training_data', 'top-1m.csv')
 # We load domains lazily and store them in memory
 TOP_DOMAINS = None
 
+# Verdict caches for link scoring: URL -> label, and registered domain -> allowlisted.
+# Verdicts depend on the model and the Top-1M list, so reloading either one bumps
+# the generation that is part of every key and clears both caches.
+LINK_CACHE_SIZE = int(os.environ.get('LINK_CACHE_SIZE', '100000'))
+LINK_CACHE_TTL = float(os.environ.get('LINK_CACHE_TTL', '3600'))
+URL_VERDICT_CACHE = TTLCache(LINK_CACHE_SIZE, LINK_CACHE_TTL)
+DOMAIN_VERDICT_CACHE = TTLCache(LINK_CACHE_SIZE, LINK_CACHE_TTL)
+_CACHE_GENERATION = 0
+
 
 # =============================================================
 #  UTIL: registered/registrable domain extraction (eTLD+1)
@@ -40,18 +61,27 @@ def _normalize_hostname(hostname: str) -> str:
     return h
 
 
-def get_registered_domain_from_hostname(hostname: str) -> str:
-    """
-    Return registrable domain (eTLD+1) for a hostname.
-    Uses tldextract when available for correctness (handles co.uk etc).
-    Fallback: naive last-two-labels approach.
+# Hostnames repeat heavily across emails; bound the memo so it cannot grow without limit
+REGISTERED_DOMAIN_CACHE_SIZE = int(os.environ.get('REGISTERED_DOMAIN_CACHE_SIZE', '65536'))
+_TLD_EXTRACTOR = None
+
+
+def _get_tld_extractor():
+    """tldextract resolver that only uses the public suffix list bundled with the package.
+
+    No suffix_list_urls means no network fetch, and no cache_dir means nothing is
+    read from or written to disk, so first use works on air-gapped nodes.
     """
-    hostname = _normalize_hostname(hostname)
-    if not hostname:
-        return ""
+    global _TLD_EXTRACTOR
+    if _TLD_EXTRACTOR is None:
+        _TLD_EXTRACTOR = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+    return _TLD_EXTRACTOR
 
+
+@lru_cache(maxsize=REGISTERED_DOMAIN_CACHE_SIZE)
+def _registered_domain(hostname):
     if _TLDEXTRACT_AVAILABLE:
-        ext = tldextract.extract(hostname)
+        ext = _get_tld_extractor()(hostname)
         if ext.domain and ext.suffix:
             return f"{ext.domain}.{ext.suffix}"
         # fallback to hostname if extraction fails
@@ -64,6 +94,51 @@ def get_registered_domain_from_hostname(hostname: str) -> str:
     return hostname
 
 
+def get_registered_domain_from_hostname(hostname: str) -> str:
+    """
+    Return registrable domain (eTLD+1) for a hostname.
+    Uses tldextract when available for correctness (handles co.uk etc).
+    Fallback: naive last-two-labels approach.
+    Results are memoized per normalized hostname.
+    """
+    hostname = _normalize_hostname(hostname)
+    if not hostname:
+        return ""
+    return _registered_domain(hostname)
+
+
+def registered_domain_cache_stats():
+    info = _registered_domain.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": (info.hits / lookups) if lookups else 0.0,
+        "backend": "tldextract" if _TLDEXTRACT_AVAILABLE else "naive",
+    }
+
+
+def invalidate_verdict_caches():
+    global _CACHE_GENERATION
+    _CACHE_GENERATION += 1
+    URL_VERDICT_CACHE.clear()
+    DOMAIN_VERDICT_CACHE.clear()
+
+
+def cache_stats():
+    return {
+        "registered_domain": registered_domain_cache_stats(),
+        "urls": URL_VERDICT_CACHE.stats(),
+        "domains": DOMAIN_VERDICT_CACHE.stats(),
+    }
+
+
+metrics.register_collector(lambda: metrics.cache_families(
+    {f"link_{name}": stats for name, stats in cache_stats().items()}))
+
+
 def extract_registered_domain_from_url(url: str) -> str:
     """Get the registrable domain (eTLD+1) from a URL string."""
     try:
@@ -77,33 +152,57 @@ def extract_registered_domain_from_url(url: str) -> str:
 # =============================================================
 #  LOAD TOP-1M DOMAINS (normalized to registrable domain)
 # =============================================================
-def load_top_domains():
-    """Load the Top-1M domain list into a Python set (lazy loaded).
-    Normalizes each entry to its registrable domain for reliable matching.
-    """
-    global TOP_DOMAINS
-    if TOP_DOMAINS is not None:
-        return TOP_DOMAINS
+def read_top_domains_csv(path=TOP1M_CSV_PATH):
+    """Parse a Top-1M CSV into the set of registrable domains it lists."""
+    # Read CSV without assuming a header. Many top-1m files are two-column: rank,domain
+    df = pd.read_csv(path, header=None, dtype=str)
+    # pick the column that looks like domains: prefer column 1 if exists else column 0
+    col_idx = 1 if df.shape[1] > 1 else 0
+    raw_domains = df[col_idx].astype(str).str.strip().str.lower().str.rstrip('.')
+    # normalize each domain to its registrable (eTLD+1)
+    return set(get_registered_domain_from_hostname(d) for d in raw_domains if d)
+
+
+def _read_top_domains():
+    """Top-1M domains from the snapshot, else parsed from the CSV; empty set if neither loads."""
+    snapshot = top_domains.load_snapshot(top_domains.TOP1M_SNAPSHOT_PATH, TOP1M_CSV_PATH)
+    if snapshot is not None:
+        if DEBUG:
+            print(f"[DEBUG] Mapped {len(snapshot)} top domains from {snapshot.path}")
+        return snapshot
 
-    TOP_DOMAINS = set()
     try:
-        # Read CSV without assuming a header. Many top-1m files are two-column: rank,domain
-        df = pd.read_csv(TOP1M_CSV_PATH, header=None, dtype=str)
-        # pick the column that looks like domains: prefer column 1 if exists else column 0
-        col_idx = 1 if df.shape[1] > 1 else 0
-        raw_domains = df[col_idx].astype(str).str.strip().str.lower().str.rstrip('.')
-        # normalize each domain to its registrable (eTLD+1)
-        normalized = set(get_registered_domain_from_hostname(d) for d in raw_domains if d)
-        TOP_DOMAINS = normalized
+        domains = read_top_domains_csv(TOP1M_CSV_PATH)
+        print(f"[WARNING] No Top-1M snapshot at {top_domains.TOP1M_SNAPSHOT_PATH}; parsed {TOP1M_CSV_PATH} instead. "
+              f"Run `python top_domains.py --rebuild` to build it.")
         if DEBUG:
-            print(f"[DEBUG] Loaded {len(TOP_DOMAINS)} normalized top domains from {TOP1M_CSV_PATH}")
+            print(f"[DEBUG] Loaded {len(domains)} normalized top domains from {TOP1M_CSV_PATH}")
+        return domains
     except FileNotFoundError:
         print(f"[ERROR] Top-1M file not found at {TOP1M_CSV_PATH}. Top-domain checks will be disabled.")
-        TOP_DOMAINS = set()
     except Exception as e:
         print(f"[ERROR] Failed to load top domains: {e}")
-        TOP_DOMAINS = set()
+    return set()
+
+
+def load_top_domains():
+    """Load the Top-1M domain list (lazy loaded).
+
+    Prefers the memory-mapped snapshot built by `python top_domains.py --rebuild`;
+    falls back to parsing the CSV into a Python set when there is no snapshot.
+    Entries are normalized to their registrable domain for reliable matching.
+    """
+    global TOP_DOMAINS
+    if TOP_DOMAINS is None:
+        TOP_DOMAINS = _read_top_domains()
+    return TOP_DOMAINS
+
 
+def reload_top_domains():
+    """Re-read the Top-1M list (e.g. after `top_domains.py --rebuild`) and drop cached verdicts."""
+    global TOP_DOMAINS
+    TOP_DOMAINS = _read_top_domains()
+    invalidate_verdict_caches()
     return TOP_DOMAINS
 
 
@@ -193,9 +292,8 @@ def train_model_and_scaler(save=True):
 # =============================================================
 #  FEATURE EXTRACTION FOR PREDICTION
 # =============================================================
-def is_ip_address(url):
+def _is_ip_hostname(hostname):
     try:
-        hostname = urlparse(url).hostname
         if hostname:
             ipaddress.ip_address(hostname)
             return 1
@@ -204,27 +302,49 @@ def is_ip_address(url):
         return 0
 
 
-def extract_features_from_url(url):
+def is_ip_address(url):
+    try:
+        return _is_ip_hostname(urlparse(url).hostname)
+    except Exception:
+        return 0
+
+
+_COUNTED_CHARS = ['.', '-', '@', '?', '&', '=', '_', '~', '%', '/', '*', ':', ',', ';', '$']
+# Columns left unscaled at training time
+_BINARY_COLS = ['ip', 'https_token']
+
+
+def url_feature_dict(url, parsed=None):
     """
-    Build feature dict for a URL. Keys must match the training columns.
+    Build the feature dict for a URL. Keys must match the training columns.
+    `parsed` may be passed in when the caller already ran urlparse on `url`.
     """
     features = {}
-    parsed = urlparse(url)
+    if parsed is None:
+        parsed = urlparse(url)
+    hostname = parsed.hostname
 
     features['url_length'] = len(url)
-    features['hostname_length'] = len(parsed.hostname) if parsed.hostname else 0
-    features['ip'] = is_ip_address(url)
+    features['hostname_length'] = len(hostname) if hostname else 0
+    features['ip'] = _is_ip_hostname(hostname)
     features['https_token'] = 1 if parsed.scheme == 'https' else 0
 
     # count characters and map to the training column names like 'total_of.'
-    for char in ['.', '-', '@', '?', '&', '=', '_', '~', '%', '/', '*', ':', ',', ';', '$']:
+    for char in _COUNTED_CHARS:
         features[f'total_of{char}'] = url.count(char)
 
     features['total_of_www'] = url.count('www')
     features['total_of_com'] = url.count('com')
     features['total_of_http_in_path'] = url.count('http')
 
-    return pd.DataFrame([features])
+    return features
+
+
+def extract_features_from_url(url):
+    """
+    Build a one-row feature DataFrame for a URL. Keys must match the training columns.
+    """
+    return pd.DataFrame([url_feature_dict(url)])
 
 
 # =============================================================
@@ -234,14 +354,18 @@ _MODEL = None
 _SCALER = None
 _X_TRAIN_COLS = None
 
+# Memory-map the model arrays (read-only) so prefork workers share their pages;
+# MODEL_MMAP_MODE="" loads them into process memory instead
+MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE', 'r') or None
+
 
 def load_model_and_scaler():
     _, _, model_path, scaler_path, cols_path = _get_paths()
     try:
         if os.path.exists(model_path) and os.path.exists(scaler_path) and os.path.exists(cols_path):
             return (
-                joblib.load(model_path),
-                joblib.load(scaler_path),
+                joblib.load(model_path, mmap_mode=MODEL_MMAP_MODE),
+                joblib.load(scaler_path, mmap_mode=MODEL_MMAP_MODE),
                 joblib.load(cols_path)
             )
     except Exception:
@@ -260,12 +384,14 @@ def init_model(force_train=False):
         mdl, scl, cols = load_model_and_scaler()
         if mdl is not None:
             _MODEL, _SCALER, _X_TRAIN_COLS = mdl, scl, cols
+            invalidate_verdict_caches()
             if DEBUG:
                 print("[DEBUG] Loaded model/scaler/cols from disk.")
             return
 
     # Train a new one (and save)
     _MODEL, _SCALER, _X_TRAIN_COLS = train_model_and_scaler(save=True)
+    invalidate_verdict_caches()
 
 
 def _predict_with_objects(url, model, scaler, X_train_cols):
@@ -286,6 +412,173 @@ def _predict_with_objects(url, model, scaler, X_train_cols):
     return "phishing" if pred == 1 else "legitimate"
 
 
+def _predict_matrix(rows, model, scaler, X_train_cols):
+    """Scale and classify a (n_urls, n_features) matrix with one scaler pass and one SVM call."""
+    X = np.asarray(rows, dtype=float)
+
+    # Same arithmetic as scaler.transform, applied only to the scaled columns
+    scaled_cols = list(getattr(scaler, 'feature_names_in_', [c for c in X_train_cols if c not in _BINARY_COLS]))
+    idx = [X_train_cols.index(c) for c in scaled_cols]
+    if scaler.with_mean:
+        X[:, idx] -= scaler.mean_
+    if scaler.with_std:
+        X[:, idx] /= scaler.scale_
+
+    # One DataFrame per batch so the model sees the feature names it was fitted with
+    preds = model.predict(pd.DataFrame(X, columns=X_train_cols))
+    return ["phishing" if pred == 1 else "legitimate" for pred in preds]
+
+
+def _is_allowlisted(registered_domain, domains, generation):
+    key = (generation, registered_domain)
+    allowlisted = DOMAIN_VERDICT_CACHE.get(key)
+    if allowlisted is None:
+        allowlisted = registered_domain in domains
+        DOMAIN_VERDICT_CACHE.set(key, allowlisted)
+    return allowlisted
+
+
+# URLs are cut to this length in trace spans
+TRACE_URL_CHARS = 200
+
+
+def _predict_many(urls):
+    """
+    Label (or the raised exception) per URL.
+
+    Cached verdicts are returned as-is, Top-1M hits skip the SVM, and the rest
+    are scored as one batch. URLs are keyed exactly as given: the features are
+    computed from the raw string, so any rewriting could change the verdict.
+    """
+    init_model()
+    # Read the generation before the model: a concurrent reload swaps the model first
+    generation = _CACHE_GENERATION
+    if _MODEL is None:
+        raise RuntimeError("Model is not available")
+    model, scaler, X_train_cols = _MODEL, _SCALER, list(_X_TRAIN_COLS)
+
+    # Load top domains (normalized)
+    domains = load_top_domains()
+
+    results = [None] * len(urls)
+    rows = []
+    row_index = []
+    lookup_seconds = feature_seconds = 0.0
+    for i, url in enumerate(urls):
+        with tracing.span("link", url=url[:TRACE_URL_CHARS]) as link_span:
+            cached = URL_VERDICT_CACHE.get((generation, url))
+            if cached is not None:
+                results[i] = cached
+                link_span.set(cached=True)
+                continue
+            try:
+                start = time.perf_counter()
+                parsed = urlparse(url)
+                # TOP-1M OVERRIDE
+                registered_domain = get_registered_domain_from_hostname(parsed.hostname or "")
+                allowlisted = bool(registered_domain) and _is_allowlisted(registered_domain, domains, generation)
+                lookup_done = time.perf_counter()
+                lookup_seconds += lookup_done - start
+                link_span.set(cached=False, allowlisted=allowlisted)
+                if allowlisted:
+                    results[i] = "legitimate"   # ← OLD LABEL preserved
+                    URL_VERDICT_CACHE.set((generation, url), results[i])
+                    continue
+                features = url_feature_dict(url, parsed)
+                rows.append([features.get(col, 0) for col in X_train_cols])
+                row_index.append(i)
+                feature_seconds += time.perf_counter() - lookup_done
+            except Exception as e:
+                results[i] = e
+                link_span.set(error=str(e))
+
+    if lookup_seconds:
+        metrics.observe_stage("top1m_lookup", lookup_seconds)
+
+    if rows:
+        metrics.observe_stage("link_features", feature_seconds)
+        with metrics.stage("link_svc_predict", rows=len(rows)):
+            labels = _predict_matrix(rows, model, scaler, X_train_cols)
+        for i, label in zip(row_index, labels):
+            results[i] = label
+            URL_VERDICT_CACHE.set((generation, urls[i]), label)
+    return results
+
+
+def predict_phishing_many(urls):
+    """
+    Batch version of predict_phishing: features for all URLs go into one NumPy
+    matrix that is scaled and classified with a single SVM call.
+
+    Returns one label per URL ('legitimate' / 'phishing'); URLs that could not
+    be featurized get "error: <message>" instead.
+    """
+    return [f"error: {r}" if isinstance(r, Exception) else r for r in _predict_many(list(urls))]
+
+
+# Small link sets from concurrent requests are coalesced into one predict_phishing_many batch
+LINK_BATCHER = MicroBatcher("links", predict_phishing_many)
+
+
+# /classify_links fan-out: link sets larger than one batch are scored in parallel
+LINK_BATCH_SIZE = int(os.environ.get('LINK_BATCH_SIZE', '200'))
+LINK_WORKERS = int(os.environ.get('LINK_WORKERS', '4'))
+LINK_DEADLINE_MS = float(os.environ.get('LINK_DEADLINE_MS', '2000'))
+PENDING = "pending"
+_LINK_POOL = None
+_LINK_POOL_PID = None
+_LINK_POOL_LOCK = threading.Lock()
+
+
+def _get_link_pool():
+    # Worker threads do not survive fork(); create the pool per process
+    global _LINK_POOL, _LINK_POOL_PID
+    with _LINK_POOL_LOCK:
+        if _LINK_POOL_PID != os.getpid():
+            _LINK_POOL = ThreadPoolExecutor(max_workers=LINK_WORKERS, thread_name_prefix="link-scoring")
+            _LINK_POOL_PID = os.getpid()
+        return _LINK_POOL
+
+
+def predict_phishing_parallel(urls, deadline_ms=None):
+    """
+    predict_phishing_many for large link sets, bounded by a deadline.
+
+    Up to LINK_BATCH_SIZE URLs are scored as one batch, coalesced with other
+    concurrent requests by LINK_BATCHER. Larger sets are
+    split into batches that run on a shared pool of LINK_WORKERS threads; URLs
+    whose batch has not finished after `deadline_ms` (default LINK_DEADLINE_MS)
+    are returned as "pending". Batches already running at the deadline finish
+    and fill the verdict cache, so a retry is answered from it; batches still
+    queued are cancelled, so an abandoned request does not keep the pool busy.
+    """
+    urls = list(urls)
+    if len(urls) <= LINK_BATCH_SIZE or LINK_WORKERS <= 1:
+        return LINK_BATCHER.submit(urls)
+
+    # Load model and allowlist here so a cold start fails the request instead of timing out
+    init_model()
+    if _MODEL is None:
+        raise RuntimeError("Model is not available")
+    load_top_domains()
+
+    deadline_ms = LINK_DEADLINE_MS if deadline_ms is None else deadline_ms
+    pool = _get_link_pool()
+    futures = {
+        pool.submit(tracing.wrap(predict_phishing_many), urls[start:start + LINK_BATCH_SIZE]): start
+        for start in range(0, len(urls), LINK_BATCH_SIZE)
+    }
+    done, not_done = wait(futures, timeout=deadline_ms / 1000)
+    for future in not_done:
+        future.cancel()
+
+    results = [PENDING] * len(urls)
+    for future in done:
+        start = futures[future]
+        results[start:start + LINK_BATCH_SIZE] = future.result()
+    return results
+
+
 # =============================================================
 #  FINAL PHISHING CHECK (WITH TOP-1M DOMAIN OVERRIDE)
 # =============================================================
@@ -301,21 +594,10 @@ def predict_phishing(url):
     2) Otherwise fall back to SVM:
            → return 'phishing' or 'legitimate'
     """
-    init_model()
-    if _MODEL is None:
-        raise RuntimeError("Model is not available")
-
-    # Load top domains (normalized)
-    domains = load_top_domains()
-    registered_domain = extract_registered_domain_from_url(url)
-
-    # TOP-1M OVERRIDE
-    if registered_domain and registered_domain in domains:
-        return "legitimate"   # ← OLD LABEL preserved
-
-    # Otherwise use ML model
-    return _predict_with_objects(url, _MODEL, _SCALER, _X_TRAIN_COLS)
-
+    result = _predict_many([url])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
 
 
 # =============================================================
@@ -0,0 +1,129 @@
+"""
+Background pre-scoring of the links in bulk-classified emails.
+
+When a /classify request asks for it (`"prefetch_links": true`, or
+LINK_PREFETCH=1 for every request including NDJSON streams), the email bodies
+are handed to a background worker after the response is built. The worker
+extracts the anchors with the same parser /classify_links uses and scores
+them with predict_phishing_many, which fills the URL verdict cache. When the
+user later opens one of those emails, /classify_links is answered from the
+cache.
+
+The work is low priority: each batch of LINK_PREFETCH_CHUNK emails runs in a
+BACKGROUND admission slot, which is only granted when no interactive or bulk
+request is waiting. At most LINK_PREFETCH_MAX_PENDING jobs are queued; jobs
+beyond that are dropped (the links are then scored on demand as before).
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import admission
+import metrics
+import warmup
+from html_text import extract_links
+
+LINK_PREFETCH = os.environ.get('LINK_PREFETCH', '').lower() in ('1', 'true', 'yes')
+LINK_PREFETCH_WORKERS = int(os.environ.get('LINK_PREFETCH_WORKERS', '1'))
+LINK_PREFETCH_MAX_PENDING = int(os.environ.get('LINK_PREFETCH_MAX_PENDING', '32'))
+# Emails parsed and scored per background slot
+LINK_PREFETCH_CHUNK = int(os.environ.get('LINK_PREFETCH_CHUNK', '64'))
+
+log = logging.getLogger("classifier")
+
+_lock = threading.Lock()
+_idle = threading.Condition(_lock)
+_pool = None
+_pool_pid = None
+_pending = 0
+_counters = {"submitted": 0, "dropped": 0, "completed": 0, "failed": 0, "emails": 0, "urls": 0}
+
+
+def _get_pool():
+    # Worker threads do not survive fork(); create the pool per process
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        _pool = ThreadPoolExecutor(max_workers=LINK_PREFETCH_WORKERS, thread_name_prefix="link-prefetch")
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def submit(emails):
+    """Queue the links in `emails` for background scoring. Returns False if the job was dropped."""
+    global _pending
+    emails = [email for email in emails if isinstance(email, str)]
+    if not emails:
+        return False
+    with _lock:
+        if _pending >= LINK_PREFETCH_MAX_PENDING:
+            _counters["dropped"] += 1
+            return False
+        _pending += 1
+        _counters["submitted"] += 1
+        pool = _get_pool()
+    pool.submit(_run, emails)
+    return True
+
+
+def _acquire_slot():
+    # Wait as long as it takes (no client sees this wait, so it is never a rejection);
+    # LINK_PREFETCH_MAX_PENDING is what sheds prefetch work under load
+    return admission.GATE.acquire(admission.BACKGROUND, timeout_ms=admission.NO_TIMEOUT, bounded=False)
+
+
+def _run(emails):
+    global _pending
+    seen = set()
+    try:
+        phishing_link = warmup.get_component("phishing_link")
+        warmup.get_component("top_domains")
+        for start in range(0, len(emails), LINK_PREFETCH_CHUNK):
+            chunk = emails[start:start + LINK_PREFETCH_CHUNK]
+            slot = _acquire_slot()
+            try:
+                urls = [href for href in dict.fromkeys(href for email in chunk for href in extract_links(email))
+                        if href not in seen]
+                seen.update(urls)
+                phishing_link.predict_phishing_many(urls)
+            finally:
+                slot.release()
+            with _lock:
+                _counters["emails"] += len(chunk)
+                _counters["urls"] += len(urls)
+        with _lock:
+            _counters["completed"] += 1
+    except Exception as e:
+        log.exception("Error in link prefetch: %s", e)
+        with _lock:
+            _counters["failed"] += 1
+    finally:
+        with _lock:
+            _pending -= 1
+            if _pending == 0:
+                _idle.notify_all()
+
+
+def wait_idle(timeout=None):
+    """Block until every queued prefetch job has finished (used by tests and benchmarks)."""
+    with _idle:
+        return _idle.wait_for(lambda: _pending == 0, timeout)
+
+
+def stats():
+    with _lock:
+        return dict(_counters, enabled_by_default=LINK_PREFETCH, pending=_pending,
+                    max_pending=LINK_PREFETCH_MAX_PENDING)
+
+
+def _collect_metrics():
+    current = stats()
+    return [
+        ("classifier_prefetch_pending", "gauge", "Link prefetch jobs queued or running.", [({}, current["pending"])]),
+        ("classifier_prefetch_jobs_total", "counter", "Link prefetch jobs by outcome.",
+         [({"outcome": outcome}, current[outcome]) for outcome in ("submitted", "dropped", "completed", "failed")]),
+        ("classifier_prefetch_urls_total", "counter", "URLs scored by link prefetch.", [({}, current["urls"])]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
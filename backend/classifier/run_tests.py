@@ -19,8 +19,20 @@ def run_tests():
     # Add test modules
     test_modules = [
         'test_email_classifier',
+        'test_lite_preprocessing',
+        'test_ttl_cache',
+        'test_batching',
+        'test_online_classifier',
+        'test_html_text',
         'test_phishing_link',
-        'test_flask_app'
+        'test_top_domains',
+        'test_flask_app',
+        'test_wire',
+        'test_admission',
+        'test_prefetch',
+        'test_metrics',
+        'test_tracing',
+        'test_startup'
     ]
     
     for module_name in test_modules:
@@ -1,10 +1,19 @@
-import joblib  # For loading the pre-trained model and vectorizer
-from flask import Flask, request, jsonify  # For building the Flask API
+import json
+import logging
+import os
+import random
+import time
+
+from flask import Flask, Response, request, jsonify, stream_with_context  # For building the Flask API
 from flask_cors import CORS  # For handling Cross-Origin Resource Sharing
-from sklearn.feature_extraction.text import TfidfVectorizer  # For vectorizing email content
-import os  # For working with file paths
-from bs4 import BeautifulSoup  # For parsing and cleaning HTML content
-import re  # For regular expressions to clean text
+from html_text import extract_links, extract_text_and_links  # Shared bounded HTML parser (also used by strip_html)
+import warmup  # Lazy loading / background warm-up of the heavy models
+import batching  # Micro-batching counters for /stats
+import wire  # gzip/zstd and MessagePack negotiation
+import admission  # Size limits, work-slot gate and per-request deadlines
+import prefetch  # Background link pre-scoring after /classify
+import metrics  # Prometheus-style /metrics
+import tracing  # Per-request trace spans, /debug/traces
 
 # class EmailClassifier:
 #     def __init__(self):
@@ -80,12 +89,31 @@ import re  # For regular expressions to clean text
 #         text = re.sub(r'[^\w\s]', '', text)  # Remove special characters
 #         return text.strip()
 
-# Importing email_classifier_svm.py
-import email_classifier_svm
+# email_classifier_svm (spaCy, scikit-learn, trained pipeline) and
+# phishing_link_svm_model (pandas, tldextract, Top-1M list) are loaded through
+# warmup.get_component() so importing this module stays fast.
+
+# Leveled logging. Per-request lines are sampled: a LOG_SAMPLE_RATE fraction of
+# requests log a summary at INFO and their payload at DEBUG; errors are always logged.
+LOG_LEVEL = os.environ.get('CLASSIFIER_LOG_LEVEL', 'INFO').strip().upper()
+LOG_SAMPLE_RATE = float(os.environ.get('CLASSIFIER_LOG_SAMPLE_RATE', '0.01'))
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+log = logging.getLogger("classifier")
+
+def _log_request(summary, *args, payload=None):
+    if LOG_SAMPLE_RATE <= 0 or random.random() >= LOG_SAMPLE_RATE:
+        return
+    log.info(summary, *args)
+    if payload is not None:
+        log.debug("payload: %s", payload)  # only formatted when DEBUG is enabled
 
 # Initialize the Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS to allow requests from other origins
+wire.init_app(app)  # Compressed / MessagePack bodies; plain JSON remains the default
+admission.init_app(app)  # Request body size limit
+metrics.init_app(app)  # Request counts and latency per endpoint
+tracing.init_app(app)  # Traces for requests sent with X-Trace: 1 (or sampled)
 
 @app.route("/", methods=["GET"])
 def home():
@@ -99,117 +127,456 @@ def home():
 def favicon():
     return '', 204
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Readiness endpoint: reports which heavy components are loaded.
+    Returns 200 once everything is warm, 503 before that.
+    """
+    is_ready = warmup.is_ready()
+    return jsonify({"ready": is_ready, "components": warmup.component_status()}), (200 if is_ready else 503)
+
 @app.route("/classify", methods=["POST"])
+@admission.admitted(admission.BULK)
 def classify_emails():
     """
     Endpoint to classify emails. Accepts a JSON payload containing email bodies.
 
     Request JSON Format:
         {
-            "emails": ["email1 body", "email2 body", ...]
+            "emails": ["email1 body", "email2 body", ...],
+            "scores": false,   # optional: include per-class decision scores
+            "top_k": 3,        # optional: number of ranked labels per email (implies scores)
+            "prefetch_links": true   # optional: score the emails' links in the background (default LINK_PREFETCH)
         }
 
     Response JSON Format:
         {
-            "predictions": ["label1", "label2", ...]
+            "predictions": ["label1", "label2", ...],
+            # only when scores/top_k was requested:
+            "scores": [{"label1": 0.9, "label2": -0.4, ...}, ...],
+            "top_k": [[{"label": "label1", "score": 0.9}, ...], ...]
         }
+
+    Streaming mode: send Content-Type application/x-ndjson with one JSON string
+    (an email body) per line; see classify_stream().
+
+    Size limits, busy (429/503) and deadline (503) responses come from admission.py.
+    Runs at bulk priority, in chunks that let interactive requests in between.
     """
+    if request.mimetype == NDJSON_MIMETYPE:
+        return classify_stream()
     try:
         data = request.json  # Parse the incoming JSON data
-        print("Received data:", data)  # Log received data
         emails = data.get("emails", [])  # Extract emails from the payload
-        print("Emails to classify:", emails)
-
-        predictions = email_classifier_svm.classify(emails)  # Classify the emails
-        print("Predictions:", predictions)  # Log the predictions
-
-        return jsonify({"predictions": predictions})  # Return predictions as JSON
+        if not isinstance(emails, list) or not all(isinstance(email, str) for email in emails):
+            # Checked before batching: a bad email would fail the whole shared batch
+            return jsonify({"error": "emails must be a list of strings"}), 400
+        top_k = data.get("top_k")
+        with_scores = bool(data.get("scores")) or top_k is not None
+        if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1):
+            return jsonify({"error": "top_k must be a positive integer"}), 400
+        prefetch_links = data.get("prefetch_links", prefetch.LINK_PREFETCH)
+        if not isinstance(prefetch_links, bool):
+            return jsonify({"error": "prefetch_links must be true or false"}), 400
+
+        tracing.annotate(emails=len(emails), scores=with_scores)
+        email_classifier_svm = warmup.get_component("email_classifier")
+        if with_scores:
+            # Labels and scores come from the same batched decision_function pass
+            results = admission.run_chunked(
+                lambda chunk: email_classifier_svm.classify_with_scores(chunk, top_k=top_k), emails)
+            response = {
+                "predictions": [r["label"] for r in results],
+                "scores": [r["scores"] for r in results],
+                "top_k": [r["top_k"] for r in results],
+            }
+        else:
+            # Classify the emails, checking the request deadline between chunks
+            response = {"predictions": admission.run_chunked(email_classifier_svm.classify, emails)}
+        _log_request("/classify: %d emails", len(emails), payload={"emails": emails, **response})
+
+        if prefetch_links:
+            # Warm the link verdict cache for /classify_links while the user looks at the results
+            prefetch.submit(emails)
+
+        return jsonify(response)  # Return predictions as JSON
+    except admission.AdmissionError:
+        raise
     except Exception as e:
-        print("Error in /classify route:", e)  # Log any errors in the endpoint
+        log.exception("Error in /classify route: %s", e)  # Log any errors in the endpoint
         return str(e), 500  # Respond with error and 500 status code
 
-#
-# PHISHING_LINK_SVM_MODEL SECTION
-#
+NDJSON_MIMETYPE = "application/x-ndjson"
+# Emails classified per streamed chunk; only one chunk is held in memory at a time
+CLASSIFY_STREAM_CHUNK = int(os.environ.get('CLASSIFY_STREAM_CHUNK', '32'))
+
+def _ndjson_line(obj):
+    return json.dumps(obj) + "\n"
 
-# Importing phishing_link_svm_model for completeness
-# Try multiple import strategies so this module can be run from different CWDs
-predict_phishing = None
-try:
-    # Same-directory import (works when running from this folder)
-    from phishing_link_svm_model import predict_phishing as _predict_phishing
-    predict_phishing = _predict_phishing
-    print('Imported predict_phishing from phishing_link_svm_model')
-except Exception:
+def _stream_line_limit():
+    # Bytes in the longest line that can hold an allowed email: a JSON string takes at
+    # most 12 bytes per character (an escaped surrogate pair), plus quotes and whitespace
+    return 12 * admission.ADMISSION_MAX_EMAIL_CHARS + 16
+
+def _read_lines(stream, limit, counts):
+    """
+    Lines of `stream` as bytes, each read with at most `limit` bytes in memory;
+    None for an over-long line. Bytes read are added up in counts["bytes"].
+    """
+    while True:
+        line = stream.readline(limit)
+        counts["bytes"] += len(line)
+        if not line:
+            return
+        if len(line) >= limit and not line.endswith(b"\n"):
+            # Too long: skip the rest of it without holding it
+            while True:
+                rest = stream.readline(limit)
+                counts["bytes"] += len(rest)
+                admission.check_stream_limits(0, counts["bytes"])
+                if not rest or rest.endswith(b"\n"):
+                    break
+            yield None
+            continue
+        yield line
+
+def classify_stream():
+    """
+    NDJSON mode of /classify for large batches.
+
+    The request body is read line by line (one JSON-encoded email body per
+    line) and every CLASSIFY_STREAM_CHUNK emails are classified and written out
+    straight away, so memory stays bounded and the first results arrive before
+    the rest of the request has been read.
+
+    Response lines:
+        {"index": 0, "prediction": "label1"}
+        {"index": 1, "error": "line is not a JSON string"}   # bad input line, the stream continues
+        {"error": "..."}                                      # classifier failure or deadline, the stream ends
+
+    Emails longer than ADMISSION_MAX_EMAIL_CHARS get an error line. Lines are
+    read in bounded pieces, so an over-long (or unterminated) line is skipped
+    without being held in memory. There is an admission checkpoint (deadline,
+    yield to interactive requests) before every chunk. A stream past
+    ADMISSION_MAX_STREAM_EMAILS emails or ADMISSION_MAX_STREAM_BYTES bytes is
+    cut off: the emails already read are classified, then a final error line.
+    """
     try:
-        # Package-style import (works when backend/ is on PYTHONPATH)
-        from classifier.phishing_link_svm_model import predict_phishing as _predict_phishing
-        predict_phishing = _predict_phishing
-        print('Imported predict_phishing from classifier.phishing_link_svm_model')
-    except Exception:
+        email_classifier_svm = warmup.get_component("email_classifier")
+    except Exception as e:
+        log.exception("Error in /classify stream: %s", e)
+        return str(e), 500
+
+    stream = request.stream
+
+    def classify_chunk(chunk):
+        admission.checkpoint()
+        indices, emails = zip(*chunk)
+        for index, prediction in zip(indices, email_classifier_svm.classify(list(emails))):
+            yield _ndjson_line({"index": index, "prediction": prediction})
+        if prefetch.LINK_PREFETCH:
+            prefetch.submit(emails)
+
+    def generate():
+        chunk = []
+        index = 0
+        too_long = {"error": f"email is longer than {admission.ADMISSION_MAX_EMAIL_CHARS} characters"}
+        counts = {"bytes": 0}
+        over_limit = None
         try:
-            # Fallback: import by file path
-            import importlib.util
-            spec = importlib.util.spec_from_file_location(
-                'phishing_link_svm_model', os.path.join(os.path.dirname(__file__), 'phishing_link_svm_model.py')
-            )
-            mod = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
-            predict_phishing = getattr(mod, 'predict_phishing', None)
-            if predict_phishing:
-                print('Imported predict_phishing via importlib')
+            try:
+                for raw_line in _read_lines(stream, _stream_line_limit(), counts):
+                    if raw_line is not None and not raw_line.strip():
+                        continue
+                    admission.check_stream_limits(index + 1, counts["bytes"])
+                    if raw_line is None:
+                        yield _ndjson_line({"index": index, **too_long})
+                        index += 1
+                        continue
+                    try:
+                        email = json.loads(raw_line)
+                    except ValueError:
+                        email = None
+                    if isinstance(email, str) and len(email) > admission.ADMISSION_MAX_EMAIL_CHARS:
+                        yield _ndjson_line({"index": index, **too_long})
+                    elif isinstance(email, str):
+                        chunk.append((index, email))
+                    else:
+                        yield _ndjson_line({"index": index, "error": "line is not a JSON string"})
+                    index += 1
+                    if len(chunk) >= CLASSIFY_STREAM_CHUNK:
+                        yield from classify_chunk(chunk)
+                        chunk = []
+            except admission.AdmissionError as e:
+                if e.status != 413:
+                    raise
+                # Stream limit: answer what was read so far, then stop
+                admission.GATE.count("rejected_too_large")
+                over_limit = e
+            if chunk:
+                yield from classify_chunk(chunk)
+            tracing.annotate(emails=index)
+            if over_limit is not None:
+                yield _ndjson_line({"error": str(over_limit)})
         except Exception as e:
-            print(f'Could not import predict_phishing: {e}')
+            log.exception("Error in /classify stream: %s", e)
+            yield _ndjson_line({"error": str(e)})
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+@app.route("/feedback", methods=["POST"])
+@admission.admitted(admission.BULK)
+def feedback():
+    """
+    Endpoint to submit labeled emails for incremental training
+    (requires EMAIL_CLASSIFIER_ENGINE=online).
+
+    Request JSON Format:
+        {
+            "emails": ["email1 body", "email2 body", ...],
+            "labels": ["label1", "label2", ...]
+        }
+
+    Response JSON Format:
+        {
+            "accepted": 2,
+            "model_version": "online-42"
+        }
+    """
+    try:
+        data = request.json or {}
+        emails = data.get("emails", [])
+        labels = data.get("labels", [])
+        for name, values in (("emails", emails), ("labels", labels)):
+            if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+                return jsonify({"error": f"{name} must be a list of strings"}), 400
+
+        email_classifier_svm = warmup.get_component("email_classifier")
+        try:
+            model_version = email_classifier_svm.apply_feedback(emails, labels)
+        except (ValueError, RuntimeError) as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({"accepted": len(emails), "model_version": model_version}), 200
+    except admission.AdmissionError:
+        raise
+    except Exception as e:
+        log.exception("Error in /feedback route: %s", e)
+        return str(e), 500
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """
+    Cache and batching counters for the classifier.
 
+    Response JSON Format:
+        {
+            "classify_cache": {"labels": {...}, "tokens": {...}},
+            "link_cache": {"registered_domain": {...}, "urls": {...}, "domains": {...}},
+            "batching": {"classify": {...}, "links": {...}},
+            "admission": {"active": 0, "waiting": 0, "classes": {...}, ...},
+            "prefetch": {"pending": 0, "submitted": 0, "dropped": 0, "urls": 0, ...}
+        }
+    """
+    email_classifier_svm = warmup.get_component("email_classifier")
+    phishing_link = warmup.get_component("phishing_link")
+    return jsonify({
+        "classify_cache": email_classifier_svm.cache_stats(),
+        "link_cache": phishing_link.cache_stats(),
+        "batching": batching.stats(),
+        "admission": admission.stats(),
+        "prefetch": prefetch.stats(),
+    }), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    """
+    Prometheus text exposition: request counts, errors and latency per endpoint,
+    per-stage model timings, cache hit/miss counts, admission, batching and
+    prefetch gauges. See metrics.py.
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def debug_traces():
+    """
+    GET /debug/traces (TRACE_DEBUG_ENDPOINT=1 only): most recent finished
+    traces, newest first (see tracing.py).
+
+    Query: ?limit=20
+
+    Response JSON Format:
+        {
+            "traces": [{"trace_id": "...", "name": "/classify", "status": 200,
+                        "duration_ms": 12.3, "span_count": 9, "timestamp": 1700000000.0}, ...]
+        }
+    """
+    limit = request.args.get("limit", default=20, type=int)
+    summaries = [
+        {key: trace[key] for key in ("trace_id", "name", "status", "duration_ms", "span_count", "timestamp")}
+        for trace in tracing.recent(limit)
+    ]
+    return jsonify({"traces": summaries}), 200
+
+def debug_trace(trace_id):
+    """One trace with its full span tree, or 404 once it has left the ring buffer."""
+    trace = tracing.get(trace_id)
+    if trace is None:
+        return jsonify({"error": "Unknown trace id"}), 404
+    return jsonify(trace), 200
+
+# Traces carry link URLs from users' emails (reset and login tokens included), so
+# the debug routes only exist when TRACE_DEBUG_ENDPOINT=1
+if tracing.TRACE_DEBUG_ENDPOINT:
+    app.add_url_rule("/debug/traces", view_func=debug_traces, methods=["GET"])
+    app.add_url_rule("/debug/traces/<trace_id>", view_func=debug_trace, methods=["GET"])
+
+#
+# PHISHING_LINK_SVM_MODEL SECTION
+#
+
+def _valid_deadline(deadline_ms):
+    return deadline_ms is None or (
+        isinstance(deadline_ms, (int, float)) and not isinstance(deadline_ms, bool) and deadline_ms > 0)
 
 # Endpoint: accept HTML body, extract links, classify each using predict_phishing
 @app.route("/classify_links", methods=["POST"])
+@admission.admitted(admission.INTERACTIVE)
 def classify_links_route():
     """Accept JSON with `html` field, extract anchor hrefs, classify each link.
 
-    Request JSON: {"html": "<html>..."}
-    Response JSON: {"results": [{"url": "...", "prediction": "phishing"}, ...]}
+    Request JSON: {"html": "<html>...", "deadline_ms": 500}   # deadline_ms is optional
+    Response JSON: {"results": [{"url": "...", "prediction": "phishing"}, ...], "pending": 0}
+
+    Large link sets are scored in parallel batches; links not scored before the
+    deadline (or the end of the request deadline, if sooner) are returned with
+    prediction "pending".
+
+    Runs at interactive priority: it is admitted ahead of queued bulk requests.
     """
     try:
         data = request.json or {}
         html = data.get("html", "")
-        print("Received HTML for link classification, length:", len(html))
 
         if not html:
             return jsonify({"error": "No html provided"}), 400
 
-        if not predict_phishing:
-            raise RuntimeError("predict_phishing function is not available.")
-
-        soup = BeautifulSoup(html, 'html.parser')
-        anchors = soup.find_all('a', href=True)
-
-        results = []
-        seen = set()
-        for a in anchors:
-            href = a.get('href')
-            if not href:
-                continue
-            # avoid duplicates
-            if href in seen:
-                continue
-            seen.add(href)
-            try:
-                pred = predict_phishing(href)
-            except Exception as e:
-                pred = f"error: {e}"
-            results.append({"url": href, "prediction": pred})
-
-        print("Link classification results:", results)
-        
-        return jsonify({"results": results}), 200
+        deadline_ms = data.get("deadline_ms")
+        if not _valid_deadline(deadline_ms):
+            return jsonify({"error": "deadline_ms must be a positive number"}), 400
+
+        try:
+            phishing_link = warmup.get_component("phishing_link")
+        except Exception as e:
+            raise RuntimeError(f"predict_phishing_parallel function is not available: {e}")
+        # Make sure the Top-1M allowlist is loaded (and reported warm by /ready)
+        warmup.get_component("top_domains")
+
+        # avoid duplicates, keep document order; score the whole set as batches
+        with metrics.stage("extract_links", chars=len(html)) as span:
+            links = list(dict.fromkeys(extract_links(html)))
+            span.set(links=len(links))
+        predictions = phishing_link.predict_phishing_parallel(links, deadline_ms=admission.cap_deadline_ms(deadline_ms))
+        results = [{"url": href, "prediction": pred} for href, pred in zip(links, predictions)]
+        pending = sum(1 for pred in predictions if pred == phishing_link.PENDING)
+        tracing.annotate(links=len(links), pending=pending)
+
+        _log_request("/classify_links: %d links, %d pending", len(links), pending, payload=results)
+        return jsonify({"results": results, "pending": pending}), 200
+    except admission.AdmissionError:
+        raise
     except Exception as e:
-        print("Error in /classify_links route:", e)
+        log.exception("Error in /classify_links route: %s", e)
         return str(e), 500
 
 #
 # END OF PHISHING_LINK_SVM_MODEL SECTION
 #
 
+def _parse_emails(indexed_emails):
+    with metrics.stage("strip_html", emails=len(indexed_emails)):
+        parsed = []
+        for index, email in indexed_emails:
+            with tracing.span("strip_html.email", index=index, chars=len(email)):
+                parsed.append(extract_text_and_links(email))
+        return parsed
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+@app.route("/analyze", methods=["POST"])
+@admission.admitted(admission.BULK)
+def analyze():
+    """
+    Category label and link verdicts for a batch of emails in one request.
+
+    Each body is parsed once; the extracted text feeds the email classifier and
+    the anchors feed the link classifier (deduped across the whole batch).
+
+    Request JSON Format:
+        {
+            "emails": ["<html>...", ...],
+            "deadline_ms": 500   # optional, for link scoring as in /classify_links
+        }
+
+    Response JSON Format:
+        {
+            "results": [{"label": "label1", "links": [{"url": "...", "prediction": "phishing"}, ...]}, ...],
+            "pending": 0,
+            "timings_ms": {"parse": 1.2, "classify": 3.4, "links": 0.8, "total": 5.5}
+        }
+    """
+    try:
+        data = request.json or {}
+        emails = data.get("emails", [])
+        if not isinstance(emails, list) or not all(isinstance(email, str) for email in emails):
+            return jsonify({"error": "emails must be a list of strings"}), 400
+        deadline_ms = data.get("deadline_ms")
+        if not _valid_deadline(deadline_ms):
+            return jsonify({"error": "deadline_ms must be a positive number"}), 400
+
+        email_classifier_svm = warmup.get_component("email_classifier")
+        phishing_link = warmup.get_component("phishing_link")
+        warmup.get_component("top_domains")
+        timings = {}
+        total_start = time.perf_counter()
+
+        start = time.perf_counter()
+        tracing.annotate(emails=len(emails))
+        parsed = admission.run_chunked(_parse_emails, list(enumerate(emails)))
+        timings["parse"] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        labels = admission.run_chunked(
+            lambda chunk: email_classifier_svm.predict_email_labels([email for email, _ in chunk],
+                                                                    texts=[text for _, (text, _) in chunk]),
+            list(zip(emails, parsed)))
+        timings["classify"] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        email_links = [list(dict.fromkeys(links)) for _, links in parsed]
+        unique_links = list(dict.fromkeys(href for links in email_links for href in links))
+        verdicts = dict(zip(unique_links, phishing_link.predict_phishing_parallel(
+            unique_links, deadline_ms=admission.cap_deadline_ms(deadline_ms))))
+        timings["links"] = _elapsed_ms(start)
+        timings["total"] = _elapsed_ms(total_start)
+
+        results = [
+            {"label": label, "links": [{"url": href, "prediction": verdicts[href]} for href in links]}
+            for label, links in zip(labels, email_links)
+        ]
+        pending = sum(1 for pred in verdicts.values() if pred == phishing_link.PENDING)
+        tracing.annotate(links=len(unique_links), pending=pending)
+        _log_request("/analyze: %d emails, %d links, %d pending, %.1f ms", len(emails), len(unique_links), pending,
+                     timings["total"], payload=results)
+        return jsonify({"results": results, "pending": pending, "timings_ms": timings}), 200
+    except admission.AdmissionError:
+        raise
+    except Exception as e:
+        log.exception("Error in /analyze route: %s", e)
+        return str(e), 500
+
+
 if __name__ == "__main__":
+    warmup.start()  # CLASSIFIER_WARMUP=background|eager|lazy
     app.run(host="0.0.0.0", port=5001)  # Run the Flask app on port 5001
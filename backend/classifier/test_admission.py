@@ -0,0 +1,254 @@
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import admission
+from admission import AdmissionError, AdmissionGate, Deadline, BACKGROUND, BULK, INTERACTIVE
+from svm_model import app
+
+
+def limits(max_active, max_queued, bulk_active=None):
+    bulk_active = max_active if bulk_active is None else bulk_active
+    return {INTERACTIVE: (max_active, max_queued), BULK: (bulk_active, max_queued), BACKGROUND: (1, max_queued)}
+
+
+class TestAdmissionGate(unittest.TestCase):
+
+    def test_full_queue_rejects_immediately(self):
+        """Test a request arriving with no slot and no queue room gets 429 without waiting"""
+        gate = AdmissionGate(max_active=1, limits=limits(1, 0), queue_timeout_ms=10000)
+        gate.acquire()
+        start = time.monotonic()
+        with self.assertRaises(AdmissionError) as raised:
+            gate.acquire()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(raised.exception.status, 429)
+        self.assertEqual(gate.stats()["classes"][BULK]["rejected_queue_full"], 1)
+
+    def test_queue_timeout_rejects_with_503(self):
+        """Test a queued request gives up with 503 after the queue timeout"""
+        gate = AdmissionGate(max_active=1, limits=limits(1, 1), queue_timeout_ms=20)
+        gate.acquire()
+        with self.assertRaises(AdmissionError) as raised:
+            gate.acquire()
+        self.assertEqual(raised.exception.status, 503)
+        self.assertEqual(gate.stats()["waiting"], 0)
+
+    def test_release_admits_waiter(self):
+        """Test a queued request gets the slot as soon as it is released"""
+        gate = AdmissionGate(max_active=1, limits=limits(1, 1), queue_timeout_ms=5000)
+        slot = gate.acquire()
+        admitted = threading.Event()
+        threading.Thread(target=lambda: (gate.acquire(), admitted.set()), daemon=True).start()
+        time.sleep(0.05)
+        self.assertFalse(admitted.is_set())
+        slot.release()
+        slot.release()
+        self.assertTrue(admitted.wait(5))
+        self.assertEqual(gate.stats()["active"], 1)
+
+    def wait_for_waiters(self, gate, count):
+        for _ in range(500):
+            if gate.stats()["waiting"] == count:
+                return
+            time.sleep(0.01)
+        self.fail(f"expected {count} waiters")
+
+    def test_interactive_waiter_goes_first(self):
+        """Test a free slot goes to an interactive waiter even if a bulk one queued earlier"""
+        gate = AdmissionGate(max_active=1, limits=limits(1, 4), queue_timeout_ms=5000)
+        slot = gate.acquire(BULK)
+        order = []
+        bulk = threading.Thread(target=lambda: (gate.acquire(BULK), order.append(BULK)), daemon=True)
+        bulk.start()
+        self.wait_for_waiters(gate, 1)
+        def interactive_request():
+            interactive_slot = gate.acquire(INTERACTIVE)
+            order.append(INTERACTIVE)
+            interactive_slot.release()
+
+        interactive = threading.Thread(target=interactive_request, daemon=True)
+        interactive.start()
+        self.wait_for_waiters(gate, 2)
+        slot.release()
+        interactive.join(5)
+        bulk.join(5)
+        self.assertEqual(order, [INTERACTIVE, BULK])
+        self.assertEqual(gate.stats()["classes"][INTERACTIVE]["admitted"], 1)
+
+    def test_bulk_limit_leaves_room_for_interactive(self):
+        """Test bulk requests cannot take the slots reserved beyond their class limit"""
+        gate = AdmissionGate(max_active=2, limits=limits(2, 4, bulk_active=1), queue_timeout_ms=20)
+        gate.acquire(BULK)
+        with self.assertRaises(AdmissionError):
+            gate.acquire(BULK)
+        gate.acquire(INTERACTIVE)
+        self.assertEqual(gate.stats()["active"], 2)
+
+    def test_bulk_yields_between_chunks(self):
+        """Test a bulk slot is handed to a waiting interactive request and taken back afterwards"""
+        gate = AdmissionGate(max_active=1, limits=limits(1, 4), queue_timeout_ms=5000)
+        bulk_slot = gate.acquire(BULK)
+        bulk_slot.yield_if_needed(1000)
+        self.assertEqual(gate.stats()["classes"][BULK]["yielded"], 0)
+
+        served = threading.Event()
+        thread = threading.Thread(target=lambda: (gate.acquire(INTERACTIVE).release(), served.set()), daemon=True)
+        thread.start()
+        self.wait_for_waiters(gate, 1)
+        bulk_slot.yield_if_needed(5000)
+        self.assertTrue(served.is_set())
+        self.assertTrue(bulk_slot.held)
+        stats = gate.stats()
+        self.assertEqual(stats["classes"][BULK]["yielded"], 1)
+        self.assertEqual(stats["classes"][BULK]["active"], 1)
+
+
+class TestAdmissionRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.original_gate = admission.GATE
+        admission.GATE = AdmissionGate(max_active=4, limits=limits(4, 8, bulk_active=2), queue_timeout_ms=1000)
+
+    def tearDown(self):
+        admission.GATE = self.original_gate
+
+    def test_too_many_emails(self):
+        """Test a batch over ADMISSION_MAX_EMAILS gets 413"""
+        original = admission.ADMISSION_MAX_EMAILS
+        admission.ADMISSION_MAX_EMAILS = 2
+        try:
+            response = self.client.post('/classify', json={'emails': ['a', 'b', 'c']})
+        finally:
+            admission.ADMISSION_MAX_EMAILS = original
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('Too many emails', response.json['error'])
+        self.assertEqual(admission.GATE.stats()["rejected_too_large"], 1)
+
+    def test_email_too_long(self):
+        """Test an email over ADMISSION_MAX_EMAIL_CHARS gets 413 naming its index"""
+        original = admission.ADMISSION_MAX_EMAIL_CHARS
+        admission.ADMISSION_MAX_EMAIL_CHARS = 10
+        try:
+            response = self.client.post('/analyze', json={'emails': ['short', 'x' * 11]})
+        finally:
+            admission.ADMISSION_MAX_EMAIL_CHARS = original
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('Email 1', response.json['error'])
+
+    def test_body_too_large(self):
+        """Test a body over MAX_CONTENT_LENGTH gets 413"""
+        original = app.config['MAX_CONTENT_LENGTH']
+        app.config['MAX_CONTENT_LENGTH'] = 16
+        try:
+            response = self.client.post('/classify', json={'emails': ['a fairly long email body']})
+        finally:
+            app.config['MAX_CONTENT_LENGTH'] = original
+        self.assertEqual(response.status_code, 413)
+
+    def test_busy_gets_retry_after(self):
+        """Test a saturated service answers 429 with Retry-After"""
+        admission.GATE = AdmissionGate(max_active=0, limits=limits(0, 0))
+        response = self.client.post('/classify', json={'emails': ['hello']})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], str(admission.ADMISSION_RETRY_AFTER))
+
+    def test_deadline_stops_work(self):
+        """Test a request past its deadline stops with 503 and releases its slot"""
+        response = self.client.post('/classify', json={'emails': ['hello'] * 200},
+                                    headers={admission.DEADLINE_HEADER: '0.001'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        stats = admission.GATE.stats()
+        self.assertEqual(stats["deadline_exceeded"], 1)
+        self.assertEqual(stats["active"], 0)
+
+    def test_invalid_deadline_header(self):
+        """Test a non-numeric deadline header gets 400"""
+        response = self.client.post('/classify', json={'emails': ['hello']},
+                                    headers={admission.DEADLINE_HEADER: 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_releases_slot_when_sent(self):
+        """Test a streamed response keeps its slot until the body has been sent"""
+        body = "".join(json.dumps(email) + "\n" for email in ['hello', 'x' * 20])
+        original = admission.ADMISSION_MAX_EMAIL_CHARS
+        admission.ADMISSION_MAX_EMAIL_CHARS = 10
+        try:
+            response = self.client.post('/classify', data=body, headers={'Content-Type': 'application/x-ndjson'})
+            self.assertEqual(admission.GATE.stats()["active"], 1)
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        finally:
+            admission.ADMISSION_MAX_EMAIL_CHARS = original
+        self.assertEqual(admission.GATE.stats()["active"], 0)
+        errors = [line for line in lines if 'error' in line]
+        self.assertEqual([line['index'] for line in errors], [1])
+
+    def stream(self, body, headers=None):
+        headers = dict({'Content-Type': 'application/x-ndjson'}, **(headers or {}))
+        return self.client.post('/classify', data=body, headers=headers)
+
+    def test_stream_over_byte_limit_rejected_up_front(self):
+        """Test an NDJSON body whose Content-Length is over ADMISSION_MAX_STREAM_BYTES gets 413"""
+        original = admission.ADMISSION_MAX_STREAM_BYTES
+        admission.ADMISSION_MAX_STREAM_BYTES = 16
+        try:
+            response = self.stream('"a fairly long email body"\n')
+        finally:
+            admission.ADMISSION_MAX_STREAM_BYTES = original
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(admission.GATE.stats()["active"], 0)
+
+    def test_stream_email_limit_ends_stream(self):
+        """Test a stream past ADMISSION_MAX_STREAM_EMAILS answers the emails read so far, then an error line"""
+        original = admission.ADMISSION_MAX_STREAM_EMAILS
+        admission.ADMISSION_MAX_STREAM_EMAILS = 2
+        try:
+            response = self.stream("".join(json.dumps(f"email {i}") + "\n" for i in range(5)))
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        finally:
+            admission.ADMISSION_MAX_STREAM_EMAILS = original
+        self.assertEqual(sorted(line['index'] for line in lines if 'prediction' in line), [0, 1])
+        self.assertIn('Too many emails', lines[-1]['error'])
+        self.assertNotIn('index', lines[-1])
+        self.assertEqual(admission.GATE.stats()["rejected_too_large"], 1)
+
+    def test_compressed_stream_byte_limit_counted_while_reading(self):
+        """Test the byte limit applies to a compressed stream, whose size is only known as it is read"""
+        body = gzip.compress("".join(json.dumps(f"email {i} " + "word " * 20) + "\n" for i in range(50)).encode())
+        original = admission.ADMISSION_MAX_STREAM_BYTES
+        admission.ADMISSION_MAX_STREAM_BYTES = 1000
+        try:
+            response = self.stream(body, {'Content-Encoding': 'gzip'})
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        finally:
+            admission.ADMISSION_MAX_STREAM_BYTES = original
+        self.assertIn('larger than 1000 bytes', lines[-1]['error'])
+        self.assertLess(len([line for line in lines if 'prediction' in line]), 50)
+
+    def test_link_deadline_capped_to_request(self):
+        """Test link scoring gets no more time than the request has left"""
+        with app.test_request_context('/classify_links'):
+            admission.g.deadline = Deadline(50)
+            self.assertLessEqual(admission.cap_deadline_ms(None), 50)
+            self.assertLessEqual(admission.cap_deadline_ms(1000), 50)
+            self.assertEqual(admission.cap_deadline_ms(5), 5)
+            admission.g.deadline = Deadline(0)
+            with self.assertRaises(AdmissionError):
+                admission.cap_deadline_ms(None)
+
+    def test_health_routes_are_not_gated(self):
+        """Test / keeps answering while every work slot is taken"""
+        admission.GATE = AdmissionGate(max_active=0, limits=limits(0, 0))
+        self.assertEqual(self.client.get('/').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
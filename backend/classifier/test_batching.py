@@ -0,0 +1,161 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batching import MicroBatcher, Histogram
+import batching
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def tearDown(self):
+        for name in [n for n in batching.BATCHERS if n.startswith("test-")]:
+            del batching.BATCHERS[name]
+
+    def test_concurrent_submissions_share_one_call(self):
+        """Test concurrent callers are coalesced and each gets its own slice"""
+        calls = []
+        gate = threading.Barrier(5)
+
+        def double(items):
+            calls.append(list(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher("test-coalesce", double, max_batch_size=100, max_wait_ms=200)
+        results = {}
+
+        def worker(n):
+            gate.wait()
+            results[n] = batcher.submit([n, n + 100])
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for n in range(5):
+            self.assertEqual(results[n], [2 * n, 2 * (n + 100)])
+        self.assertLess(len(calls), 5)
+        self.assertEqual(sum(len(call) for call in calls), 10)
+        stats = batcher.stats()
+        self.assertEqual(stats["submissions"], 5)
+        self.assertEqual(stats["batches"], len(calls))
+
+    def test_full_batch_dispatches_without_waiting(self):
+        """Test a submission reaching max_batch_size does not wait for the timeout"""
+        batcher = MicroBatcher("test-full", lambda items: items, max_batch_size=3, max_wait_ms=10000)
+        done = threading.Event()
+        threading.Thread(target=lambda: (batcher.submit([1, 2, 3, 4]), done.set()), daemon=True).start()
+        self.assertTrue(done.wait(5))
+        self.assertEqual(batcher.stats()["batch_size"]["count"], 1)
+
+    def test_errors_reach_every_caller(self):
+        """Test an exception in the batch function is raised to the caller"""
+        def fail(items):
+            raise ValueError("boom")
+
+        batcher = MicroBatcher("test-error", fail, max_batch_size=10, max_wait_ms=1)
+        with self.assertRaises(ValueError):
+            batcher.submit(["a"])
+
+    def test_failing_submission_does_not_fail_others(self):
+        """Test only the caller whose items make the shared call fail gets the error"""
+        calls = []
+        gate = threading.Barrier(2)
+
+        def upper(items):
+            calls.append(list(items))
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher("test-isolate", upper, max_batch_size=100, max_wait_ms=200)
+        results = {}
+
+        def worker(items):
+            gate.wait()
+            try:
+                results[items[0]] = batcher.submit(items)
+            except AttributeError as e:
+                results[items[0]] = e
+
+        threads = [threading.Thread(target=worker, args=(items,)) for items in (["ok"], [12345])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results["ok"], ["OK"])
+        self.assertIsInstance(results[12345], AttributeError)
+        if len(calls[0]) == 2:
+            # Coalesced: the shared call failed and both submissions were re-run alone
+            self.assertEqual(len(calls), 3)
+
+    def test_batch_never_exceeds_max_size(self):
+        """Test a submission that would overflow the batch is held over for the next one"""
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def record(items):
+            calls.append(list(items))
+            if len(calls) == 1:
+                started.set()
+                release.wait(5)
+            return items
+
+        batcher = MicroBatcher("test-holdover", record, max_batch_size=8, max_wait_ms=200)
+        # Keep the dispatcher busy so the next two submissions are queued together
+        first = threading.Thread(target=batcher.submit, args=([0],))
+        first.start()
+        self.assertTrue(started.wait(5))
+        results = {}
+        threads = [threading.Thread(target=lambda items=items: results.setdefault(len(items), batcher.submit(items)))
+                   for items in ([1, 2], list(range(50)))]
+        threads[0].start()
+        while batcher.stats()["queue_depth"] < 1:
+            time.sleep(0.001)
+        threads[1].start()
+        while batcher.stats()["queue_depth"] < 2:
+            time.sleep(0.001)
+        release.set()
+        for thread in [first] + threads:
+            thread.join()
+
+        self.assertEqual([len(call) for call in calls], [1, 2, 50])
+        self.assertEqual(results[2], [1, 2])
+        self.assertEqual(results[50], list(range(50)))
+
+    def test_disabled_calls_directly(self):
+        """Test max_wait_ms=0 runs the function in the calling thread"""
+        caller = []
+        batcher = MicroBatcher("test-off", lambda items: caller.append(threading.get_ident()) or items,
+                               max_batch_size=10, max_wait_ms=0)
+        self.assertEqual(batcher.submit(["x"]), ["x"])
+        self.assertEqual(caller, [threading.get_ident()])
+        self.assertEqual(batcher.submit([]), [])
+
+    def test_stats_registry(self):
+        """Test batchers are listed by name in batching.stats()"""
+        MicroBatcher("test-registry", lambda items: items)
+        self.assertIn("test-registry", batching.stats())
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_power_of_two_buckets(self):
+        """Test values land in the smallest power-of-two bucket that holds them"""
+        histogram = Histogram(8)
+        for value in [1, 2, 3, 8, 9]:
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {"1": 1, "2": 1, "4": 1, "8": 1, "+Inf": 1})
+        self.assertEqual(snapshot["count"], 5)
+        self.assertAlmostEqual(snapshot["mean"], 4.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import sys
 import os
+import tempfile
+import subprocess
 
 # Add the classifier directory to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -13,12 +15,20 @@ from email_classifier_svm import (
     convert_newlines,
     to_lowercase,
     preprocess_text,
+    preprocess,
+    preprocess_many,
     predict_email_label,
     classify
 )
+import email_classifier_svm
 
 
 class TestEmailClassifier(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Importing the module loads nothing; several tests inspect the loaded pipeline
+        email_classifier_svm.ensure_model()
     
     def test_strip_html(self):
         """Test HTML stripping functionality"""
@@ -88,6 +98,22 @@ class TestEmailClassifier(unittest.TestCase):
         # Should contain placeholders
         # Note: exact output depends on NER and regex processing
     
+    def test_preprocess_many_matches_preprocess(self):
+        """Test bulk preprocessing gives the same tokens as one-at-a-time"""
+        texts = [
+            "Meeting with the team on 2024-01-15",
+            "Visit https://example.com or call 5551234567",
+            ""
+        ]
+        self.assertEqual(preprocess_many(texts, batch_size=2), [preprocess(t) for t in texts])
+        self.assertEqual(preprocess_many([]), [])
+
+    def test_preprocess_many_trims_pipeline(self):
+        """Test that only the components used by the token filter are enabled"""
+        self.assertNotIn("parser", email_classifier_svm.nlp.pipe_names)
+        for name in email_classifier_svm.nlp.pipe_names:
+            self.assertIn(name, email_classifier_svm.SPACY_COMPONENTS)
+
     def test_classify_empty_list(self):
         """Test classification with empty email list"""
         result = classify([])
@@ -111,6 +137,16 @@ class TestEmailClassifier(unittest.TestCase):
         self.assertEqual(len(result), len(emails))
         self.assertIsInstance(result[0], str)
     
+    def test_classify_matches_single_predictions(self):
+        """Test batched classification returns the same labels as per-email prediction"""
+        emails = [
+            "<p>Important meeting tomorrow</p>",
+            "Check out our sale! 50% off at https://shop.example.com",
+            "Happy birthday!",
+            "Your package has shipped"
+        ]
+        self.assertEqual(classify(emails), [predict_email_label(e) for e in emails])
+
     def test_predict_email_label(self):
         """Test email label prediction"""
         email = "This is a test email about an important meeting"
@@ -121,6 +157,178 @@ class TestEmailClassifier(unittest.TestCase):
         self.assertIn(result, valid_categories)
 
 
+class TestClassifyCache(unittest.TestCase):
+
+    def setUp(self):
+        email_classifier_svm.LABEL_CACHE.clear()
+        email_classifier_svm.TOKEN_CACHE.clear()
+
+    def test_repeat_bodies_hit_label_cache(self):
+        """Test a repeated body is answered from the label cache"""
+        body = "<p>Your invoice for March is attached</p>"
+        first = classify([body])
+        hits = email_classifier_svm.LABEL_CACHE.hits
+        second = classify([body])
+        self.assertEqual(first, second)
+        self.assertEqual(email_classifier_svm.LABEL_CACHE.hits, hits + 1)
+
+    def test_duplicates_in_one_batch(self):
+        """Test duplicate bodies in one batch get the same label"""
+        result = classify(["Dinner tonight?", "Team offsite agenda", "Dinner tonight?"])
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[0], result[2])
+        self.assertEqual(len(email_classifier_svm.TOKEN_CACHE), 2)
+
+    def test_scores_match_labels(self):
+        """Test scored classification agrees with plain labels and ranks classes"""
+        emails = ["Huge discount this weekend only", "Can we meet for coffee?", "Huge discount this weekend only"]
+        scored = email_classifier_svm.classify_with_scores(emails, top_k=2)
+        classes = set(str(c) for c in email_classifier_svm.model.named_steps['svm'].classes_)
+        self.assertEqual([r['label'] for r in scored], classify(emails))
+        for result in scored:
+            self.assertEqual(set(result['scores']), classes)
+            self.assertEqual(len(result['top_k']), 2)
+            self.assertEqual(result['top_k'][0]['label'], result['label'])
+            self.assertGreaterEqual(result['top_k'][0]['score'], result['top_k'][1]['score'])
+
+    def test_scores_use_single_decision_call(self):
+        """Test scores come from one decision_function call and no predict call"""
+        classifier = email_classifier_svm.model.named_steps['svm']
+        calls = []
+        original_decision = classifier.decision_function
+        classifier.decision_function = lambda X: calls.append(('decision', X.shape[0])) or original_decision(X)
+        classifier.predict = lambda X: calls.append(('predict', X.shape[0]))
+        try:
+            email_classifier_svm.classify_with_scores(["one body", "two body", "three body"])
+        finally:
+            del classifier.decision_function
+            del classifier.predict
+        self.assertEqual(calls, [('decision', 3)])
+
+    def test_pre_extracted_texts_skip_html_parse(self):
+        """Test passing extracted texts gives the same labels without calling strip_html"""
+        from html_text import extract_text
+        emails = ["<p>Flash <b>sale</b> ends tonight</p>", "<div>Lunch on Friday?</div>"]
+        expected = classify(emails)
+        email_classifier_svm.LABEL_CACHE.clear()
+        email_classifier_svm.TOKEN_CACHE.clear()
+
+        original = email_classifier_svm.strip_html
+        email_classifier_svm.strip_html = lambda text: self.fail("strip_html should not be called")
+        try:
+            labels = email_classifier_svm.predict_email_labels(emails, texts=[extract_text(e) for e in emails])
+        finally:
+            email_classifier_svm.strip_html = original
+        self.assertEqual(labels, expected)
+
+    def test_model_reload_clears_labels(self):
+        """Test loading a new artifact invalidates cached labels but keeps tokens"""
+        classify(["Quarterly report deadline"])
+        self.assertEqual(len(email_classifier_svm.LABEL_CACHE), 1)
+        email_classifier_svm._set_model(email_classifier_svm.model, email_classifier_svm.model_hash)
+        self.assertEqual(len(email_classifier_svm.LABEL_CACHE), 0)
+        self.assertEqual(len(email_classifier_svm.TOKEN_CACHE), 1)
+
+
+class TestPipelineArtifact(unittest.TestCase):
+
+    def test_training_hash_is_stable(self):
+        """Test the training hash only depends on data and config"""
+        self.assertEqual(
+            email_classifier_svm.compute_training_hash(),
+            email_classifier_svm.compute_training_hash()
+        )
+
+    def test_training_hash_changes_with_data(self):
+        """Test that different training data yields a different hash"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'emails.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('[{"label": "Personal", "subject": "Hi", "body": "Dinner?"}]')
+            self.assertNotEqual(
+                email_classifier_svm.compute_training_hash(path),
+                email_classifier_svm.compute_training_hash()
+            )
+
+    def test_pipeline_roundtrip(self):
+        """Test that a saved pipeline is reused only for a matching hash"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'email_pipeline.joblib')
+            email_classifier_svm.save_pipeline(email_classifier_svm.model, 'abc', path)
+
+            loaded = email_classifier_svm.load_pipeline('abc', path)
+            self.assertIsNotNone(loaded)
+            self.assertEqual(
+                list(loaded.predict(["Important meeting tomorrow"])),
+                list(email_classifier_svm.model.predict(["Important meeting tomorrow"]))
+            )
+            self.assertIsNone(email_classifier_svm.load_pipeline('other', path))
+
+    def test_training_hash_depends_on_engine(self):
+        """Test the spaCy and lite engines never share a persisted artifact"""
+        self.assertNotEqual(
+            email_classifier_svm.compute_training_hash(engine='spacy'),
+            email_classifier_svm.compute_training_hash(engine='lite')
+        )
+        self.assertNotEqual(
+            email_classifier_svm.pipeline_path('spacy'),
+            email_classifier_svm.pipeline_path('lite')
+        )
+
+    def test_lite_engine_pipeline(self):
+        """Test a pipeline trained with the lite engine predicts valid labels"""
+        pipeline = email_classifier_svm.train_pipeline(save=False, engine='lite')
+        self.assertEqual(pipeline.named_steps['preprocess'].engine, 'lite')
+        prediction = pipeline.predict(["Huge sale! 50% off everything this weekend"])[0]
+        self.assertIn(prediction, ["Important", "Promotional", "Social", "Personal", "Notification"])
+
+    def test_classifier_engines(self):
+        """Test every classifier engine trains and predicts valid labels"""
+        valid_categories = ["Important", "Promotional", "Social", "Personal", "Notification"]
+        for classifier in email_classifier_svm.CLASSIFIER_ENGINES:
+            with self.subTest(classifier=classifier):
+                pipeline = email_classifier_svm.train_pipeline(save=False, engine='lite', classifier=classifier)
+                self.assertIn(pipeline.predict(["Team meeting moved to Friday"])[0], valid_categories)
+
+    def test_classifier_engine_artifacts_are_separate(self):
+        """Test each classifier engine has its own artifact and hash"""
+        paths = {email_classifier_svm.pipeline_path('spacy', c) for c in email_classifier_svm.CLASSIFIER_ENGINES}
+        self.assertEqual(len(paths), len(email_classifier_svm.CLASSIFIER_ENGINES))
+        self.assertTrue(email_classifier_svm.pipeline_path('spacy', 'svc').endswith('email_pipeline.joblib'))
+        self.assertNotEqual(
+            email_classifier_svm.compute_training_hash(classifier='svc'),
+            email_classifier_svm.compute_training_hash(classifier='linear')
+        )
+
+    def test_retrain_cli_artifact_loads_on_import(self):
+        """Test a pipeline written by `python email_classifier_svm.py --retrain` loads in the service"""
+        classifier_dir = os.path.dirname(os.path.abspath(__file__))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'email_pipeline.joblib')
+            default_path = email_classifier_svm.PIPELINE_PATH
+            default_mtime = os.path.getmtime(default_path) if os.path.exists(default_path) else None
+            out = subprocess.run([sys.executable, 'email_classifier_svm.py', '--retrain', '--path', path],
+                                 cwd=classifier_dir, capture_output=True, text=True, check=True)
+            loaded = email_classifier_svm.load_pipeline(email_classifier_svm.compute_training_hash(), path)
+            self.assertIsNotNone(loaded)
+            self.assertEqual(type(loaded.named_steps['preprocess']).__module__, 'email_classifier_svm')
+            # Trained once, and the default artifact was left alone
+            self.assertEqual(out.stdout.count("SVM model trained successfully"), 1)
+            self.assertEqual(os.path.getmtime(default_path) if os.path.exists(default_path) else None,
+                             default_mtime)
+
+    def test_import_loads_nothing(self):
+        """Test importing the module neither loads nor trains a pipeline"""
+        code = "import email_classifier_svm as m; print(m.model is None)"
+        out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip().splitlines()[-1], "True")
+
+    def test_load_pipeline_missing_file(self):
+        """Test loading from a missing artifact returns None"""
+        self.assertIsNone(email_classifier_svm.load_pipeline('abc', '/nonexistent/pipeline.joblib'))
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -1,6 +1,7 @@
 import unittest
 import sys
 import os
+import io
 import json
 
 # Add the classifier directory to the path
@@ -85,6 +86,45 @@ class TestFlaskApp(unittest.TestCase):
         self.assertIn('predictions', data)
         self.assertEqual(len(data['predictions']), 3)
     
+    def test_classify_route_default_payload_has_no_scores(self):
+        """Test scores are opt-in"""
+        response = self.client.post('/classify',
+                                   data=json.dumps({'emails': ['Happy birthday!']}),
+                                   content_type='application/json')
+        data = json.loads(response.data)
+        self.assertEqual(set(data), {'predictions'})
+
+    def test_classify_route_with_scores(self):
+        """Test classify endpoint returns scores and top-k labels when requested"""
+        response = self.client.post('/classify',
+                                   data=json.dumps({
+                                       'emails': ['Important meeting tomorrow', 'Check out our sale!'],
+                                       'top_k': 2
+                                   }),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(len(data['predictions']), 2)
+        self.assertEqual(len(data['scores']), 2)
+        for prediction, ranked in zip(data['predictions'], data['top_k']):
+            self.assertEqual(len(ranked), 2)
+            self.assertEqual(ranked[0]['label'], prediction)
+
+    def test_classify_route_invalid_top_k(self):
+        """Test classify endpoint rejects a non-positive top_k"""
+        response = self.client.post('/classify',
+                                   data=json.dumps({'emails': ['Hi'], 'top_k': 0}),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_classify_route_invalid_emails(self):
+        """Test classify rejects a payload that is not a list of strings"""
+        for emails in ["just one body", [12345], ['Hi', None]]:
+            response = self.client.post('/classify', data=json.dumps({'emails': emails}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', json.loads(response.data))
+
     def test_classify_route_invalid_json(self):
         """Test classify endpoint with invalid JSON"""
         response = self.client.post('/classify',
@@ -93,6 +133,41 @@ class TestFlaskApp(unittest.TestCase):
         # Should return error status
         self.assertIn(response.status_code, [400, 500])
     
+    def test_feedback_route_requires_online_engine(self):
+        """Test feedback is rejected unless the online engine is active"""
+        import email_classifier_svm
+        if email_classifier_svm.online_learner is not None:
+            self.skipTest("Online engine active")
+        response = self.client.post('/feedback',
+                                    data=json.dumps({'emails': ['Hi'], 'labels': ['Personal']}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', json.loads(response.data))
+
+    def test_feedback_route_invalid_payload(self):
+        """Test feedback rejects emails or labels that are not lists of strings"""
+        for payload in [{'emails': [12345], 'labels': ['Personal']},
+                        {'emails': ['Hi'], 'labels': [['Personal']]},
+                        {'emails': 'Hi', 'labels': ['Personal']}]:
+            response = self.client.post('/feedback', data=json.dumps(payload), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('must be a list of strings', json.loads(response.data)['error'])
+
+    def test_stats_route(self):
+        """Test stats endpoint exposes classify cache counters"""
+        self.client.post('/classify',
+                         data=json.dumps({'emails': ['Repeat body', 'Repeat body']}),
+                         content_type='application/json')
+        response = self.client.get('/stats')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertIn('classify_cache', data)
+        for name in ['labels', 'tokens']:
+            self.assertIn('hits', data['classify_cache'][name])
+            self.assertIn('misses', data['classify_cache'][name])
+        self.assertIn('hit_rate', data['link_cache']['registered_domain'])
+        self.assertIn('batch_size', data['batching']['classify'])
+
     def test_classify_links_route_missing_html(self):
         """Test classify_links endpoint with missing html field"""
         response = self.client.post('/classify_links',
@@ -127,6 +202,150 @@ class TestFlaskApp(unittest.TestCase):
             # Model not available, which is acceptable
             self.assertEqual(response.status_code, 500)
     
+    def test_classify_stream_matches_classify(self):
+        """Test NDJSON streaming returns the same labels as the buffered route"""
+        emails = ['Meeting moved to 3pm', '<p>50% off everything</p>', 'Your package has shipped']
+        body = "".join(json.dumps(email) + "\n" for email in emails)
+        response = self.client.post('/classify', data=body, content_type='application/x-ndjson')
+        if response.status_code != 200:
+            self.assertEqual(response.status_code, 500)
+            return
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        predictions = {line['index']: line['prediction'] for line in lines}
+
+        buffered = self.client.post('/classify', data=json.dumps({'emails': emails}),
+                                    content_type='application/json')
+        self.assertEqual([predictions[i] for i in range(len(emails))], json.loads(buffered.data)['predictions'])
+
+    def test_classify_stream_reports_bad_lines(self):
+        """Test a non-string line yields an error entry and the stream continues"""
+        body = '"first email"\n{"not": "a string"}\nnot json\n\n"last email"\n'
+        response = self.client.post('/classify', data=body, content_type='application/x-ndjson')
+        if response.status_code != 200:
+            self.assertEqual(response.status_code, 500)
+            return
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        errors = sorted(line['index'] for line in lines if 'error' in line)
+        predicted = sorted(line['index'] for line in lines if 'prediction' in line)
+        self.assertEqual(errors, [1, 2])
+        self.assertEqual(predicted, [0, 3])
+
+    def test_classify_stream_skips_oversized_lines(self):
+        """Test an over-long line, terminated or not, yields an error entry without ending the stream"""
+        import admission
+        body = '"first"\n"' + 'x' * 5000 + '"\n"after"\n"' + 'y' * 5000
+        original = admission.ADMISSION_MAX_EMAIL_CHARS
+        admission.ADMISSION_MAX_EMAIL_CHARS = 10
+        try:
+            response = self.client.post('/classify', data=body, content_type='application/x-ndjson')
+            if response.status_code != 200:
+                self.assertEqual(response.status_code, 500)
+                return
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        finally:
+            admission.ADMISSION_MAX_EMAIL_CHARS = original
+        errors = {line['index']: line['error'] for line in lines if 'error' in line}
+        self.assertEqual(sorted(errors), [1, 3])
+        self.assertIn('longer than 10 characters', errors[3])
+        self.assertEqual(sorted(line['index'] for line in lines if 'prediction' in line), [0, 2])
+
+    def test_stream_lines_are_read_in_bounded_pieces(self):
+        """Test a long unterminated line is never read into memory whole"""
+        import svm_model
+
+        class RecordingStream(io.BytesIO):
+            longest = 0
+
+            def readline(self, size=-1):
+                line = super().readline(size)
+                self.longest = max(self.longest, len(line))
+                return line
+
+        stream = RecordingStream(b'"a"\n' + b'x' * 100000)
+        counts = {"bytes": 0}
+        self.assertEqual(list(svm_model._read_lines(stream, 64, counts)), [b'"a"\n', None])
+        self.assertLessEqual(stream.longest, 64)
+        self.assertEqual(counts["bytes"], 100004)
+
+    def test_classify_stream_is_incremental(self):
+        """Test the first results are sent before the whole request body is read"""
+        import svm_model
+        body = "".join(json.dumps(f"email {i} " + "word " * 200) + "\n" for i in range(300)).encode()
+        source = io.BytesIO(body)
+        original_chunk = svm_model.CLASSIFY_STREAM_CHUNK
+        svm_model.CLASSIFY_STREAM_CHUNK = 2
+        try:
+            response = self.client.post('/classify', input_stream=source, content_type='application/x-ndjson',
+                                        headers={'Content-Length': str(len(body))})
+            if response.status_code != 200:
+                self.assertEqual(response.status_code, 500)
+                return
+            first = json.loads(next(iter(response.response)))
+            self.assertEqual(first['index'], 0)
+            self.assertLess(source.tell(), len(body) // 10)
+            response.close()
+        finally:
+            svm_model.CLASSIFY_STREAM_CHUNK = original_chunk
+
+    def test_classify_links_route_invalid_deadline(self):
+        """Test classify_links rejects a non-positive deadline_ms"""
+        for deadline in [0, -5, "soon", True]:
+            response = self.client.post('/classify_links',
+                                        data=json.dumps({'html': '<a href="https://a.com">a</a>',
+                                                         'deadline_ms': deadline}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_classify_links_route_reports_pending(self):
+        """Test classify_links reports how many links are still pending"""
+        html = '<a href="https://example.com/1">1</a><a href="https://example.com/1">dup</a>'
+        response = self.client.post('/classify_links',
+                                    data=json.dumps({'html': html, 'deadline_ms': 1000}),
+                                    content_type='application/json')
+        if response.status_code != 200:
+            self.assertEqual(response.status_code, 500)
+            return
+        data = json.loads(response.data)
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['pending'], 0)
+
+    def test_analyze_route(self):
+        """Test analyze returns the /classify labels and per-email link verdicts"""
+        emails = ['<p>Sale now</p><a href="https://shop.example.com/deal">deal</a>',
+                  '<p>Meeting notes</p><a href="https://shop.example.com/deal">same</a>'
+                  '<a href="https://docs.example.org/notes">notes</a>']
+        response = self.client.post('/analyze', data=json.dumps({'emails': emails}),
+                                    content_type='application/json')
+        if response.status_code != 200:
+            self.assertEqual(response.status_code, 500)
+            return
+        data = json.loads(response.data)
+        classify_response = self.client.post('/classify', data=json.dumps({'emails': emails}),
+                                             content_type='application/json')
+        expected_labels = json.loads(classify_response.data)['predictions']
+        self.assertEqual([r['label'] for r in data['results']], expected_labels)
+        self.assertEqual([len(r['links']) for r in data['results']], [1, 2])
+        self.assertEqual(data['results'][0]['links'][0]['url'], 'https://shop.example.com/deal')
+        for name in ['parse', 'classify', 'links', 'total']:
+            self.assertIn(name, data['timings_ms'])
+
+    def test_analyze_route_empty(self):
+        """Test analyze with no emails returns no results"""
+        response = self.client.post('/analyze', data=json.dumps({'emails': []}),
+                                    content_type='application/json')
+        if response.status_code == 200:
+            self.assertEqual(json.loads(response.data)['results'], [])
+        else:
+            self.assertEqual(response.status_code, 500)
+
+    def test_analyze_route_invalid_emails(self):
+        """Test analyze rejects a payload that is not a list of strings"""
+        for emails in ["just one body", [1, 2]]:
+            response = self.client.post('/analyze', data=json.dumps({'emails': emails}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
     def test_classify_links_route_no_links(self):
         """Test classify_links endpoint with HTML containing no links"""
         html = '<html><body><p>No links here</p></body></html>'
@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+
+# Add the classifier directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import html_text
+from html_text import extract_text, extract_links, extract_text_and_links
+
+HTML = (
+    "<html><head><title>Offer</title><style>p { color: red; }</style></head>"
+    "<body><p>Hello <b>world</b> &amp; friends</p>"
+    "<script>var tracking = 1;</script>"
+    "<a href='https://example.com/a'>A</a><a href=''>empty</a><a>no href</a>"
+    "<a href='https://example.com/a'>again</a><!-- hidden comment --></body></html>"
+)
+
+
+class TestHtmlText(unittest.TestCase):
+
+    def test_extract_text_drops_tags_scripts_and_styles(self):
+        """Test visible text is extracted without markup, scripts or styles"""
+        text = extract_text(HTML)
+        self.assertIn("Hello world & friends", text)
+        self.assertNotIn("tracking", text)
+        self.assertNotIn("color", text)
+        self.assertNotIn("hidden comment", text)
+        self.assertNotIn("<p>", text)
+
+    def test_plain_text_passthrough(self):
+        """Test plain text bodies come back unchanged"""
+        self.assertEqual(extract_text("Important meeting tomorrow"), "Important meeting tomorrow")
+        self.assertEqual(extract_text(""), "")
+
+    def test_extract_links(self):
+        """Test non-empty hrefs are returned in document order"""
+        self.assertEqual(extract_links(HTML), ["https://example.com/a", "https://example.com/a"])
+
+    def test_extract_text_and_links_single_parse(self):
+        """Test the combined call matches the separate ones"""
+        text, links = extract_text_and_links(HTML)
+        self.assertEqual(text, extract_text(HTML))
+        self.assertEqual(links, extract_links(HTML))
+
+    def test_max_text_chars(self):
+        """Test output is truncated to the configured size"""
+        body = "<p>" + "word " * 10000 + "</p>"
+        self.assertEqual(len(extract_text(body, max_text_chars=100)), 100)
+
+    def test_max_input_chars(self):
+        """Test input beyond the limit is never parsed"""
+        body = "<p>start</p>" + "<div>filler</div>" * 1000 + "<p>tail</p>"
+        self.assertNotIn("tail", extract_text(body, max_input_chars=200))
+
+    def test_stdlib_backend_stops_early(self):
+        """Test the streaming parser stops feeding once the text budget is used"""
+        body = "<p>" + "x " * 200000 + "</p>"
+        text, links = html_text._extract_stdlib(body, 50, want_text=True, want_links=False)
+        self.assertLessEqual(len(text), 200000)
+        self.assertGreaterEqual(len(text), 50)
+
+    @unittest.skipUnless(html_text._SELECTOLAX_AVAILABLE, "selectolax not installed")
+    def test_backends_agree(self):
+        """Test the selectolax and stdlib backends extract the same text and links"""
+        self.assertEqual(
+            html_text._extract_selectolax(HTML, True, True),
+            html_text._extract_stdlib(HTML, 10 ** 6, True, True)
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
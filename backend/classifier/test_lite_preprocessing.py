@@ -0,0 +1,72 @@
+import unittest
+import sys
+import os
+import subprocess
+
+# Add the classifier directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lite_preprocessing import (
+    lemmatize,
+    preprocess_lite,
+    preprocess_lite_many,
+    STOPWORDS
+)
+
+
+class TestLitePreprocessing(unittest.TestCase):
+
+    def test_replaces_patterns(self):
+        """Test the combined regex pass replaces every pattern type"""
+        text = "Visit https://example.com/x on 2024-01-15, call 5551234567 or mail test@example.com about 42"
+        tokens = preprocess_lite(text).split()
+        for placeholder in ["URL", "DATE", "PHONE", "EMAIL", "NUM"]:
+            self.assertIn(placeholder, tokens)
+        self.assertNotIn("example", tokens)
+
+    def test_url_wins_over_email_and_num(self):
+        """Test pattern priority matches the sequential substitutions"""
+        self.assertEqual(preprocess_lite("https://a.com/user@b.com/123"), "URL")
+
+    def test_patterns_are_shared(self):
+        """Test both engines read their placeholder patterns from text_patterns"""
+        import lite_preprocessing
+        import text_patterns
+        self.assertIs(lite_preprocessing.LITE_PATTERNS, text_patterns.PLACEHOLDER_PATTERNS)
+        self.assertEqual([name for name, _ in lite_preprocessing.LITE_PATTERNS],
+                         ["URL", "EMAIL", "DATE", "PHONE", "NUM"])
+
+    def test_drops_stopwords_and_short_tokens(self):
+        """Test stopwords and one-letter tokens are removed"""
+        tokens = preprocess_lite("This is a test of the system x").split()
+        self.assertEqual(tokens, ["test"])
+        self.assertIn("the", STOPWORDS)
+
+    def test_lowercases_words(self):
+        """Test output words are lowercase"""
+        self.assertEqual(preprocess_lite("MEETING Tomorrow"), "meeting tomorrow")
+
+    def test_lemmatize(self):
+        """Test lookup-table and suffix lemmatization"""
+        self.assertEqual(lemmatize("children"), "child")
+        self.assertEqual(lemmatize("parties"), "party")
+        self.assertEqual(lemmatize("invoices"), "invoice")
+        self.assertEqual(lemmatize("boxes"), "box")
+        self.assertEqual(lemmatize("address"), "address")
+        self.assertEqual(lemmatize("status"), "status")
+
+    def test_many_matches_single(self):
+        """Test batch API returns the per-text results in order"""
+        texts = ["Sale ends today!", "", "Your order #12345 shipped"]
+        self.assertEqual(preprocess_lite_many(texts), [preprocess_lite(t) for t in texts])
+
+    def test_does_not_import_spacy(self):
+        """Test the lite engine can be imported without spaCy"""
+        code = "import sys, lite_preprocessing; print('spacy' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+import svm_model
+from svm_model import app
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        return response.data.decode()
+
+    def test_request_counts_and_latency(self):
+        """Test requests are counted and timed per endpoint and status"""
+        before = metrics.REQUESTS.value('/classify', 'POST', '200')
+        timed = metrics.REQUEST_SECONDS.count('/classify')
+        self.client.post('/classify', json={'emails': ['quarterly report attached']})
+        self.assertEqual(metrics.REQUESTS.value('/classify', 'POST', '200'), before + 1)
+        self.assertEqual(metrics.REQUEST_SECONDS.count('/classify'), timed + 1)
+        text = self.scrape()
+        self.assertIn('classifier_requests_total{endpoint="/classify",method="POST",status="200"}', text)
+        self.assertIn('classifier_request_duration_seconds_bucket{endpoint="/classify",le="+Inf"}', text)
+
+    def test_errors_counted(self):
+        """Test 5xx responses are counted as errors"""
+        before = metrics.ERRORS.value('/classify')
+        self.client.post('/classify', data=b'not json', headers={'Content-Type': 'application/json'})
+        self.assertEqual(metrics.ERRORS.value('/classify'), before + 1)
+
+    def test_stage_timings(self):
+        """Test each model stage records a timing for an uncached email and its links"""
+        unique = f"stage timing {time.monotonic_ns()}"
+        before = {stage: metrics.STAGE_SECONDS.count(stage) for stage in metrics.STAGES}
+        self.client.post('/classify', json={'emails': [f'<p>{unique}</p>']})
+        self.client.post('/classify_links', json={'html': f'<a href="http://{time.monotonic_ns()}.example.xyz/a">a</a>'})
+        for stage in ("strip_html", "preprocess", "tfidf", "svc_predict", "extract_links", "top1m_lookup",
+                      "link_features", "link_svc_predict"):
+            self.assertGreater(metrics.STAGE_SECONDS.count(stage), before[stage], stage)
+        self.assertIn('classifier_stage_duration_seconds_count{stage="tfidf"}', self.scrape())
+
+    def test_collected_gauges(self):
+        """Test cache, admission and batching gauges are exported"""
+        self.client.post('/classify', json={'emails': ['hello again']})
+        text = self.scrape()
+        for name in ('classifier_cache_hits_total{cache="classify_labels"}', 'classifier_admission_active{class="bulk"}',
+                     'classifier_batch_queue_depth{batcher="classify"}', 'classifier_prefetch_pending'):
+            self.assertIn(name, text)
+        self.assertEqual(text.count('# TYPE classifier_cache_hits_total counter'), 1)
+
+
+class TestMetricTypes(unittest.TestCase):
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test rendered buckets are cumulative and end with count and sum"""
+        histogram = metrics.Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+        metrics._METRICS.remove(histogram)
+        for value in (0.05, 0.5, 2.0):
+            histogram.observe(value, "a")
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{stage="a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="a",le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{stage="a"} 3', lines)
+
+    def test_label_values_are_escaped(self):
+        """Test quotes and newlines in label values are escaped"""
+        self.assertEqual(metrics._labels(("a",), ('x"y\nz',)), '{a="x\\"y\\nz"}')
+
+
+class TestSampledLogging(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.original_rate = svm_model.LOG_SAMPLE_RATE
+
+    def tearDown(self):
+        svm_model.LOG_SAMPLE_RATE = self.original_rate
+
+    def test_sampled_summary(self):
+        """Test a sampled request logs a one-line summary, not the payload, at INFO"""
+        svm_model.LOG_SAMPLE_RATE = 1.0
+        with self.assertLogs('classifier', level='INFO') as logs:
+            self.client.post('/classify', json={'emails': ['secret body text']})
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('/classify: 1 emails', logs.output[0])
+        self.assertNotIn('secret body text', logs.output[0])
+
+    def test_payload_at_debug(self):
+        """Test the payload is only logged at DEBUG level"""
+        svm_model.LOG_SAMPLE_RATE = 1.0
+        with self.assertLogs('classifier', level='DEBUG') as logs:
+            self.client.post('/classify', json={'emails': ['debug body text']})
+        self.assertTrue(any('debug body text' in line for line in logs.output))
+
+    def test_unsampled_requests_are_quiet(self):
+        """Test nothing is logged for requests outside the sample"""
+        svm_model.LOG_SAMPLE_RATE = 0.0
+        with self.assertNoLogs('classifier', level='DEBUG'):
+            self.client.post('/classify', json={'emails': ['quiet body text']})
+
+
+if __name__ == '__main__':
+    unittest.main()
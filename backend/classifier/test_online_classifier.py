@@ -0,0 +1,119 @@
+import unittest
+import sys
+import os
+import atexit
+import tempfile
+
+# Add the classifier directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import email_classifier_svm
+from online_classifier import OnlineEmailClassifier
+
+
+class TestOnlineEmailClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'online.joblib')
+        self.preprocessor = email_classifier_svm.TextPreprocessor(engine='lite')
+        texts, labels = email_classifier_svm.load_training_data()
+        self.learner = OnlineEmailClassifier(self.path, self.preprocessor)
+        self.learner.bootstrap(self.preprocessor.transform(texts), labels)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_bootstrap_writes_checkpoint(self):
+        """Test bootstrapping persists a checkpoint that can be reloaded"""
+        self.assertTrue(os.path.exists(self.path))
+        reloaded = OnlineEmailClassifier(self.path, self.preprocessor)
+        self.assertTrue(reloaded.load())
+        self.assertEqual(reloaded.version, 0)
+        self.assertEqual(sorted(reloaded.classes), sorted(set(email_classifier_svm.load_training_data()[1])))
+
+    def test_update_swaps_pipeline(self):
+        """Test an update produces a new pipeline and version without mutating the old one"""
+        before = self.learner.pipeline
+        old_coef = before.named_steps['svm'].coef_.copy()
+        swapped = []
+        model_id = self.learner.update(
+            self.preprocessor.transform(["Flash sale, everything must go"]), ["Promotional"],
+            on_swap=lambda pipeline, mid: swapped.append((pipeline, mid))
+        )
+        self.assertEqual(model_id, "online-1")
+        self.assertIsNot(self.learner.pipeline, before)
+        self.assertEqual(swapped, [(self.learner.pipeline, "online-1")])
+        self.assertTrue((before.named_steps['svm'].coef_ == old_coef).all())
+
+    def test_update_rejects_unknown_label(self):
+        """Test labels outside the trained classes are rejected"""
+        with self.assertRaises(ValueError):
+            self.learner.update(self.preprocessor.transform(["Hello"]), ["NotALabel"])
+        self.assertEqual(self.learner.version, 0)
+
+    def test_checkpoint_persists_updates(self):
+        """Test an explicit checkpoint stores the latest version"""
+        self.learner.update(self.preprocessor.transform(["Lunch on Sunday?"]), ["Personal"])
+        self.learner.checkpoint()
+        reloaded = OnlineEmailClassifier(self.path, self.preprocessor)
+        self.assertTrue(reloaded.load())
+        self.assertEqual(reloaded.version, 1)
+
+
+class TestApplyFeedback(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = (email_classifier_svm.model, email_classifier_svm.model_hash, email_classifier_svm.online_learner)
+        email_classifier_svm._init_online_model(path=os.path.join(self.tmp.name, 'online.joblib'))
+
+    def tearDown(self):
+        model, model_hash, learner = self.saved
+        email_classifier_svm._set_model(model, model_hash)
+        email_classifier_svm.online_learner = learner
+        self.tmp.cleanup()
+
+    def test_feedback_updates_live_model(self):
+        """Test feedback swaps the model used by classify()"""
+        email_classifier_svm.classify(["Weekly newsletter digest"])
+        version = email_classifier_svm.apply_feedback(["Weekly newsletter digest"], ["Notification"])
+        self.assertEqual(version, "online-1")
+        self.assertEqual(email_classifier_svm.model_hash, "online-1")
+        self.assertIs(email_classifier_svm.model, email_classifier_svm.online_learner.pipeline)
+        self.assertEqual(len(email_classifier_svm.classify(["Weekly newsletter digest"])), 1)
+
+    def test_exit_checkpoint_registered_once(self):
+        """Test re-initializing the online model does not stack atexit handlers"""
+        registered = []
+        original = atexit.register, email_classifier_svm._exit_checkpoint_registered
+        atexit.register = registered.append
+        email_classifier_svm._exit_checkpoint_registered = False
+        try:
+            email_classifier_svm._init_online_model(path=os.path.join(self.tmp.name, 'online.joblib'))
+            email_classifier_svm._init_online_model(path=os.path.join(self.tmp.name, 'online.joblib'))
+        finally:
+            atexit.register, email_classifier_svm._exit_checkpoint_registered = original
+        self.assertEqual(registered, [email_classifier_svm._checkpoint_at_exit])
+
+    def test_exit_checkpoint_only_with_pending_feedback(self):
+        """Test the exit checkpoint writes only feedback this process applied"""
+        path = email_classifier_svm.online_learner.path
+        before = os.path.getmtime(path)
+        os.utime(path, (before - 10, before - 10))
+        email_classifier_svm._checkpoint_at_exit()
+        self.assertEqual(os.path.getmtime(path), before - 10)
+
+        email_classifier_svm.apply_feedback(["Weekly newsletter digest"], ["Notification"])
+        email_classifier_svm._checkpoint_at_exit()
+        self.assertGreater(os.path.getmtime(path), before - 10)
+        self.assertEqual(email_classifier_svm.online_learner.pending, 0)
+
+    def test_feedback_length_mismatch(self):
+        """Test emails and labels must line up"""
+        with self.assertRaises(ValueError):
+            email_classifier_svm.apply_feedback(["a", "b"], ["Personal"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
 import sys
 import os
+import time
+from unittest import mock
+
 import pandas as pd
 
 # Add the classifier directory to the path
@@ -11,8 +14,11 @@ from phishing_link_svm_model import (
     extract_features_from_url,
     _predict_with_objects,
     load_model_and_scaler,
-    predict_phishing
+    predict_phishing,
+    predict_phishing_many,
+    init_model
 )
+import phishing_link_svm_model
 
 
 class TestPhishingLinkClassifier(unittest.TestCase):
@@ -113,6 +119,179 @@ class TestPhishingLinkClassifier(unittest.TestCase):
             # Model not available, skip test
             self.skipTest("Model not available")
     
+    def test_predict_phishing_many_matches_single(self):
+        """Test batch scoring gives the same labels as one-at-a-time scoring"""
+        urls = [
+            "https://www.google.com",
+            "http://192.168.1.1/secure-login",
+            "http://paypal.com.login-secure-verify.ru/auth",
+            "https://example.org/a?b=c&d=e",
+        ]
+        try:
+            batch = predict_phishing_many(urls)
+        except RuntimeError:
+            self.skipTest("Model not available")
+        self.assertEqual(batch, [predict_phishing(u) for u in urls])
+
+    def test_predict_phishing_many_matches_dataframe_path(self):
+        """Test the NumPy feature matrix reproduces the per-URL DataFrame pipeline"""
+        init_model()
+        if phishing_link_svm_model._MODEL is None:
+            self.skipTest("Model not available")
+        urls = ["http://login-verify.example.ru/a@b", "https://shop.example.co.uk/item?id=7&ref=mail"]
+        model, scaler, cols = (phishing_link_svm_model._MODEL, phishing_link_svm_model._SCALER,
+                               phishing_link_svm_model._X_TRAIN_COLS)
+        expected = [_predict_with_objects(u, model, scaler, cols) for u in urls]
+        rows = [[phishing_link_svm_model.url_feature_dict(u).get(c, 0) for c in cols] for u in urls]
+        self.assertEqual(phishing_link_svm_model._predict_matrix(rows, model, scaler, list(cols)), expected)
+
+    def test_predict_phishing_many_reports_bad_urls(self):
+        """Test an unparsable URL yields an error entry instead of failing the batch"""
+        try:
+            results = predict_phishing_many(["http://[::1", "https://www.google.com"])
+        except RuntimeError:
+            self.skipTest("Model not available")
+        self.assertTrue(results[0].startswith("error:"))
+        self.assertIn(results[1], ["phishing", "legitimate"])
+
+    def test_predict_phishing_many_empty(self):
+        """Test an empty batch returns an empty list"""
+        try:
+            self.assertEqual(predict_phishing_many([]), [])
+        except RuntimeError:
+            self.skipTest("Model not available")
+
+    def test_registered_domain_extraction(self):
+        """Test eTLD+1 extraction handles multi-label suffixes and normalization"""
+        get = phishing_link_svm_model.get_registered_domain_from_hostname
+        if phishing_link_svm_model._TLDEXTRACT_AVAILABLE:
+            self.assertEqual(get("accounts.google.co.uk"), "google.co.uk")
+        self.assertEqual(get("Mail.Google.COM."), "google.com")
+        self.assertEqual(get(""), "")
+        self.assertEqual(phishing_link_svm_model.extract_registered_domain_from_url("http://[::1"), "")
+
+    def test_registered_domain_is_memoized(self):
+        """Test repeated hostnames are served from the memo cache"""
+        get = phishing_link_svm_model.get_registered_domain_from_hostname
+        get("memo-test.example.com")
+        before = phishing_link_svm_model.registered_domain_cache_stats()
+        get("MEMO-TEST.example.com")
+        after = phishing_link_svm_model.registered_domain_cache_stats()
+        self.assertEqual(after["hits"], before["hits"] + 1)
+        self.assertEqual(after["misses"], before["misses"])
+        self.assertLessEqual(after["size"], after["maxsize"])
+
+    def test_tld_extractor_does_not_fetch_suffix_list(self):
+        """Test the resolver uses the bundled suffix list only"""
+        if not phishing_link_svm_model._TLDEXTRACT_AVAILABLE:
+            self.skipTest("tldextract not installed")
+        extractor = phishing_link_svm_model._get_tld_extractor()
+        self.assertEqual(tuple(extractor.suffix_list_urls), ())
+
+    def test_naive_registered_domain_fallback(self):
+        """Test the last-two-labels fallback used without tldextract"""
+        phishing_link_svm_model._registered_domain.cache_clear()
+        original = phishing_link_svm_model._TLDEXTRACT_AVAILABLE
+        phishing_link_svm_model._TLDEXTRACT_AVAILABLE = False
+        try:
+            get = phishing_link_svm_model.get_registered_domain_from_hostname
+            self.assertEqual(get("a.b.example.com"), "example.com")
+            self.assertEqual(get("localhost"), "localhost")
+        finally:
+            phishing_link_svm_model._TLDEXTRACT_AVAILABLE = original
+            phishing_link_svm_model._registered_domain.cache_clear()
+
+    def test_verdict_cache_hit_on_repeat(self):
+        """Test a repeated URL is answered from the verdict cache"""
+        url = "http://tracking.example-mailer.net/u/12345?list=7"
+        try:
+            first = predict_phishing(url)
+        except RuntimeError:
+            self.skipTest("Model not available")
+        before = phishing_link_svm_model.URL_VERDICT_CACHE.stats()
+        self.assertEqual(predict_phishing(url), first)
+        after = phishing_link_svm_model.URL_VERDICT_CACHE.stats()
+        self.assertEqual(after["hits"], before["hits"] + 1)
+
+    def test_verdict_cache_is_used_and_invalidated(self):
+        """Test cached verdicts win until the Top-1M list is reloaded"""
+        url = "http://cache-probe.example.net/path"
+        try:
+            expected = predict_phishing(url)
+        except RuntimeError:
+            self.skipTest("Model not available")
+        generation = phishing_link_svm_model._CACHE_GENERATION
+        phishing_link_svm_model.URL_VERDICT_CACHE.set((generation, url), "cached-verdict")
+        self.assertEqual(predict_phishing(url), "cached-verdict")
+
+        phishing_link_svm_model.reload_top_domains()
+        self.assertGreater(phishing_link_svm_model._CACHE_GENERATION, generation)
+        self.assertEqual(len(phishing_link_svm_model.URL_VERDICT_CACHE), 0)
+        self.assertEqual(predict_phishing(url), expected)
+
+    def test_allowlisted_domain_fast_path(self):
+        """Test allowlisted registered domains are cached at the domain level"""
+        try:
+            init_model()
+        except Exception:
+            self.skipTest("Model not available")
+        if phishing_link_svm_model._MODEL is None:
+            self.skipTest("Model not available")
+        original = phishing_link_svm_model.TOP_DOMAINS
+        phishing_link_svm_model.TOP_DOMAINS = {"allowlisted-example.com"}
+        phishing_link_svm_model.invalidate_verdict_caches()
+        try:
+            before = phishing_link_svm_model.DOMAIN_VERDICT_CACHE.stats()
+            urls = ["http://a.allowlisted-example.com/x", "http://b.allowlisted-example.com/y"]
+            self.assertEqual(predict_phishing_many(urls), ["legitimate", "legitimate"])
+            after = phishing_link_svm_model.DOMAIN_VERDICT_CACHE.stats()
+            self.assertEqual(after["misses"] - before["misses"], 1)
+            self.assertEqual(after["hits"] - before["hits"], 1)
+        finally:
+            phishing_link_svm_model.TOP_DOMAINS = original
+            phishing_link_svm_model.invalidate_verdict_caches()
+
+    def test_predict_phishing_parallel_matches_batch(self):
+        """Test fanning out over several batches gives the same labels in order"""
+        urls = [f"http://host{i}.example-{i % 7}.com/p?id={i}" for i in range(25)]
+        try:
+            expected = predict_phishing_many(urls)
+        except RuntimeError:
+            self.skipTest("Model not available")
+        with mock.patch.object(phishing_link_svm_model, 'LINK_BATCH_SIZE', 4):
+            self.assertEqual(phishing_link_svm_model.predict_phishing_parallel(urls), expected)
+
+    def test_predict_phishing_parallel_marks_late_links_pending(self):
+        """Test batches that miss the deadline come back as pending"""
+        try:
+            init_model()
+        except Exception:
+            self.skipTest("Model not available")
+        if phishing_link_svm_model._MODEL is None:
+            self.skipTest("Model not available")
+        real_many = phishing_link_svm_model.predict_phishing_many
+
+        def slow_second_batch(batch):
+            if batch[0].endswith("/2"):
+                time.sleep(0.5)
+            return real_many(batch)
+
+        urls = [f"http://late.example.net/{i}" for i in range(4)]
+        with mock.patch.object(phishing_link_svm_model, 'LINK_BATCH_SIZE', 2), \
+                mock.patch.object(phishing_link_svm_model, 'predict_phishing_many', side_effect=slow_second_batch):
+            results = phishing_link_svm_model.predict_phishing_parallel(urls, deadline_ms=100)
+        self.assertNotIn("pending", results[:2])
+        self.assertEqual(results[2:], ["pending", "pending"])
+
+    def test_link_pool_is_per_process(self):
+        """Test a pool inherited across fork() is replaced by one with live threads"""
+        pool = phishing_link_svm_model._get_link_pool()
+        self.assertIs(phishing_link_svm_model._get_link_pool(), pool)
+        with mock.patch.object(phishing_link_svm_model, '_LINK_POOL_PID', -1):
+            forked = phishing_link_svm_model._get_link_pool()
+        self.assertIsNot(forked, pool)
+        self.assertEqual(phishing_link_svm_model._LINK_POOL_PID, os.getpid())
+
     def test_predict_phishing_raises_error_when_model_unavailable(self):
         """Test that predict_phishing raises error when model is unavailable"""
         # This test verifies error handling
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import admission
+import prefetch
+import warmup
+from admission import AdmissionGate, BACKGROUND, BULK, INTERACTIVE
+from svm_model import app
+
+
+class TestLinkPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.phishing_link = warmup.get_component("phishing_link")
+        self.original_gate = admission.GATE
+        admission.GATE = AdmissionGate(max_active=1, limits={INTERACTIVE: (1, 8), BULK: (1, 8), BACKGROUND: (1, 4)})
+        # Unique per test so verdicts cached by other tests do not count
+        self.marker = f"{self.id().rsplit('.', 1)[-1]}-{time.monotonic_ns()}"
+        self.html = (f'<p>Your parcel is waiting</p><a href="http://parcel-{self.marker}.xyz/track">track</a>'
+                     f'<a href="https://example.com/{self.marker}">help</a>')
+
+    def tearDown(self):
+        prefetch.wait_idle(10)
+        admission.GATE = self.original_gate
+
+    def url_cache(self):
+        return self.phishing_link.cache_stats()["urls"]
+
+    def test_classify_prefetch_fills_verdict_cache(self):
+        """Test links from a prefetching /classify are cache hits in /classify_links"""
+        response = self.client.post('/classify', json={'emails': [self.html], 'prefetch_links': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(prefetch.wait_idle(10))
+
+        before = self.url_cache()
+        response = self.client.post('/classify_links', json={'html': self.html})
+        self.assertEqual(response.status_code, 200)
+        after = self.url_cache()
+        self.assertEqual(after["hits"] - before["hits"], 2)
+        self.assertEqual(after["misses"], before["misses"])
+
+    def test_prefetch_is_opt_in(self):
+        """Test /classify does not score links unless asked to"""
+        submitted = prefetch.stats()["submitted"]
+        self.client.post('/classify', json={'emails': [self.html], 'prefetch_links': False})
+        self.assertEqual(prefetch.stats()["submitted"], submitted)
+
+    def test_prefetch_flag_must_be_boolean(self):
+        """Test a prefetch_links value that is not a JSON boolean gets 400 and queues nothing"""
+        submitted = prefetch.stats()["submitted"]
+        for value in ("false", "0", 1):
+            response = self.client.post('/classify', json={'emails': [self.html], 'prefetch_links': value})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(prefetch.stats()["submitted"], submitted)
+
+    def test_waits_for_a_free_slot(self):
+        """Test prefetch work does not start while a request holds the only slot"""
+        slot = admission.GATE.acquire(BULK)
+        try:
+            self.assertTrue(prefetch.submit([self.html]))
+            time.sleep(0.1)
+            self.assertEqual(prefetch.stats()["pending"], 1)
+        finally:
+            slot.release()
+        self.assertTrue(prefetch.wait_idle(10))
+        self.assertEqual(prefetch.stats()["pending"], 0)
+
+    def test_long_wait_is_not_a_rejection(self):
+        """Test prefetch waiting past the queue timeout is not counted as a rejected request"""
+        admission.GATE = AdmissionGate(max_active=1, limits={INTERACTIVE: (1, 8), BULK: (1, 8), BACKGROUND: (1, 4)},
+                                       queue_timeout_ms=10)
+        slot = admission.GATE.acquire(BULK)
+        try:
+            self.assertTrue(prefetch.submit([self.html]))
+            time.sleep(0.2)
+        finally:
+            slot.release()
+        self.assertTrue(prefetch.wait_idle(10))
+        background = admission.GATE.stats()["classes"][BACKGROUND]
+        self.assertEqual(background["rejected_queue_timeout"], 0)
+        self.assertEqual(background["admitted"], 1)
+
+    def test_full_queue_drops_jobs(self):
+        """Test jobs beyond LINK_PREFETCH_MAX_PENDING are dropped"""
+        original = prefetch.LINK_PREFETCH_MAX_PENDING
+        prefetch.LINK_PREFETCH_MAX_PENDING = 0
+        try:
+            dropped = prefetch.stats()["dropped"]
+            self.assertFalse(prefetch.submit([self.html]))
+            self.assertEqual(prefetch.stats()["dropped"], dropped + 1)
+        finally:
+            prefetch.LINK_PREFETCH_MAX_PENDING = original
+
+
+if __name__ == '__main__':
+    unittest.main()
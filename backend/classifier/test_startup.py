@@ -0,0 +1,161 @@
+import unittest
+import sys
+import os
+import json
+import runpy
+import subprocess
+import importlib.util
+
+# Add the classifier directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CLASSIFIER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Importing svm_model must stay well under this, so the port binds right away
+IMPORT_BUDGET_SECONDS = 1.0
+HEAVY_MODULES = ["spacy", "sklearn", "pandas", "tldextract", "email_classifier_svm", "phishing_link_svm_model"]
+
+
+def missing_model_deps():
+    """Packages the models need that are not installed (spaCy models are not on PyPI)."""
+    names = ["numpy", "sklearn", "pandas", "joblib"]
+    if os.environ.get('EMAIL_PREPROCESS_ENGINE', 'spacy').strip().lower() == 'spacy':
+        names += ["spacy", "en_core_web_sm"]
+    return [name for name in names if importlib.util.find_spec(name) is None]
+
+
+def require_model_deps(test):
+    missing = missing_model_deps()
+    if missing:
+        test.skipTest(f"Model dependencies not installed: {', '.join(missing)}")
+
+
+def import_profile(module, top=15):
+    """Run `python -X importtime -c "import <module>"` and return (cumulative seconds, report, loaded heavy modules)."""
+    code = f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=CLASSIFIER_DIR, capture_output=True, text=True, check=True,
+    )
+
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    total_us = next(cum for cum, _, name in rows if name.strip() == module)
+    report = [f"Import-time profile for {module}: {total_us / 1e6:.3f}s cumulative",
+              f"{'cumulative ms':>14} {'self ms':>9}  module"]
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        report.append(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    return total_us / 1e6, "\n".join(report), json.loads(out.stdout.strip().splitlines()[-1])
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_svm_model_import_is_fast(self):
+        """Test importing the Flask app stays under the startup budget"""
+        seconds, report, _ = import_profile("svm_model")
+        self.assertLess(seconds, IMPORT_BUDGET_SECONDS, report)
+
+    def test_svm_model_import_is_lazy(self):
+        """Test no heavy module is imported until a component is needed"""
+        _, report, loaded = import_profile("svm_model")
+        self.assertEqual(loaded, [], report)
+
+
+class TestWarmup(unittest.TestCase):
+
+    def test_ready_endpoint(self):
+        """Test /ready reports component states and turns ready after warm-up"""
+        require_model_deps(self)
+        from svm_model import app
+        import warmup
+
+        client = app.test_client()
+        response = client.get('/ready')
+        data = json.loads(response.data)
+        self.assertEqual(set(data['components']), set(warmup.COMPONENTS))
+        self.assertEqual(response.status_code, 200 if data['ready'] else 503)
+
+        warmup.warm_up()
+        response = client.get('/ready')
+        data = json.loads(response.data)
+        for name, status in data['components'].items():
+            self.assertEqual(status['state'], 'warm', status)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(data['ready'])
+
+    def test_get_component_loads_once(self):
+        """Test components are cached after the first load"""
+        require_model_deps(self)
+        import warmup
+        first = warmup.get_component("email_classifier")
+        self.assertIs(warmup.get_component("email_classifier"), first)
+        self.assertEqual(warmup.component_status()["email_classifier"]["state"], "warm")
+
+    def test_unknown_warmup_mode(self):
+        """Test invalid startup modes are rejected"""
+        import warmup
+        with self.assertRaises(ValueError):
+            warmup.start("sometimes")
+
+
+class TestProductionEntryPoint(unittest.TestCase):
+
+    def test_wsgi_preloads_and_freezes(self):
+        """Test importing wsgi warms every component and freezes the GC before forking"""
+        require_model_deps(self)
+        code = ("import gc, json, warmup, wsgi; "
+                "print(json.dumps([warmup.component_status(), gc.get_freeze_count() > 0]))")
+        out = subprocess.run([sys.executable, "-c", code], cwd=CLASSIFIER_DIR, capture_output=True, text=True,
+                             check=True, env={**os.environ, "CLASSIFIER_WARMUP": "eager"})
+        status, frozen = json.loads(out.stdout.strip().splitlines()[-1])
+        self.assertTrue(frozen)
+        for name, component in status.items():
+            self.assertEqual(component['state'], 'warm', component)
+
+    def gunicorn_config(self, env):
+        original = {name: os.environ.get(name) for name in env}
+        os.environ.update(env)
+        try:
+            return runpy.run_path(os.path.join(CLASSIFIER_DIR, "gunicorn.conf.py"))
+        finally:
+            for name, value in original.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    def test_gunicorn_config_from_environment(self):
+        """Test worker settings come from the environment and the app is preloaded"""
+        config = self.gunicorn_config({"CLASSIFIER_WORKERS": "5", "CLASSIFIER_THREADS": "2",
+                                       "CLASSIFIER_BIND": "127.0.0.1:6001", "EMAIL_CLASSIFIER_ENGINE": "svc"})
+        self.assertEqual(config['workers'], 5)
+        self.assertEqual(config['threads'], 2)
+        self.assertEqual(config['bind'], "127.0.0.1:6001")
+        self.assertTrue(config['preload_app'])
+
+    def test_gunicorn_online_engine_needs_one_worker(self):
+        """Test the online engine refuses to start with several workers"""
+        with self.assertRaisesRegex(RuntimeError, "CLASSIFIER_WORKERS=1"):
+            self.gunicorn_config({"CLASSIFIER_WORKERS": "2", "EMAIL_CLASSIFIER_ENGINE": "online"})
+        config = self.gunicorn_config({"CLASSIFIER_WORKERS": "1", "EMAIL_CLASSIFIER_ENGINE": "online"})
+        self.assertEqual(config['workers'], 1)
+
+    def test_artifacts_are_memory_mapped(self):
+        """Test persisted model arrays are opened memory-mapped"""
+        import numpy as np
+        import phishing_link_svm_model
+        phishing_link_svm_model.init_model()
+        if phishing_link_svm_model._MODEL is None or phishing_link_svm_model.MODEL_MMAP_MODE is None:
+            self.skipTest("Model not available or memory-mapping disabled")
+        mdl, scaler, _ = phishing_link_svm_model.load_model_and_scaler()
+        self.assertIsInstance(mdl.support_vectors_, np.memmap)
+        self.assertIsInstance(scaler.mean_, np.memmap)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import phishing_link_svm_model
+import top_domains
+
+
+class TestTopDomainSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'top_domains.npy')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_build_and_lookup(self):
+        """Test domains in the snapshot are found and others are not"""
+        count = top_domains.build_snapshot(['google.com', 'bbc.co.uk', 'google.com', ''], self.path)
+        self.assertEqual(count, 2)
+
+        snapshot = top_domains.load_snapshot(self.path)
+        self.assertEqual(len(snapshot), 2)
+        self.assertIn('google.com', snapshot)
+        self.assertIn('bbc.co.uk', snapshot)
+        self.assertNotIn('accounts-google.com', snapshot)
+        self.assertNotIn('', snapshot)
+
+    def test_snapshot_is_memory_mapped_and_sorted(self):
+        """Test the loader maps the file instead of reading it into a set"""
+        top_domains.build_snapshot([f'site{i}.com' for i in range(1000)], self.path)
+        snapshot = top_domains.load_snapshot(self.path)
+        self.assertIsInstance(snapshot.hashes, np.memmap)
+        self.assertTrue(np.all(snapshot.hashes[:-1] < snapshot.hashes[1:]))
+
+    def test_empty_snapshot(self):
+        """Test an empty snapshot loads and matches nothing"""
+        top_domains.build_snapshot([], self.path)
+        snapshot = top_domains.load_snapshot(self.path)
+        self.assertEqual(len(snapshot), 0)
+        self.assertNotIn('google.com', snapshot)
+
+    def test_missing_snapshot_returns_none(self):
+        """Test a missing snapshot is reported as None so callers can fall back"""
+        self.assertIsNone(top_domains.load_snapshot(self.path))
+
+    def test_is_stale(self):
+        """Test a CSV newer than the snapshot is detected"""
+        csv_path = os.path.join(self.tmpdir.name, 'top-1m.csv')
+        top_domains.build_snapshot(['google.com'], self.path)
+        with open(csv_path, 'w') as f:
+            f.write('1,google.com\n')
+        future = time.time() + 60
+        os.utime(csv_path, (future, future))
+        self.assertTrue(top_domains.is_stale(self.path, csv_path))
+        self.assertFalse(top_domains.is_stale(self.path, csv_path + '.missing'))
+
+    def test_rebuild_from_csv_matches_csv_parse(self):
+        """Test the snapshot built from a CSV agrees with the CSV-parsed set"""
+        csv_path = os.path.join(self.tmpdir.name, 'top-1m.csv')
+        with open(csv_path, 'w') as f:
+            f.write('1,google.com\n2,www.BBC.co.uk.\n3,mail.google.com\n4,example.org\n')
+        domains = phishing_link_svm_model.read_top_domains_csv(csv_path)
+        top_domains.build_snapshot(domains, self.path)
+        snapshot = top_domains.load_snapshot(self.path)
+
+        self.assertEqual(len(snapshot), len(domains))
+        for domain in domains:
+            self.assertIn(domain, snapshot)
+        self.assertIn(phishing_link_svm_model.extract_registered_domain_from_url(
+            'https://accounts.google.com/login'), snapshot)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import svm_model
+import tracing
+from svm_model import app
+
+
+def span_names(span):
+    names = [span["name"]]
+    for child in span["children"]:
+        names.extend(span_names(child))
+    return names
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        # Unique per test so cached labels and verdicts from other tests do not hide stages
+        self.marker = f"{self.id().rsplit('.', 1)[-1]}-{time.monotonic_ns()}"
+        self.html = (f'<p>Invoice {self.marker}</p><a href="http://billing-{self.marker}.xyz/pay">pay</a>'
+                     f'<a href="https://example.com/{self.marker}">help</a>')
+
+    def debug_get(self, view, *args):
+        # The routes are only registered with TRACE_DEBUG_ENDPOINT=1, so call the views directly
+        with app.test_request_context():
+            response, status = view(*args)
+        self.assertEqual(status, 200)
+        return response.json
+
+    def traced_post(self, path, body):
+        response = self.client.post(path, json=body, headers={tracing.TRACE_HEADER: '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(tracing.TRACE_ID_HEADER, response.headers)
+        return response.headers[tracing.TRACE_ID_HEADER]
+
+    def test_trace_header_records_stages(self):
+        """Test a request sent with X-Trace gets a trace of its admission and model stages"""
+        trace_id = self.traced_post('/classify', {'emails': [self.html, f'plain {self.marker}']})
+        trace = self.debug_get(svm_model.debug_trace, trace_id)
+        self.assertEqual(trace["name"], "/classify")
+        self.assertEqual(trace["status"], 200)
+        self.assertEqual(trace["root"]["attrs"]["emails"], 2)
+        names = span_names(trace["root"])
+        for name in ("admission", "strip_html", "preprocess", "tfidf", "svc_predict"):
+            self.assertIn(name, names)
+        self.assertEqual(names.count("strip_html.email"), 2)
+        strip = next(child for child in trace["root"]["children"] if child["name"] == "strip_html")
+        self.assertEqual(strip["attrs"]["emails"], 2)
+        self.assertGreaterEqual(trace["duration_ms"], strip["duration_ms"])
+
+        summaries = self.debug_get(svm_model.debug_traces)["traces"]
+        self.assertEqual(summaries[0]["trace_id"], trace_id)
+
+    def test_link_spans(self):
+        """Test /classify_links records one span per URL with its cache outcome"""
+        trace_id = self.traced_post('/classify_links', {'html': self.html})
+        root = tracing.get(trace_id)["root"]
+        links = [child for child in root["children"] if child["name"] == "link"]
+        self.assertEqual(len(links), 2)
+        self.assertEqual([link["attrs"]["cached"] for link in links], [False, False])
+        self.assertIn("link_svc_predict", span_names(root))
+        extract = next(child for child in root["children"] if child["name"] == "extract_links")
+        self.assertEqual(extract["attrs"]["links"], 2)
+
+        root = tracing.get(self.traced_post('/classify_links', {'html': self.html}))["root"]
+        self.assertEqual([child["attrs"]["cached"] for child in root["children"] if child["name"] == "link"],
+                         [True, True])
+
+    def test_untraced_request(self):
+        """Test requests without X-Trace are not traced when sampling is off"""
+        before = len(tracing.recent())
+        response = self.client.post('/classify', json={'emails': [self.html]})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(tracing.TRACE_ID_HEADER, response.headers)
+        self.assertEqual(len(tracing.recent()), before)
+        self.assertFalse(tracing.active())
+
+    def test_sample_rate(self):
+        """Test TRACE_SAMPLE_RATE traces requests that did not ask for it"""
+        original = tracing.TRACE_SAMPLE_RATE
+        tracing.TRACE_SAMPLE_RATE = 1.0
+        try:
+            response = self.client.post('/classify', json={'emails': [self.html]})
+        finally:
+            tracing.TRACE_SAMPLE_RATE = original
+        self.assertIsNotNone(tracing.get(response.headers[tracing.TRACE_ID_HEADER]))
+
+    def test_stream_is_traced(self):
+        """Test an NDJSON stream is traced until its last line is sent"""
+        body = "".join(json.dumps(email) + "\n" for email in [self.html, f'plain {self.marker}'])
+        response = self.client.post('/classify', data=body, headers={
+            'Content-Type': 'application/x-ndjson', tracing.TRACE_HEADER: '1'})
+        trace_id = response.headers[tracing.TRACE_ID_HEADER]
+        self.assertEqual(len(response.data.decode().splitlines()), 2)
+        trace = tracing.get(trace_id)
+        self.assertEqual(trace["root"]["attrs"]["emails"], 2)
+        self.assertIn("svc_predict", span_names(trace["root"]))
+
+    def test_file_exporter(self):
+        """Test finished traces are appended to TRACE_FILE as JSON lines"""
+        original = tracing.TRACE_FILE
+        with tempfile.TemporaryDirectory() as directory:
+            tracing.TRACE_FILE = os.path.join(directory, "traces.jsonl")
+            try:
+                first = self.traced_post('/classify', {'emails': [self.html]})
+                second = self.traced_post('/analyze', {'emails': [self.html]})
+            finally:
+                tracing.TRACE_FILE = original
+            with open(os.path.join(directory, "traces.jsonl"), encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual([record["trace_id"] for record in records], [first, second])
+        self.assertNotIn(self.html, json.dumps(records))
+
+    def test_span_limit(self):
+        """Test spans beyond TRACE_MAX_SPANS are counted, not recorded"""
+        original = tracing.TRACE_MAX_SPANS
+        tracing.TRACE_MAX_SPANS = 3
+        try:
+            trace_id = self.traced_post('/analyze', {'emails': [self.html]})
+        finally:
+            tracing.TRACE_MAX_SPANS = original
+        trace = tracing.get(trace_id)
+        self.assertEqual(trace["span_count"], 3)
+        self.assertGreater(trace["dropped_spans"], 0)
+        self.assertEqual(len(span_names(trace["root"])), 4)
+
+    def test_unknown_trace(self):
+        """Test /debug/traces/<id> answers 404 for an unknown id"""
+        with app.test_request_context():
+            self.assertEqual(svm_model.debug_trace('nope')[1], 404)
+
+    def test_debug_routes_are_opt_in(self):
+        """Test /debug/traces only exists when TRACE_DEBUG_ENDPOINT=1"""
+        if tracing.TRACE_DEBUG_ENDPOINT:
+            self.skipTest("TRACE_DEBUG_ENDPOINT is set")
+        self.assertEqual(self.client.get('/debug/traces').status_code, 404)
+
+        code = "import svm_model; print(sorted(rule.rule for rule in svm_model.app.url_map.iter_rules()))"
+        out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             env=dict(os.environ, TRACE_DEBUG_ENDPOINT="1"), capture_output=True, text=True, check=True)
+        self.assertIn("/debug/traces", out.stdout)
+        self.assertIn("/debug/traces/<trace_id>", out.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+import time
+
+# Add the classifier directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ttl_cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_get_and_set(self):
+        """Test stored values are returned and counted as hits"""
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first"""
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_ttl_expiry(self):
+        """Test entries expire after the TTL"""
+        cache = TTLCache(maxsize=2, ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.expirations, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled_cache(self):
+        """Test maxsize=0 stores nothing"""
+        cache = TTLCache(maxsize=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_stats(self):
+        """Test stats report counters and hit rate"""
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+        stats = cache.stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
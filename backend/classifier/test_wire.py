@@ -0,0 +1,96 @@
+import gzip
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import wire
+from svm_model import app
+
+
+class TestWireFormats(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.emails = [f"<p>Weekly digest number {i}: new articles and offers for you</p>" * 5 for i in range(20)]
+        self.original_min = wire.WIRE_MIN_COMPRESS_BYTES
+        wire.WIRE_MIN_COMPRESS_BYTES = 64
+
+    def tearDown(self):
+        wire.WIRE_MIN_COMPRESS_BYTES = self.original_min
+
+    def classify(self, data, **headers):
+        headers.setdefault('Content-Type', 'application/json')
+        return self.client.post('/classify', data=data, headers=headers)
+
+    def plain_predictions(self):
+        return json.loads(self.classify(json.dumps({'emails': self.emails})).data)['predictions']
+
+    def test_json_stays_default(self):
+        """Test a plain request gets an uncompressed JSON response"""
+        response = self.classify(json.dumps({'emails': self.emails}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_gzip_request_and_response(self):
+        """Test gzip request bodies are accepted and responses compressed on request"""
+        body = gzip.compress(json.dumps({'emails': self.emails}).encode())
+        response = self.classify(body, **{'Content-Encoding': 'gzip', 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.data))['predictions'], self.plain_predictions())
+
+    @unittest.skipUnless(wire._ZSTD_AVAILABLE, "zstandard not installed")
+    def test_zstd_preferred(self):
+        """Test zstd is chosen over gzip when the client accepts both"""
+        body = wire.compress(json.dumps({'emails': self.emails}).encode(), 'zstd')
+        response = self.classify(body, **{'Content-Encoding': 'zstd', 'Accept-Encoding': 'gzip, zstd'})
+        self.assertEqual(response.headers['Content-Encoding'], 'zstd')
+        decoded = wire.zstandard.ZstdDecompressor().decompress(response.data)
+        self.assertEqual(json.loads(decoded)['predictions'], self.plain_predictions())
+
+    @unittest.skipUnless(wire._MSGPACK_AVAILABLE, "msgpack not installed")
+    def test_msgpack_round_trip(self):
+        """Test MessagePack bodies are decoded and answered in MessagePack when accepted"""
+        body = wire.msgpack.packb({'emails': self.emails})
+        response = self.classify(body, **{'Content-Type': 'application/msgpack', 'Accept': 'application/msgpack'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/msgpack')
+        self.assertEqual(wire.msgpack.unpackb(response.data)['predictions'], self.plain_predictions())
+
+    def test_corrupt_body_is_rejected(self):
+        """Test a body that is not valid gzip gets 400"""
+        response = self.classify(b'not gzip at all', **{'Content-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_encoding_is_rejected(self):
+        """Test an unsupported Content-Encoding gets 415"""
+        response = self.classify(b'{}', **{'Content-Encoding': 'br'})
+        self.assertEqual(response.status_code, 415)
+
+    def test_decompressed_size_is_bounded(self):
+        """Test a body that inflates past the limit gets 413"""
+        original = wire.WIRE_MAX_DECOMPRESSED_BYTES
+        wire.WIRE_MAX_DECOMPRESSED_BYTES = 1024
+        try:
+            body = gzip.compress(json.dumps({'emails': ['a' * 100000]}).encode())
+            response = self.classify(body, **{'Content-Encoding': 'gzip'})
+        finally:
+            wire.WIRE_MAX_DECOMPRESSED_BYTES = original
+        self.assertEqual(response.status_code, 413)
+
+    def test_compressed_ndjson_stream(self):
+        """Test streamed NDJSON bodies can be gzip-compressed"""
+        body = gzip.compress("".join(json.dumps(email) + "\n" for email in self.emails[:3]).encode())
+        response = self.classify(body, **{'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(sorted(line['index'] for line in lines), [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+"""
+Placeholder patterns shared by both preprocessing engines.
+
+email_classifier_svm (spaCy engine) applies them one re.sub at a time;
+lite_preprocessing combines them into one alternation. Both read them from
+here so the engines cannot drift apart. Order matters: it is the priority
+when several patterns could match at one position.
+"""
+
+URL_PATTERN = r"https?://\S+"
+EMAIL_PATTERN = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
+DATE_PATTERN = r"\b\d{4}-\d{2}-\d{2}\b"
+PHONE_PATTERN = r"\b\d{10}\b"
+NUM_PATTERN = r"\b\d+\b"
+
+# (placeholder name, pattern), highest priority first
+PLACEHOLDER_PATTERNS = (
+    ("URL", URL_PATTERN),
+    ("EMAIL", EMAIL_PATTERN),
+    ("DATE", DATE_PATTERN),
+    ("PHONE", PHONE_PATTERN),
+    ("NUM", NUM_PATTERN),
+)
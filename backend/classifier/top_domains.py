@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Compact, memory-mappable snapshot of the Top-1M allowlist.
+
+Parsing top-1m.csv and running eTLD+1 extraction on a million rows takes
+seconds and leaves a large set of strings in every worker. Instead, an offline
+build step stores each normalized registrable domain as a 64-bit hash in a
+sorted uint64 array (.npy, ~8 MB for 1M domains). The loader memory-maps that
+file, so opening it takes milliseconds and the pages are shared by all worker
+processes through the OS page cache; membership is a binary search.
+
+With 64-bit hashes the chance that an unlisted domain collides with one of a
+million listed ones is about 1 in 10^13.
+
+Rebuild after updating the CSV with:
+    python top_domains.py --rebuild [--csv PATH] [--output PATH]
+"""
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TOP1M_SNAPSHOT_PATH = os.environ.get(
+    'TOP1M_SNAPSHOT_PATH', os.path.join(BASE_DIR, 'model', 'top_domains.npy')
+)
+
+
+def domain_hash(domain):
+    return int.from_bytes(hashlib.blake2b(domain.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class TopDomainSet:
+    """Read-only set of domains backed by a sorted array of domain hashes."""
+
+    def __init__(self, hashes, path=None):
+        self.hashes = hashes
+        self.path = path
+
+    def __contains__(self, domain):
+        if not domain or not len(self.hashes):
+            return False
+        h = np.uint64(domain_hash(domain))
+        i = int(np.searchsorted(self.hashes, h))
+        return i < len(self.hashes) and self.hashes[i] == h
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+def build_snapshot(domains, path=TOP1M_SNAPSHOT_PATH):
+    """Write the sorted, de-duplicated hashes of `domains` to `path` (atomic replace)."""
+    hashes = np.unique(np.fromiter((domain_hash(d) for d in domains if d), dtype=np.uint64))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, hashes)
+    os.replace(tmp_path, path)
+    return len(hashes)
+
+
+def load_snapshot(path=TOP1M_SNAPSHOT_PATH, source_path=None):
+    """Memory-map a snapshot; returns None if there is no usable snapshot at `path`."""
+    if not os.path.exists(path):
+        return None
+    try:
+        hashes = np.load(path, mmap_mode='r')
+    except Exception as e:
+        print(f"[ERROR] Could not load Top-1M snapshot from {path}: {e}")
+        return None
+    if hashes.dtype != np.uint64 or hashes.ndim != 1:
+        print(f"[ERROR] Top-1M snapshot at {path} has an unexpected format; rebuild it with --rebuild.")
+        return None
+    if source_path and is_stale(path, source_path):
+        print(f"[WARNING] {source_path} is newer than the Top-1M snapshot {path}; "
+              f"run `python top_domains.py --rebuild` to refresh it.")
+    return TopDomainSet(hashes, path)
+
+
+def is_stale(path, source_path):
+    try:
+        return os.path.getmtime(source_path) > os.path.getmtime(path)
+    except OSError:
+        return False
+
+
+def main():
+    import phishing_link_svm_model
+
+    parser = argparse.ArgumentParser(description="Build the Top-1M allowlist snapshot.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the snapshot from the CSV.")
+    parser.add_argument("--csv", default=phishing_link_svm_model.TOP1M_CSV_PATH)
+    parser.add_argument("--output", default=TOP1M_SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    if not args.rebuild:
+        snapshot = load_snapshot(args.output, args.csv)
+        if snapshot is None:
+            print(f"No snapshot at {args.output}; run with --rebuild to build it.")
+            return 1
+        print(f"{args.output}: {len(snapshot)} domains")
+        return 0
+
+    domains = phishing_link_svm_model.read_top_domains_csv(args.csv)
+    count = build_snapshot(domains, args.output)
+    print(f"Wrote {count} domains from {args.csv} to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
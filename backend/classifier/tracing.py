@@ -0,0 +1,255 @@
+"""
+Per-request traces for the classifier service.
+
+A request is traced when it sends `X-Trace: 1` or is picked by
+TRACE_SAMPLE_RATE (default 0, off). Its trace is a tree of spans, each with a
+start offset, a duration and attributes such as input sizes:
+
+    /classify                      root span: method, content_length, status, emails
+      admission                    wait for a work slot (priority)
+      admission.yield              slot handed to an interactive request between chunks
+      load_component               first use of a model, or waiting for its warm-up (component)
+      strip_html                   HTML to text for the batch (emails, chars)
+        strip_html.email           one email (key, chars)
+      preprocess                   spaCy / lite (texts, chars)
+      tfidf                        TF-IDF transform (rows)
+      svc_predict                  email SVM (rows)
+      extract_links                anchors of the /classify_links body (chars, links)
+      link                         one URL lookup (url, cached, allowlisted)
+      link_svc_predict             phishing SVM for the batch (rows)
+
+Stage spans are opened by metrics.stage(), so they share the metric names.
+Traced requests bypass micro-batching (their spans would otherwise be mixed
+with other requests' work), and link batches run on the pool threads carry
+the request's trace with them.
+
+Finished traces go to a ring buffer of TRACE_BUFFER_SIZE traces, viewable at
+GET /debug/traces when TRACE_DEBUG_ENDPOINT=1 (off by default, since traces
+hold URLs from users' emails), and are appended as JSON lines to TRACE_FILE if set. The
+trace id is returned in the `X-Trace-Id` response header. A trace holds at
+most TRACE_MAX_SPANS spans; later ones are counted in `dropped_spans`.
+Traces record sizes, content keys and URLs, never email bodies.
+"""
+import collections
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+from flask import g, request
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0'))
+TRACE_FILE = os.environ.get('TRACE_FILE', '')
+TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', '100'))
+TRACE_MAX_SPANS = int(os.environ.get('TRACE_MAX_SPANS', '5000'))
+# /debug/traces shows link URLs from every traced request; only serve it when asked to
+TRACE_DEBUG_ENDPOINT = os.environ.get('TRACE_DEBUG_ENDPOINT', '').lower() in ('1', 'true', 'yes')
+
+TRACE_HEADER = "X-Trace"
+TRACE_ID_HEADER = "X-Trace-Id"
+
+log = logging.getLogger("classifier")
+
+_current = contextvars.ContextVar("classifier_trace_span", default=None)
+_buffer = collections.deque(maxlen=TRACE_BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+_file_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace", "name", "attrs", "start", "duration_ms", "children")
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.children = []
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self.start) * 1000, 3)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.start) * 1000, 3),
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "children": [child.to_dict() for child in list(self.children)],
+        }
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, name, attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.span_count = 0
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+        self.root = Span(self, name, attrs)
+
+    def add(self, parent, span):
+        with self._lock:
+            if self.span_count >= TRACE_MAX_SPANS:
+                self.dropped_spans += 1
+                return False
+            self.span_count += 1
+            parent.children.append(span)
+            return True
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "timestamp": self.timestamp,
+            "name": self.root.name,
+            "duration_ms": self.root.duration_ms,
+            "status": self.root.attrs.get("status"),
+            "span_count": self.span_count,
+            "dropped_spans": self.dropped_spans,
+            "root": self.root.to_dict(),
+        }
+
+
+class span:
+    """
+    `with tracing.span(name, **attrs) as s:` records a child of the current
+    span; `s.set(...)` adds attributes. Does nothing outside a traced request.
+    """
+    __slots__ = ("name", "attrs", "_span", "_token")
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._span = None
+        self._token = None
+
+    def __enter__(self):
+        parent = _current.get()
+        if parent is None:
+            return NOOP_SPAN
+        child = Span(parent.trace, self.name, self.attrs)
+        if not parent.trace.add(parent, child):
+            return NOOP_SPAN
+        self._span = child
+        self._token = _current.set(child)
+        return child
+
+    def __exit__(self, *exc_info):
+        if self._span is not None:
+            self._span.finish()
+            _current.reset(self._token)
+        return False
+
+
+def active():
+    return _current.get() is not None
+
+
+def annotate(**attrs):
+    """Add attributes to the root span of the current trace."""
+    current = _current.get()
+    if current is not None:
+        current.trace.root.set(**attrs)
+
+
+def wrap(fn):
+    """`fn` bound to the current trace, for running on another thread (no-op when not tracing)."""
+    if _current.get() is None:
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def _export(trace):
+    trace.root.finish()
+    record = trace.to_dict()
+    with _buffer_lock:
+        _buffer.append(record)
+    if TRACE_FILE:
+        line = json.dumps(record, default=str) + "\n"
+        try:
+            with _file_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            log.exception("Error writing trace file: %s", e)
+
+
+def recent(limit=None):
+    """Finished traces, newest first."""
+    with _buffer_lock:
+        traces = list(reversed(_buffer))
+    return traces if limit is None else traces[:limit]
+
+
+def get(trace_id):
+    with _buffer_lock:
+        for record in _buffer:
+            if record["trace_id"] == trace_id:
+                return record
+    return None
+
+
+def _wants_trace():
+    if request.headers.get(TRACE_HEADER, "").strip().lower() in ("1", "true", "yes"):
+        return True
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+
+def _start_trace():
+    if not _wants_trace():
+        return
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    trace = Trace(rule, {"method": request.method, "content_length": request.content_length})
+    g.trace = trace
+    _current.set(trace.root)
+
+
+def _finish_after(iterable, trace):
+    # Streamed bodies are produced after the request context is gone; trace them where they run
+    _current.set(trace.root)
+    try:
+        yield from iterable
+    finally:
+        _current.set(None)
+        _export(trace)
+
+
+def _finish_trace(response):
+    trace = g.get("trace")
+    if trace is None:
+        return response
+    response.headers[TRACE_ID_HEADER] = trace.trace_id
+    trace.root.set(status=response.status_code)
+    if response.is_streamed:
+        response.response = _finish_after(response.response, trace)
+    else:
+        _export(trace)
+    return response
+
+
+def _clear_trace(exc=None):
+    # Worker threads are reused; never let a trace leak into the next request
+    _current.set(None)
+
+
+def init_app(app):
+    app.before_request(_start_trace)
+    app.after_request(_finish_trace)
+    app.teardown_request(_clear_trace)
@@ -0,0 +1,123 @@
+"""
+Lazy loading and background warm-up of the classifier service's heavy components.
+
+svm_model.py imports nothing heavy at module level; spaCy/scikit-learn/pandas
+and the trained models are loaded here on first use, or ahead of time by
+warm_up() / start_background_warmup() so the Flask process can bind its port
+immediately and report readiness through /ready.
+
+CLASSIFIER_WARMUP selects the startup mode used by svm_model.py:
+  "background" (default) - bind the port right away, warm up in a daemon thread
+  "eager"                 - warm everything before binding the port
+  "lazy"                  - load each component on the first request that needs it
+"""
+import logging
+import os
+import threading
+import time
+
+import tracing
+
+log = logging.getLogger("classifier")
+
+WARMUP_MODES = ("background", "eager", "lazy")
+WARMUP_MODE = os.environ.get('CLASSIFIER_WARMUP', 'background').strip().lower()
+
+
+def _load_email_classifier():
+    import email_classifier_svm
+    email_classifier_svm.ensure_model()
+    return email_classifier_svm
+
+
+def _load_phishing_link():
+    import phishing_link_svm_model
+    phishing_link_svm_model.init_model()
+    return phishing_link_svm_model
+
+
+def _load_top_domains():
+    return get_component("phishing_link").load_top_domains()
+
+
+# Warm-up order; later loaders may depend on earlier ones
+_LOADERS = {
+    "email_classifier": _load_email_classifier,
+    "phishing_link": _load_phishing_link,
+    "top_domains": _load_top_domains,
+}
+COMPONENTS = tuple(_LOADERS)
+
+_components = {}
+_errors = {}
+_load_seconds = {}
+_loading = set()
+_locks = {name: threading.Lock() for name in COMPONENTS}
+
+
+def get_component(name):
+    """Return the loaded component, loading it on first use (thread-safe, loads once)."""
+    component = _components.get(name)
+    if component is not None:
+        return component
+
+    # In a traced request the span also covers waiting for a background load
+    with tracing.span("load_component", component=name), _locks[name]:
+        if name in _components:
+            return _components[name]
+        _loading.add(name)
+        start = time.perf_counter()
+        try:
+            component = _LOADERS[name]()
+        except Exception as e:
+            _errors[name] = str(e)
+            raise
+        finally:
+            _loading.discard(name)
+        _errors.pop(name, None)
+        _load_seconds[name] = time.perf_counter() - start
+        _components[name] = component
+        return component
+
+
+def component_status():
+    status = {}
+    for name in COMPONENTS:
+        if name in _components:
+            status[name] = {"state": "warm", "load_seconds": round(_load_seconds[name], 3)}
+        elif name in _loading:
+            status[name] = {"state": "loading"}
+        elif name in _errors:
+            status[name] = {"state": "error", "error": _errors[name]}
+        else:
+            status[name] = {"state": "cold"}
+    return status
+
+
+def is_ready():
+    return all(name in _components for name in COMPONENTS)
+
+
+def warm_up(names=COMPONENTS):
+    """Load components synchronously; failures are recorded and reported by component_status()."""
+    for name in names:
+        try:
+            get_component(name)
+        except Exception:
+            log.exception("Warm-up of %s failed", name)
+
+
+def start_background_warmup(names=COMPONENTS):
+    thread = threading.Thread(target=warm_up, args=(names,), name="classifier-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def start(mode=WARMUP_MODE):
+    """Apply a CLASSIFIER_WARMUP startup mode."""
+    if mode not in WARMUP_MODES:
+        raise ValueError(f"Unknown CLASSIFIER_WARMUP {mode!r}, expected one of {WARMUP_MODES}")
+    if mode == "eager":
+        warm_up()
+    elif mode == "background":
+        start_background_warmup()
@@ -0,0 +1,189 @@
+"""
+Compressed and binary wire formats for the classifier API, negotiated with
+standard HTTP headers. Plain JSON stays the default.
+
+- Request bodies may be sent with `Content-Encoding: gzip` or `zstd`. Buffered
+  requests are decompressed before routing (bounded by
+  WIRE_MAX_DECOMPRESSED_BYTES; 413 past that, 400 if the data is corrupt).
+  Streamed NDJSON bodies are decompressed incrementally as they are read.
+- Responses of at least WIRE_MIN_COMPRESS_BYTES are compressed with the best
+  encoding the client lists in `Accept-Encoding` (zstd preferred over gzip).
+- `Content-Type: application/msgpack` request bodies are decoded wherever a
+  route reads `request.json`, and `Accept: application/msgpack` makes
+  `jsonify` responses MessagePack-encoded.
+
+zstd needs the `zstandard` package and MessagePack the `msgpack` package;
+without them those options are simply not offered (415 if a client uses them).
+"""
+import gzip
+import io
+import os
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+from flask.wrappers import Request
+from werkzeug.exceptions import BadRequest, HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.wsgi import LimitedStream
+
+try:
+    import zstandard
+    _ZSTD_AVAILABLE = True
+except Exception:
+    _ZSTD_AVAILABLE = False
+
+try:
+    import msgpack
+    _MSGPACK_AVAILABLE = True
+except Exception:
+    _MSGPACK_AVAILABLE = False
+
+WIRE_MIN_COMPRESS_BYTES = int(os.environ.get('WIRE_MIN_COMPRESS_BYTES', '1024'))
+WIRE_MAX_DECOMPRESSED_BYTES = int(os.environ.get('WIRE_MAX_DECOMPRESSED_BYTES', str(64 * 1024 * 1024)))
+GZIP_LEVEL = int(os.environ.get('WIRE_GZIP_LEVEL', '5'))
+ZSTD_LEVEL = int(os.environ.get('WIRE_ZSTD_LEVEL', '3'))
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack")
+STREAMING_MIMETYPES = ("application/x-ndjson",)
+
+# Preference order for response compression
+ENCODINGS = ("zstd", "gzip") if _ZSTD_AVAILABLE else ("gzip",)
+_CORRUPT_DATA_ERRORS = (OSError, EOFError, ValueError) + ((zstandard.ZstdError,) if _ZSTD_AVAILABLE else ())
+
+
+def compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def _decompressing_reader(stream, encoding):
+    if encoding == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    raise UnsupportedMediaType(f"Unsupported Content-Encoding {encoding!r}, expected one of {ENCODINGS}")
+
+
+class _BoundedReader(io.RawIOBase):
+    """Decompressed view of a request body that refuses to grow past `limit` bytes."""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.total = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            data = self.stream.read(len(buffer))
+        except _CORRUPT_DATA_ERRORS as e:
+            raise BadRequest(f"Malformed compressed request body: {e}")
+        self.total += len(data)
+        if self.total > self.limit:
+            raise RequestEntityTooLarge(f"Decompressed request body exceeds {self.limit} bytes")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class DecompressMiddleware:
+    """WSGI middleware that strips `Content-Encoding` from request bodies before Flask sees them."""
+
+    def __init__(self, wsgi_app, max_decompressed_bytes=None):
+        self.wsgi_app = wsgi_app
+        self.max_decompressed_bytes = max_decompressed_bytes
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if encoding and encoding != "identity":
+            try:
+                self._decode_body(environ, encoding)
+            except HTTPException as e:
+                return e(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+    def _decode_body(self, environ, encoding):
+        if encoding not in ENCODINGS:
+            raise UnsupportedMediaType(f"Unsupported Content-Encoding {encoding!r}, expected one of {ENCODINGS}")
+        limit = WIRE_MAX_DECOMPRESSED_BYTES if self.max_decompressed_bytes is None else self.max_decompressed_bytes
+
+        stream = environ["wsgi.input"]
+        content_length = environ.get("CONTENT_LENGTH")
+        if content_length:
+            stream = LimitedStream(stream, int(content_length))
+        reader = io.BufferedReader(_BoundedReader(_decompressing_reader(stream, encoding), limit))
+
+        del environ["HTTP_CONTENT_ENCODING"]
+        mimetype = environ.get("CONTENT_TYPE", "").split(";")[0].strip().lower()
+        if mimetype in STREAMING_MIMETYPES:
+            # Decompress as the route reads, so streaming keeps its bounded memory
+            environ.pop("CONTENT_LENGTH", None)
+            environ["wsgi.input"] = reader
+            environ["wsgi.input_terminated"] = True
+        else:
+            body = reader.read()
+            environ["wsgi.input"] = io.BytesIO(body)
+            environ["CONTENT_LENGTH"] = str(len(body))
+
+
+class WireRequest(Request):
+    """Request whose `json` / `get_json()` also decode MessagePack bodies."""
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if self.mimetype not in MSGPACK_MIMETYPES:
+            return super().get_json(force=force, silent=silent, cache=cache)
+        if not _MSGPACK_AVAILABLE:
+            if silent:
+                return None
+            raise UnsupportedMediaType("MessagePack support requires the msgpack package")
+        try:
+            return msgpack.unpackb(self.get_data(cache=cache), raw=False)
+        except Exception as e:
+            if silent:
+                return None
+            raise BadRequest(f"Failed to decode MessagePack body: {e}")
+
+
+def wants_msgpack():
+    if not _MSGPACK_AVAILABLE:
+        return False
+    return request.accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES) in MSGPACK_MIMETYPES
+
+
+class WireJSONProvider(DefaultJSONProvider):
+    """`jsonify` provider that answers in MessagePack when the client asks for it."""
+
+    def response(self, *args, **kwargs):
+        if not wants_msgpack():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return current_app.response_class(msgpack.packb(obj, default=self.default), mimetype=MSGPACK_MIMETYPE)
+
+
+def compress_response(response):
+    """after_request hook: compress buffered responses the client accepts compressed."""
+    response.vary.add("Accept-Encoding")
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or "Content-Encoding" in response.headers):
+        return response
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < WIRE_MIN_COMPRESS_BYTES:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    app.request_class = WireRequest
+    app.json = WireJSONProvider(app)
+    app.wsgi_app = DecompressMiddleware(app.wsgi_app)
+    app.after_request(compress_response)
@@ -0,0 +1,30 @@
+"""
+WSGI entry point for production serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (set in gunicorn.conf.py) this module is imported once in the
+gunicorn master. The models are loaded there before any worker is forked, so
+every worker shares the same pages copy-on-write. The joblib artifacts are
+memory-mapped (MODEL_MMAP_MODE) and the Top-1M snapshot is an mmapped .npy,
+so those arrays are backed by the page cache rather than per-process memory.
+
+CLASSIFIER_WARMUP=lazy skips the preload and each worker loads on first use.
+"""
+import gc
+import os
+
+import warmup
+from svm_model import app
+
+WSGI_WARMUP = os.environ.get('CLASSIFIER_WARMUP', 'eager').strip().lower()
+
+# A background warm-up thread must not be running while the master forks
+if WSGI_WARMUP != "lazy":
+    warmup.start("eager")
+    # Move everything loaded so far into the permanent generation, so the
+    # collector never touches (and un-shares) those pages in the workers
+    gc.collect()
+    gc.freeze()
+
+__all__ = ["app"]
@@ -75,6 +75,8 @@ router.get("/callback", async (req, res) => {
     // Call classifier
     const classificationResponse = await axios.post("http://localhost:5001/classify", {
       emails: emailBodies,
+      // Score the links in the background so opening an email is a verdict-cache hit
+      prefetch_links: true,
     });
     const classifications = classificationResponse.data.predictions;
     messages.forEach((msg, index) => {
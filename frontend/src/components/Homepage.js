@@ -831,7 +831,7 @@ const Homepage = ({ userEmail, demoMode = false, demoEmails = [] }) => {
           }}
         >
           <span className="tooltip-icon" aria-hidden>
-            {linkTooltip.prediction === "phishing" ? "⚠️" : "✅"}
+            {linkTooltip.prediction === "phishing" ? "⚠️" : linkTooltip.prediction === "pending" ? "⏳" : "✅"}
           </span>
           <span className="tooltip-text">
             {linkTooltip.prediction}